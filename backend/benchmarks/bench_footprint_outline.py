@@ -0,0 +1,240 @@
+"""
+Footprint outline benchmark on large synthetic architect IFCs.
+
+Builds a synthetic multi-storey IFC (a grid of bays, each with an extruded
+floor slab, a rotated wall and a 24-sided round column, some bays left out
+so the plan has notches), tessellates it once into a MeshStore and times
+the footprint outline of the compliance check
+(volume_compliance._projected_outline_from_triangles) in two cases:
+
+- ground: the ground-floor z-band used by the compliance check
+- all:    every triangle of the model, no z-band
+
+against the former implementation (a shapely Polygon per triangle with
+is_valid/buffer(0), then unary_union). Before timing, both outlines are
+compared vertex by vertex; any difference aborts the run.
+
+Usage (from backend/):
+    python benchmarks/bench_footprint_outline.py
+    python benchmarks/bench_footprint_outline.py --grid 50 --storeys 6 --repeat 5
+    python benchmarks/bench_footprint_outline.py --input outputs/architect.ifc
+    python benchmarks/bench_footprint_outline.py --save /tmp/synthetic.ifc
+
+Notes
+-----
+- Needs the ifcopenshell geometry kernel (tessellation) and shapely.
+- The synthetic model sits at UTM-sized coordinates (--origin) like real
+  architect uploads, so float64 handling is exercised as well.
+- The default grid (30 x 30 bays, 4 storeys) gives about 370k triangles,
+  roughly a quarter of them in the ground band.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, List, Optional, Tuple
+import argparse
+import math
+import random
+import statistics
+import sys
+import time
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BACKEND_DIR))
+
+import ifcopenshell  # noqa: E402
+from shapely.geometry import Polygon  # noqa: E402
+from shapely.ops import unary_union  # noqa: E402
+
+from ifc_exporter import (  # noqa: E402
+    _make_closed_profile,
+    _make_extruded_solid,
+    _new_envelope_model,
+    _new_guid,
+    _place_proxy_at_offset,
+)
+from mesh_store import MeshStore, build_mesh_store  # noqa: E402
+from volume_compliance import _projected_outline_from_triangles  # noqa: E402
+
+BAY_M = 6.0
+STOREY_HEIGHT_M = 3.2
+SLAB_THICKNESS_M = 0.3
+COLUMN_SIDES = 24
+
+
+def _add_element(model, context, z_dir, x_dir, ifc_class: str, ring, origin_xyz, depth: float):
+    solid = _make_extruded_solid(model, _make_closed_profile(model, ring), depth)
+    body = model.create_entity(
+        "IfcShapeRepresentation",
+        ContextOfItems=context,
+        RepresentationIdentifier="Body",
+        RepresentationType="SweptSolid",
+        Items=[solid],
+    )
+    element = model.create_entity(
+        ifc_class,
+        GlobalId=_new_guid(ifc_class),
+        Name=ifc_class,
+        Representation=model.create_entity("IfcProductDefinitionShape", Representations=[body]),
+    )
+    _place_proxy_at_offset(model, element, *origin_xyz, z_dir, x_dir)
+    return element
+
+
+def synthetic_model(grid: int, storeys: int, seed: int, origin: Tuple[float, float]) -> Any:
+    """Synthetic architect IFC: `grid` x `grid` bays on `storeys` levels, ~12% of bays left out."""
+    rng = random.Random(seed)
+    model, context, z_dir, x_dir, storey = _new_envelope_model("BENCH", use_template=False)
+    column = [
+        (0.3 * math.cos(2 * math.pi * k / COLUMN_SIDES), 0.3 * math.sin(2 * math.pi * k / COLUMN_SIDES))
+        for k in range(COLUMN_SIDES)
+    ]
+    slab = [(0.0, 0.0), (BAY_M, 0.0), (BAY_M, BAY_M), (0.0, BAY_M)]
+    skipped = {(i, j) for i in range(grid) for j in range(grid) if rng.random() < 0.12}
+
+    elements = []
+    for level in range(storeys):
+        z = level * STOREY_HEIGHT_M
+        wall_h = STOREY_HEIGHT_M - SLAB_THICKNESS_M
+        for i in range(grid):
+            for j in range(grid):
+                if (i, j) in skipped:
+                    continue
+                ox, oy = origin[0] + i * BAY_M, origin[1] + j * BAY_M
+                elements.append(_add_element(model, context, z_dir, x_dir, "IfcSlab", slab, (ox, oy, z), SLAB_THICKNESS_M))
+                elements.append(_add_element(
+                    model, context, z_dir, x_dir, "IfcColumn", column,
+                    (ox + 0.5, oy + 0.5, z + SLAB_THICKNESS_M), wall_h,
+                ))
+                th = rng.uniform(0.0, math.pi)
+                length, width = rng.uniform(2.0, BAY_M - 1.0), 0.25
+                c, s = math.cos(th), math.sin(th)
+                wall = [(x * c - y * s, x * s + y * c) for x, y in ((0, 0), (length, 0), (length, width), (0, width))]
+                elements.append(_add_element(
+                    model, context, z_dir, x_dir, "IfcWall", wall,
+                    (ox + BAY_M / 2, oy + BAY_M / 2, z + SLAB_THICKNESS_M), wall_h,
+                ))
+
+    model.create_entity(
+        "IfcRelContainedInSpatialStructure",
+        GlobalId=_new_guid("IfcRelContainedInSpatialStructure"),
+        RelatingStructure=storey,
+        RelatedElements=elements,
+    )
+    return model
+
+
+def reference_outline(
+    store: MeshStore,
+    products: List[Any],
+    z_min: Optional[float] = None,
+    z_max: Optional[float] = None,
+) -> Optional[List[Tuple[float, float]]]:
+    """Former per-triangle implementation of _projected_outline_from_triangles."""
+    triangles_2d = []
+    for p0, p1, p2 in store.triangles(store.rows(p.id() for p in products)):
+        if z_min is not None and z_max is not None:
+            cz = (p0[2] + p1[2] + p2[2]) / 3.0
+            if cz < z_min or cz > z_max:
+                continue
+        ring = [(float(p0[0]), float(p0[1])), (float(p1[0]), float(p1[1])), (float(p2[0]), float(p2[1]))]
+        try:
+            poly = Polygon(ring)
+            if not poly.is_valid:
+                poly = poly.buffer(0)
+            if poly.is_empty or poly.area < 1e-9:
+                continue
+            triangles_2d.append(poly)
+        except Exception:
+            continue
+    if not triangles_2d:
+        return None
+    merged = unary_union(triangles_2d)
+    if merged.geom_type == "Polygon":
+        geoms = [merged]
+    elif merged.geom_type == "MultiPolygon":
+        geoms = list(merged.geoms)
+    else:
+        return None
+    largest = max(geoms, key=lambda g: g.area)
+    simplified = largest.simplify(0.05, preserve_topology=True)
+    if simplified.is_valid and simplified.area > 0:
+        largest = simplified
+    coords = list(largest.exterior.coords)
+    if len(coords) >= 2 and coords[0] == coords[-1]:
+        coords = coords[:-1]
+    if len(coords) < 3:
+        return None
+    return [(float(x), float(y)) for x, y in coords]
+
+
+def _summary(samples: List[float]) -> str:
+    ms = sorted(s * 1000.0 for s in samples)
+    p95 = ms[min(len(ms) - 1, int(round(0.95 * (len(ms) - 1))))]
+    return f"mean {statistics.fmean(ms):8.1f} ms | median {statistics.median(ms):8.1f} ms | p95 {p95:8.1f} ms"
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--input", type=Path, default=None, help="benchmark this IFC instead of a synthetic one")
+    ap.add_argument("--grid", type=int, default=30, help="synthetic model: bays per side")
+    ap.add_argument("--storeys", type=int, default=4, help="synthetic model: number of levels")
+    ap.add_argument("--seed", type=int, default=7, help="synthetic model: layout seed")
+    ap.add_argument("--origin", type=float, nargs=2, default=(431000.0, 4581000.0), metavar=("X", "Y"),
+                    help="synthetic model: world offset of the first bay")
+    ap.add_argument("--save", type=Path, default=None, help="also write the synthetic IFC here")
+    ap.add_argument("--repeat", type=int, default=3, help="timed runs per case and implementation")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    if args.input:
+        model = ifcopenshell.open(str(args.input))
+        source = args.input.name
+    else:
+        model = synthetic_model(args.grid, args.storeys, args.seed, tuple(args.origin))
+        source = f"synthetic {args.grid}x{args.grid} bays x {args.storeys} storeys"
+        if args.save:
+            model.write(str(args.save))
+    t1 = time.perf_counter()
+    store = build_mesh_store(model)
+    t2 = time.perf_counter()
+    if store is None or not len(store):
+        print("No tessellated geometry (is the ifcopenshell geometry kernel available?)")
+        return 1
+
+    products = [model.by_id(int(pid)) for pid in store.product_ids]
+    bbox = store.bbox()
+    z_min, z_max = float(bbox[0, 2]), float(bbox[1, 2])
+    # Same ground band as volume_compliance._ground_perimeter_temp_volume
+    band_top = z_min + min(3.5, max(0.5, 0.4 * (z_max - z_min)))
+    cases = {"ground": (z_min - 0.05, band_top), "all": (None, None)}
+
+    print(f"{source}: {len(store)} products, {len(store.faces)} triangles, {store.nbytes / 1e6:.1f} MB mesh store")
+    print(f"model {t1 - t0:.2f} s | tessellation {t2 - t1:.2f} s")
+
+    for name, (lo, hi) in cases.items():
+        expected = reference_outline(store, products, lo, hi)
+        actual = _projected_outline_from_triangles(store, products, lo, hi)
+        if expected != actual:
+            print(f"[verify] {name}: outlines differ ({len(expected or [])} vs {len(actual or [])} vertices)")
+            return 1
+        print(f"[verify] {name}: identical outline ({len(actual or [])} vertices)")
+
+    for name, (lo, hi) in cases.items():
+        samples = {"reference": [], "vectorized": []}
+        for _ in range(max(1, args.repeat)):
+            for impl, fn in (("reference", reference_outline), ("vectorized", _projected_outline_from_triangles)):
+                t = time.perf_counter()
+                fn(store, products, lo, hi)
+                samples[impl].append(time.perf_counter() - t)
+        print(f"\n[{name}]")
+        for impl, series in samples.items():
+            print(f"  {impl:<10} {_summary(series)}")
+        speedup = statistics.median(samples["reference"]) / statistics.median(samples["vectorized"])
+        print(f"  median speedup (reference / vectorized): {speedup:.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
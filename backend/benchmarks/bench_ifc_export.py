@@ -0,0 +1,228 @@
+"""
+Per-parcel IFC export benchmark.
+
+Builds and writes the envelope IFC of every parcel in a preprocess JSON
+(default: outputs/parcels_simplified_smoke.json) and reports per-parcel
+build/write times for three backends:
+
+- scratch:  ifcopenshell, project/context/spatial skeleton built per file
+- template: ifcopenshell, skeleton cloned from the per-process template
+- step:     direct STEP text writer (step_writer.StepModel)
+
+Before timing, every parcel is exported with both the ifcopenshell and the
+STEP writer, both files are parsed back with ifcopenshell and compared
+entity by entity (same ids, types and attribute values, GlobalIds
+included). Exports are seeded with the refcat (guid_seed), so both writers
+derive the same GlobalIds. Any difference aborts the run.
+
+Usage (from backend/):
+    python benchmarks/bench_ifc_export.py
+    python benchmarks/bench_ifc_export.py --repeat 5 --limit 50
+    python benchmarks/bench_ifc_export.py --no-verify
+
+Notes
+-----
+- Every parcel uses the default rule (height 10 m, roof slopes 30/60 deg,
+  no depth limit) so only the exporter is measured, not rule resolution.
+- IFC files go to a temporary directory that is removed afterwards.
+- Modes run interleaved per repeat so machine noise affects both equally.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Dict, List
+import argparse
+import json
+import math
+import statistics
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BACKEND_DIR))
+
+import ifcopenshell  # noqa: E402
+
+import regulations  # noqa: E402
+from ifc_exporter import _build_envelope_model  # noqa: E402
+
+DEFAULT_INPUT = BACKEND_DIR / "outputs" / "parcels_simplified_smoke.json"
+
+
+def load_parcels(path: Path, limit: int | None) -> List[Dict[str, Any]]:
+    data = json.loads(path.read_text(encoding="utf-8"))
+    parcels = []
+    for refcat, entry in data.items():
+        points = entry.get("points") or []
+        if len(points) < 3:
+            continue
+        parcels.append(
+            {
+                "refcat": refcat,
+                "points": [(float(x), float(y)) for x, y in points],
+                "segments": entry.get("segments") or [],
+            }
+        )
+    return parcels[:limit] if limit else parcels
+
+
+MODES = {
+    "scratch": {"use_template": False, "writer": "ifcopenshell"},
+    "template": {"use_template": True, "writer": "ifcopenshell"},
+    "step": {"use_template": False, "writer": "step"},
+}
+
+
+def export_parcel(parcel: Dict[str, Any], out_path: Path, mode: str) -> Dict[str, float]:
+    rule = regulations.DEFAULT_RULE
+    t0 = time.perf_counter()
+    model = _build_envelope_model(
+        footprint_points=parcel["points"],
+        height=rule.max_reg_height_m,
+        zone_key="BENCH",
+        roof_slope_deg_real=rule.max_roof_slope_deg_real,
+        roof_slope_deg_virtual=rule.max_roof_slope_deg_virtual,
+        ground_height=1.0,
+        depth_m=None,
+        max_roof_rise_m=None,
+        ground_footprint_points=parcel["points"],
+        include_cadaster_ground=True,
+        street_metrics=None,
+        street_segments=parcel["segments"],
+        representation="faceset",
+        guid_seed=parcel["refcat"],
+        **MODES[mode],
+    )
+    t1 = time.perf_counter()
+    model.write(str(out_path))
+    t2 = time.perf_counter()
+    return {"build": t1 - t0, "write": t2 - t1, "total": t2 - t0}
+
+
+def _same_value(a: Any, b: Any) -> bool:
+    if isinstance(a, ifcopenshell.entity_instance) and isinstance(b, ifcopenshell.entity_instance):
+        if a.id() or b.id():
+            return a.id() == b.id()
+        # Inline typed values (IfcReal(...), IfcLabel(...))
+        return a.is_a() == b.is_a() and _same_value(a.wrappedValue, b.wrappedValue)
+    if isinstance(a, (tuple, list)) and isinstance(b, (tuple, list)):
+        return len(a) == len(b) and all(_same_value(x, y) for x, y in zip(a, b))
+    if isinstance(a, float) and isinstance(b, float):
+        return math.isclose(a, b, rel_tol=1e-12, abs_tol=1e-12)
+    return a == b
+
+
+def _attribute(entity: Any, index: int) -> Any:
+    try:
+        return entity[index]
+    except Exception:
+        return "*"  # derived attribute
+
+
+def compare_files(reference: Path, candidate: Path) -> List[str]:
+    """Entity-by-entity differences between two IFC files."""
+    ref, cand = ifcopenshell.open(str(reference)), ifcopenshell.open(str(candidate))
+    diffs = []
+    if ref.schema != cand.schema:
+        diffs.append(f"schema {ref.schema} != {cand.schema}")
+    ref_ids = {e.id() for e in ref}
+    cand_ids = {e.id() for e in cand}
+    if ref_ids != cand_ids:
+        diffs.append(f"entity ids differ: {sorted(ref_ids ^ cand_ids)[:10]}")
+    for eid in sorted(ref_ids & cand_ids):
+        a, b = ref.by_id(eid), cand.by_id(eid)
+        if a.is_a() != b.is_a():
+            diffs.append(f"#{eid}: {a.is_a()} != {b.is_a()}")
+            continue
+        for i in range(len(a)):
+            name = a.attribute_name(i)
+            va, vb = _attribute(a, i), _attribute(b, i)
+            if not _same_value(va, vb):
+                diffs.append(f"#{eid} {a.is_a()}.{name}: {va!r} != {vb!r}")
+    return diffs
+
+
+def verify_parcels(parcels: List[Dict[str, Any]], out_dir: Path) -> int:
+    """Round-trip every parcel through both writers; returns the number of mismatching parcels."""
+    bad = 0
+    for parcel in parcels:
+        ref_path = out_dir / f"{parcel['refcat']}_ifcopenshell.ifc"
+        step_path = out_dir / f"{parcel['refcat']}_step.ifc"
+        export_parcel(parcel, ref_path, "scratch")
+        export_parcel(parcel, step_path, "step")
+        diffs = compare_files(ref_path, step_path)
+        if diffs:
+            bad += 1
+            print(f"[verify] {parcel['refcat']}: {len(diffs)} differences")
+            for d in diffs[:5]:
+                print(f"    {d}")
+    return bad
+
+
+def _summary(samples: List[float]) -> str:
+    ms = sorted(s * 1000.0 for s in samples)
+    p95 = ms[min(len(ms) - 1, int(round(0.95 * (len(ms) - 1))))]
+    return f"mean {statistics.fmean(ms):7.2f} ms | median {statistics.median(ms):7.2f} ms | p95 {p95:7.2f} ms"
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--input", type=Path, default=DEFAULT_INPUT, help="preprocess JSON with parcel points/segments")
+    ap.add_argument("--repeat", type=int, default=3, help="passes over all parcels per mode")
+    ap.add_argument("--limit", type=int, default=None, help="only use the first N parcels")
+    ap.add_argument("--no-verify", action="store_true", help="skip the STEP writer equivalence check")
+    args = ap.parse_args()
+
+    parcels = load_parcels(args.input, args.limit)
+    if not parcels:
+        print(f"No parcels in {args.input}")
+        return 1
+
+    results: Dict[str, Dict[str, List[float]]] = {m: {"build": [], "write": [], "total": []} for m in MODES}
+    failed = 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        out_dir = Path(tmp)
+        if not args.no_verify:
+            bad = verify_parcels(parcels, out_dir)
+            print(f"[verify] {len(parcels) - bad}/{len(parcels)} parcels identical across writers")
+            if bad:
+                return 1
+
+        # Warm-up: imports, template construction, shapely/ifcopenshell caches
+        for mode in MODES:
+            export_parcel(parcels[0], out_dir / f"warmup_{mode}.ifc", mode)
+
+        for _ in range(max(1, args.repeat)):
+            for parcel in parcels:
+                for mode in MODES:
+                    try:
+                        sample = export_parcel(parcel, out_dir / f"{parcel['refcat']}_{mode}.ifc", mode)
+                    except Exception:
+                        failed += 1
+                        continue
+                    for k, v in sample.items():
+                        results[mode][k].append(v)
+
+    print(f"{len(parcels)} parcels x {args.repeat} repeats from {args.input.name} (failed samples: {failed})")
+    for mode, series in results.items():
+        print(f"\n[{mode}]")
+        for k in ("build", "write", "total"):
+            if series[k]:
+                print(f"  {k:<6} {_summary(series[k])}")
+
+    base = results["scratch"]["total"]
+    if base:
+        print()
+        for mode in ("template", "step"):
+            new = results[mode]["total"]
+            if new:
+                speedup = statistics.median(base) / statistics.median(new)
+                print(f"median per-parcel speedup (scratch / {mode}): {speedup:.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -8,6 +8,13 @@
 # Main function:
 #   - get_parcel_polygon_by_local_id: Fetches polygon by refcat from WFS.
 #
+# Logging:
+#   - Request/parse details go to the "cadastre_client" logger at DEBUG level.
+#
+# Metrics:
+#   - Every WFS call reports its latency and, on failure, its error type
+#     to metrics.observe_wfs_call.
+#
 # Data flow:
 #   - Sends HTTP GET to WFS.
 #   - Parses XML response and checks for service errors.
@@ -15,19 +22,31 @@
 #
 # Edge cases and error handling:
 #   - Raises meaningful exceptions for HTTP/XML/WFS errors and missing geometry.
+#   - Outages (HTTP 5xx/429, HTML maintenance pages, truncated XML) raise
+#     WfsUnavailableError so batch jobs can retry them later.
 #   - Validates posList order and enforces a closed ring.
 # -----------------------------------------------------------------------------
 
 from __future__ import annotations
 
+import logging
 import requests
+import time
 import xml.etree.ElementTree as ET
 from typing import List, Tuple
 
+from metrics import observe_wfs_call
+
+logger = logging.getLogger(__name__)
+
 # Catastro INSPIRE WFS endpoint
 WFS_URL = "https://ovc.catastro.meh.es/INSPIRE/wfsCP.aspx"
 
 
+class WfsUnavailableError(RuntimeError):
+    """The WFS is temporarily unavailable (5xx/429, maintenance page, broken XML)."""
+
+
 def _preview(text: str, n: int = 600) -> str:
     """
     Returns the first n characters of a long text (used in error previews).
@@ -49,6 +68,21 @@ def get_parcel_polygon_by_local_id(local_id: str) -> List[Tuple[float, float]]:
     if not local_id:
         raise ValueError("El localId (refcat) no puede estar vacío.")
 
+    t0 = time.perf_counter()
+    try:
+        coords = _fetch_parcel_polygon(local_id)
+    except Exception as e:
+        observe_wfs_call(time.perf_counter() - t0, error=type(e).__name__)
+        raise
+    observe_wfs_call(time.perf_counter() - t0)
+    return coords
+
+
+def _fetch_parcel_polygon(local_id: str) -> List[Tuple[float, float]]:
+    """
+    Performs the WFS GetFeature request and parses the parcel ring.
+    See get_parcel_polygon_by_local_id for the contract.
+    """
     params = {
         "service": "WFS",
         "request": "GetFeature",
@@ -63,13 +97,14 @@ def get_parcel_polygon_by_local_id(local_id: str) -> List[Tuple[float, float]]:
         "User-Agent": "Mozilla/5.0 (ParcelEnvelopeIFC/1.0)"
     }
 
-    print(f"LocalId (refcat) enviado al WFS: {local_id}")
+    logger.debug("LocalId (refcat) enviado al WFS: %s", local_id)
 
     resp = requests.get(WFS_URL, params=params, headers=headers, timeout=30)
 
     # HTTP error check
     if resp.status_code != 200:
-        raise RuntimeError(
+        error_cls = WfsUnavailableError if resp.status_code >= 500 or resp.status_code == 429 else RuntimeError
+        raise error_cls(
             f"Error HTTP del WFS: {resp.status_code}\n"
             f"URL: {resp.url}\n"
             f"Contenido (preview):\n{_preview(resp.text)}"
@@ -78,7 +113,7 @@ def get_parcel_polygon_by_local_id(local_id: str) -> List[Tuple[float, float]]:
     # Maintenance/HTML response check
     content_type = (resp.headers.get("Content-Type") or "").lower()
     if "html" in content_type:
-        raise RuntimeError(
+        raise WfsUnavailableError(
             "El WFS devolvió HTML en vez de XML (posible mantenimiento/caída del servicio).\n"
             f"URL: {resp.url}\n"
             f"Contenido (preview):\n{_preview(resp.text)}"
@@ -88,7 +123,7 @@ def get_parcel_polygon_by_local_id(local_id: str) -> List[Tuple[float, float]]:
     try:
         root = ET.fromstring(resp.content)
     except ET.ParseError as e:
-        raise RuntimeError(
+        raise WfsUnavailableError(
             "La respuesta del WFS no es XML válido (posible mantenimiento/errores del servidor).\n"
             f"Error: {e}\n"
             f"URL: {resp.url}\n"
@@ -139,7 +174,7 @@ def get_parcel_polygon_by_local_id(local_id: str) -> List[Tuple[float, float]]:
     if coords and coords[0] != coords[-1]:
         coords.append(coords[0])
 
-    print(f"Se han leído {len(coords)} vértices del polígono de la parcela.")
+    logger.debug("Se han leído %d vértices del polígono de la parcela.", len(coords))
     return coords
 
 
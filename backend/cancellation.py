@@ -0,0 +1,139 @@
+"""
+Cooperative cancellation and per-parcel deadlines for job workers.
+
+Responsibilities
+----------------
+- CancelToken: checked at every pipeline stage boundary; raises JobCancelled
+  when the job was cancelled and ParcelTimeout once the parcel deadline passed.
+- run_with_deadline: run one parcel on a helper thread and stop waiting for it
+  when the deadline passes or the job is cancelled, so the worker is released.
+- sleep_unless_cancelled: wait (e.g. a retry backoff) but wake up on cancel.
+
+Notes
+-----
+- Python threads cannot be killed. A parcel that overruns its deadline keeps
+  running in the background until its next stage boundary, where the expired
+  token makes it raise. The writers check the token again after writing and
+  remove what they wrote, and a result that still arrives after the worker
+  gave up is handed to run_with_deadline's `discard` callback, so a parcel
+  reported as timed out or cancelled leaves no IFC/GLB behind and never
+  reaches the manifest (which is only updated on the worker thread).
+- The WFS client has its own 30 s request timeout, which bounds how long an
+  abandoned parcel can stay blocked on the network.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, Optional
+import threading
+import time
+
+# How often (s) the waiting worker re-checks the cancel flag
+_POLL_S = 0.25
+
+
+class JobCancelled(Exception):
+    """The job was cancelled by the user."""
+
+
+class ParcelTimeout(Exception):
+    """A parcel exceeded its wall-clock deadline."""
+
+
+class CancelToken:
+    """
+    Cancellation/deadline state for one parcel.
+
+    is_cancelled: callable returning True once the job has been cancelled.
+    timeout_s: wall-clock budget for the parcel; None or <= 0 disables it.
+    """
+
+    def __init__(self, is_cancelled: Callable[[], bool], timeout_s: Optional[float] = None) -> None:
+        self._is_cancelled = is_cancelled
+        self.timeout_s = float(timeout_s) if timeout_s and timeout_s > 0 else None
+        self.deadline = time.monotonic() + self.timeout_s if self.timeout_s else None
+        self.expired = False
+
+    def check(self, stage: Optional[str] = None) -> None:
+        """Raise if the parcel should stop before entering `stage`."""
+        if self.expired or (self.deadline is not None and time.monotonic() > self.deadline):
+            self.expired = True
+            where = f" before {stage}" if stage else ""
+            raise ParcelTimeout(f"Parcel exceeded {self.timeout_s:g}s deadline{where}")
+        if self._is_cancelled():
+            raise JobCancelled("Job cancelled")
+
+
+def run_with_deadline(
+    fn: Callable[[], Any],
+    token: CancelToken,
+    discard: Optional[Callable[[Any], None]] = None,
+) -> Any:
+    """
+    Run `fn` and return its result, raising ParcelTimeout when the token's
+    deadline passes and JobCancelled when the job is cancelled meanwhile.
+    Without a deadline `fn` runs inline on the calling thread.
+
+    When the worker gives up, the token is marked expired so `fn` stops at
+    its next check; if `fn` still returns a result afterwards it is passed
+    to `discard` (e.g. to delete the files it wrote) instead of being lost.
+    """
+    if token.deadline is None:
+        token.check()
+        return fn()
+
+    box: Dict[str, Any] = {}
+    handoff = threading.Lock()
+
+    def _target() -> None:
+        try:
+            result = fn()
+        except BaseException as e:  # re-raised on the worker thread
+            box["error"] = e
+            return
+        with handoff:
+            abandoned = token.expired
+            if not abandoned:
+                box["result"] = result
+        if abandoned and discard is not None:
+            try:
+                discard(result)
+            except Exception:
+                pass
+
+    def _give_up(exc: Exception) -> None:
+        with handoff:
+            if "result" in box:
+                return
+            token.expired = True
+        raise exc
+
+    t = threading.Thread(target=_target, name="parcel-deadline", daemon=True)
+    t.start()
+    while True:
+        remaining = token.deadline - time.monotonic()
+        t.join(max(0.0, min(_POLL_S, remaining)))
+        if not t.is_alive():
+            break
+        if time.monotonic() >= token.deadline:
+            _give_up(ParcelTimeout(f"Parcel exceeded {token.timeout_s:g}s deadline"))
+            break
+        if token._is_cancelled():
+            _give_up(JobCancelled("Job cancelled"))
+            break
+
+    if "error" in box:
+        raise box["error"]
+    return box.get("result")
+
+
+def sleep_unless_cancelled(seconds: float, is_cancelled: Callable[[], bool]) -> bool:
+    """Sleep up to `seconds`; return True early if the job gets cancelled."""
+    end = time.monotonic() + max(0.0, float(seconds))
+    while True:
+        if is_cancelled():
+            return True
+        remaining = end - time.monotonic()
+        if remaining <= 0:
+            return False
+        time.sleep(min(_POLL_S, remaining))
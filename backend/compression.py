@@ -0,0 +1,146 @@
+"""
+Compressed envelope outputs.
+
+Responsibilities
+----------------
+- Write ifcZIP archives (a ZIP holding the single .ifc file, deflated) next
+  to or instead of the plain envelope IFC.
+- Write pre-compressed `<file>.gz` variants of outputs so downloads can be
+  served gzip-encoded without compressing on every request (see http_gzip.py).
+
+Notes
+-----
+- A `.gz` variant only counts while it is at least as new as its source, so
+  a regenerated file is never answered with the previous one's bytes.
+- Archives are written to a temp file and moved into place, so a concurrent
+  download never sees a half-written file.
+- Archives carry no time of their own (fixed ZIP entry date, gzip mtime 0),
+  so byte-identical IFCs give byte-identical archives and variants.
+- ifcopenshell.open reads .ifczip directly, so an ifcZIP can stand in for the
+  plain IFC everywhere except the browser viewer (web-ifc reads plain STEP).
+  In "ifczip" mode the plain IFC is therefore kept as its `.gz` variant only
+  (whatever precompress_outputs says), and the /outputs mount answers the
+  `.ifc` URL from it (see http_gzip.PrecompressedStaticFiles).
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Dict, Optional
+import gzip
+import os
+import shutil
+import zipfile
+
+IFC_OUTPUT_FORMATS = ("ifc", "ifczip", "both")
+
+# Default gzip level: level 6 gets most of level 9's ratio on STEP text
+GZIP_LEVEL = 6
+
+
+def _replace_atomic(tmp: Path, target: Path) -> None:
+    try:
+        os.replace(tmp, target)
+    except Exception:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def write_ifczip(ifc_path: str | Path, zip_path: Optional[str | Path] = None, level: int = GZIP_LEVEL) -> Path:
+    """Pack `ifc_path` into an ifcZIP (default: same name with .ifczip) and return its path."""
+    src = Path(ifc_path)
+    out = Path(zip_path) if zip_path else src.with_suffix(".ifczip")
+    tmp = out.with_name(out.name + ".tmp")
+    try:
+        # Fixed entry date: identical IFCs give identical archives
+        info = zipfile.ZipInfo(src.name, date_time=(1980, 1, 1, 0, 0, 0))
+        info.compress_type = zipfile.ZIP_DEFLATED
+        info.external_attr = 0o644 << 16
+        with zipfile.ZipFile(tmp, "w", compresslevel=level) as zf, open(src, "rb") as fin:
+            with zf.open(info, mode="w") as fout:
+                shutil.copyfileobj(fin, fout, 1024 * 1024)
+    except Exception:
+        tmp.unlink(missing_ok=True)
+        raise
+    _replace_atomic(tmp, out)
+    return out
+
+
+def gzip_variant(path: str | Path) -> Path:
+    """Path of the pre-compressed variant of `path` (`<path>.gz`)."""
+    return Path(str(path) + ".gz")
+
+
+def fresh_gzip_variant(path: str | Path) -> Optional[Path]:
+    """The `.gz` variant of `path` if it exists and is not older than `path`."""
+    src = Path(path)
+    gz = gzip_variant(src)
+    try:
+        return gz if gz.stat().st_mtime_ns >= src.stat().st_mtime_ns else None
+    except OSError:
+        return None
+
+
+def ensure_gzip_variant(path: str | Path, level: int = GZIP_LEVEL) -> Path:
+    """Write `<path>.gz` unless an up-to-date one exists; returns the variant path."""
+    src = Path(path)
+    gz = fresh_gzip_variant(src)
+    if gz is not None:
+        return gz
+    gz = gzip_variant(src)
+    tmp = gz.with_name(gz.name + ".tmp")
+    try:
+        with open(src, "rb") as fin, open(tmp, "wb") as raw:
+            with gzip.GzipFile(filename=src.name, mode="wb", compresslevel=level, fileobj=raw, mtime=0) as fout:
+                shutil.copyfileobj(fin, fout, 1024 * 1024)
+    except Exception:
+        tmp.unlink(missing_ok=True)
+        raise
+    _replace_atomic(tmp, gz)
+    return gz
+
+
+def remove_variants(path: Optional[str | Path]) -> None:
+    """Delete the `.gz` variant of `path` (if any)."""
+    if not path:
+        return
+    try:
+        gzip_variant(path).unlink(missing_ok=True)
+    except Exception:
+        pass
+
+
+def finalize_ifc_output(ifc_path: str | Path, output_format: str = "ifc", precompress: bool = True) -> Dict[str, Optional[str]]:
+    """
+    Apply the configured output format to a freshly written IFC.
+
+    Returns {"ifc_path", "ifczip_path", "viewer_ifc_path"}: ifc_path is the
+    primary file (the .ifczip when output_format is "ifczip", the plain .ifc
+    otherwise), ifczip_path the archive, if one was written, and
+    viewer_ifc_path the plain .ifc the browser viewer loads. With
+    `precompress` the plain IFC that is kept also gets a `.gz` variant for
+    gzip transfers; without it a variant left by an earlier run is removed.
+    In "ifczip" mode the plain IFC is replaced by its `.gz` variant, so
+    viewer_ifc_path names a file that is only served, from that variant, by
+    the /outputs mount.
+    """
+    if output_format not in IFC_OUTPUT_FORMATS:
+        raise ValueError(f"ifc_output_format must be one of {IFC_OUTPUT_FORMATS}, got {output_format!r}")
+    src = Path(ifc_path)
+    zip_path: Optional[Path] = None
+    if output_format in ("ifczip", "both"):
+        zip_path = write_ifczip(src)
+    if output_format == "ifczip":
+        # web-ifc reads plain STEP only: the viewer copy survives as the .gz
+        ensure_gzip_variant(src)
+        src.unlink(missing_ok=True)
+        return {"ifc_path": str(zip_path), "ifczip_path": str(zip_path), "viewer_ifc_path": str(src)}
+    if precompress:
+        ensure_gzip_variant(src)
+    else:
+        remove_variants(src)
+    return {
+        "ifc_path": str(src),
+        "ifczip_path": str(zip_path) if zip_path else None,
+        "viewer_ifc_path": str(src),
+    }
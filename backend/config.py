@@ -20,4 +20,25 @@ else:
 	POUM_GML_PATH = BASE_DIR / "POUM.gml"
 OUTPUT_DIR = BASE_DIR / "outputs"
 
+# Job history (SQLite) and retention of finished jobs
+_JOB_DB_OVERRIDE = _CONFIG.get("job_db_path")
+if _JOB_DB_OVERRIDE:
+	_job_db_path = Path(_JOB_DB_OVERRIDE)
+	JOB_DB_PATH = _job_db_path if _job_db_path.is_absolute() else (BASE_DIR / _job_db_path)
+else:
+	JOB_DB_PATH = OUTPUT_DIR / "jobs.sqlite3"
+JOB_RETENTION_DAYS = float(_CONFIG.get("job_retention_days", 14))
+JOB_RETENTION_MAX_COUNT = int(_CONFIG.get("job_retention_max_count", 500))
+
+# Job worker pool (concurrency and queue bound)
+WORKER_COUNT = int(_CONFIG.get("worker_count", 2))
+WORKER_QUEUE_MAX = int(_CONFIG.get("worker_queue_max", 50))
+WORKER_RESERVED_INTERACTIVE = int(_CONFIG.get("worker_reserved_interactive", 1))
+
 DEFAULT_MUNICIPALITIES = ["Malgrat de Mar"]
+
+# gzip transfer encoding: text responses below this size are sent as is
+GZIP_MIN_SIZE = int(_CONFIG.get("gzip_min_size", 1024))
+
+# Parsed-IFC cache (ifc_cache.py) memory budget; 0 disables it
+IFC_MODEL_CACHE_BYTES = int(float(_CONFIG.get("ifc_model_cache_mb", 1024)) * 1024 * 1024)
@@ -0,0 +1,59 @@
+"""
+Failure classification and retry backoff for batch generation.
+
+Responsibilities
+----------------
+- Classify a parcel failure as transient (network, WFS maintenance/HTML,
+  5xx) or deterministic (geometry, rules, missing data).
+- Compute the backoff delay before each deferred retry round.
+
+Notes
+-----
+- Explicit exception chains (`raise ... from e`) are followed, so wrapped
+  errors keep their original classification.
+- Anything not recognised as transient is treated as deterministic: retrying
+  it would fail the same way.
+"""
+
+from __future__ import annotations
+
+from typing import Iterator, Optional
+import socket
+
+import requests
+
+from cadastre_client import WfsUnavailableError
+
+TRANSIENT = "transient"
+DETERMINISTIC = "deterministic"
+
+_TRANSIENT_TYPES = (
+    WfsUnavailableError,
+    requests.ConnectionError,
+    requests.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+    ConnectionError,
+    TimeoutError,
+    socket.timeout,
+)
+
+
+def _chain(exc: Optional[BaseException]) -> Iterator[BaseException]:
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        yield exc
+        exc = exc.__cause__
+
+
+def classify_failure(exc: BaseException) -> str:
+    """Return TRANSIENT or DETERMINISTIC for a parcel failure."""
+    for e in _chain(exc):
+        if isinstance(e, _TRANSIENT_TYPES):
+            return TRANSIENT
+    return DETERMINISTIC
+
+
+def retry_delay(attempt: int, base_s: float, max_s: float) -> float:
+    """Exponential backoff before retry round `attempt` (1-based), capped at `max_s`."""
+    return min(float(max_s), float(base_s) * (2 ** max(0, attempt - 1)))
@@ -0,0 +1,305 @@
+"""
+Footprint analysis shared by the envelope exporter, plan mode and the
+compliance check.
+
+Responsibilities
+----------------
+- FootprintAnalysis: one footprint ring (XY metres) together with every
+  derived quantity the consumers need -- orientation, signed area, edge
+  lengths, longest edge, vertex centroid, bbox, depth frame, ridge frame,
+  projections and spans -- computed with NumPy on first use and cached.
+- Depth clipping (buildable polygon), returned as a cached FootprintAnalysis
+  of its own so the ridge frame of the buildable footprint is shared by the
+  real envelope and the virtual roof.
+- Frontage-driven ridge direction from street segments.
+
+Notes
+-----
+- Results are bit-identical to the former per-call helpers (see
+  tests/test_footprint.py): the first longest edge wins, the centroid is
+  the vertex mean, support points are the first extreme vertex, and the
+  area and centroid sums run in ring order (cumsum, not pairwise).
+- Derived values are computed lazily and memoised without a lock
+  (cached_property, and the clip_by_depth dict). Two threads using a fresh
+  analysis at once may both compute a value; the results are equal and the
+  stores are atomic, so an analysis can still be shared between threads.
+"""
+
+from __future__ import annotations
+
+from functools import cached_property
+from typing import Any, Dict, List, Optional, Tuple
+import math
+
+import numpy as np
+
+Point2 = Tuple[float, float]
+StreetSegment = Dict[str, Any]
+
+
+def _unit(vx: float, vy: float) -> Tuple[float, float]:
+    L = math.hypot(vx, vy)
+    if L < 1e-9:
+        return (1.0, 0.0)
+    return (vx / L, vy / L)
+
+
+def ridge_dir_from_street_segments(street_segments: Optional[List[StreetSegment]]) -> Optional[Tuple[float, float]]:
+    """
+    Infer ridge direction from street-facing parcel edges.
+
+    Segment orientations are treated as undirected lines. We group near-parallel
+    edges and bias the vote toward longer edges with larger street-clearance
+    values, which makes opposite street frontages dominate over parcel-to-parcel
+    gaps. Returns None when frontage data is absent or inconclusive.
+    """
+    groups: List[Dict[str, Any]] = []
+    parallel_cos = math.cos(math.radians(20.0))
+
+    for seg in street_segments or []:
+        if not isinstance(seg, dict):
+            continue
+        segment_pair = seg.get("segment")
+        if not isinstance(segment_pair, (list, tuple)) or len(segment_pair) != 2:
+            continue
+
+        street_value = seg.get("street")
+        if street_value is None:
+            continue
+
+        try:
+            street = float(street_value)
+            (x1, y1), (x2, y2) = segment_pair
+            vx = float(x2) - float(x1)
+            vy = float(y2) - float(y1)
+        except Exception:
+            continue
+
+        length = float(seg.get("length")) if seg.get("length") is not None else math.hypot(vx, vy)
+        if street <= 0.5 or length <= 0.5:
+            continue
+
+        ux, uy = _unit(vx, vy)
+        if ux < -1e-9 or (abs(ux) <= 1e-9 and uy < 0.0):
+            ux, uy = -ux, -uy
+
+        weight = length * street * street
+        best_group = None
+        best_dot = -1.0
+        for group in groups:
+            dot = abs(ux * group["dir"][0] + uy * group["dir"][1])
+            if dot > best_dot:
+                best_dot = dot
+                best_group = group
+
+        if best_group is not None and best_dot >= parallel_cos:
+            sign = 1.0 if (ux * best_group["vec"][0] + uy * best_group["vec"][1]) >= 0.0 else -1.0
+            best_group["vec"][0] += sign * ux * weight
+            best_group["vec"][1] += sign * uy * weight
+            best_group["score"] += weight
+            best_group["dir"] = _unit(best_group["vec"][0], best_group["vec"][1])
+            continue
+
+        groups.append(
+            {
+                "vec": [ux * weight, uy * weight],
+                "dir": (ux, uy),
+                "score": weight,
+            }
+        )
+
+    if not groups:
+        return None
+
+    best_group = max(groups, key=lambda group: float(group["score"]))
+    return _unit(best_group["vec"][0], best_group["vec"][1])
+
+
+class FootprintAnalysis:
+    """
+    A footprint ring (open or closed; stored open) and its cached analysis.
+    `street_segments` (same coordinates as the ring) drive the ridge
+    direction; without them the longest edge does.
+    """
+
+    def __init__(self, points: List[Point2], street_segments: Optional[List[StreetSegment]] = None) -> None:
+        pts = [(float(x), float(y)) for x, y in points]
+        if len(pts) >= 2 and pts[0] == pts[-1]:
+            pts = pts[:-1]
+        self.points: List[Point2] = pts
+        self.street_segments = street_segments
+        self.xy = np.asarray(pts, dtype=float).reshape(-1, 2)
+        self._clipped: Dict[float, FootprintAnalysis] = {}
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    # -- Shape ------------------------------------------------------------------
+
+    @cached_property
+    def edges(self) -> np.ndarray:
+        """(n, 2) edge vectors p[i] -> p[i+1] (closing edge last)."""
+        return np.roll(self.xy, -1, axis=0) - self.xy
+
+    @cached_property
+    def edge_lengths(self) -> np.ndarray:
+        return np.hypot(self.edges[:, 0], self.edges[:, 1])
+
+    @cached_property
+    def longest_edge_index(self) -> int:
+        return int(np.argmax(self.edge_lengths)) if len(self) else 0
+
+    @cached_property
+    def longest_edge(self) -> Tuple[Point2, Point2]:
+        i = self.longest_edge_index
+        return self.points[i], self.points[(i + 1) % len(self)]
+
+    @cached_property
+    def centroid(self) -> Point2:
+        """Vertex mean (not the area centroid), as used for inward tests and apex placement."""
+        if not len(self):
+            return (0.0, 0.0)
+        c = np.cumsum(self.xy, axis=0)[-1] / len(self)
+        return (float(c[0]), float(c[1]))
+
+    @cached_property
+    def bbox(self) -> Tuple[float, float, float, float]:
+        """(min_x, min_y, max_x, max_y)."""
+        lo, hi = self.xy.min(axis=0), self.xy.max(axis=0)
+        return (float(lo[0]), float(lo[1]), float(hi[0]), float(hi[1]))
+
+    @cached_property
+    def signed_area(self) -> float:
+        """Shoelace area, positive for counter-clockwise rings."""
+        if len(self) < 3:
+            return 0.0
+        x, y = self.xy[:, 0], self.xy[:, 1]
+        return float(0.5 * np.cumsum(x * np.roll(y, -1) - np.roll(x, -1) * y)[-1])
+
+    @property
+    def area(self) -> float:
+        return abs(self.signed_area)
+
+    @property
+    def is_ccw(self) -> bool:
+        return self.signed_area > 0.0
+
+    @cached_property
+    def ccw_points(self) -> List[Point2]:
+        """Open ring with CCW winding (outward normals, right-hand rule)."""
+        return list(self.points) if self.is_ccw else self.points[::-1]
+
+    # -- Depth (front edge) frame ---------------------------------------------
+
+    @cached_property
+    def depth_frame(self) -> Tuple[Point2, Tuple[float, float]]:
+        """(A, n): start of the longest (front) edge and its unit inward normal."""
+        A, B = self.longest_edge
+        cx, cy = self.centroid
+        n0x, n0y = (-(B[1] - A[1]), B[0] - A[0])
+        if (n0x * (cx - A[0]) + n0y * (cy - A[1])) < 0:
+            n0x, n0y = -n0x, -n0y
+        return A, _unit(n0x, n0y)
+
+    @cached_property
+    def depth_projection(self) -> np.ndarray:
+        """Distance of every vertex behind the front edge (along the inward normal)."""
+        (ax, ay), (nx, ny) = self.depth_frame
+        return nx * (self.xy[:, 0] - ax) + ny * (self.xy[:, 1] - ay)
+
+    def clip_by_depth(self, depth_m: Optional[float]) -> "FootprintAnalysis":
+        """
+        Buildable footprint: the part within `depth_m` of the front edge (the
+        longest edge), as a cached analysis. Returns self when depth_m is
+        unset or not positive, or when clipping would leave fewer than 3
+        vertices (safe fallback).
+        """
+        if depth_m is None or depth_m <= 0.0 or len(self) < 3:
+            return self
+        key = float(depth_m)
+        cached = self._clipped.get(key)
+        if cached is not None:
+            return cached
+
+        v = (self.depth_projection - key).tolist()
+        pts = self.points
+        n = len(pts)
+        eps = 1e-9
+        out: List[Point2] = []
+        for i in range(n):
+            s, e = pts[i], pts[(i + 1) % n]
+            vs, ve = v[i], v[(i + 1) % n]
+            s_in, e_in = vs <= eps, ve <= eps
+            if s_in != e_in and abs(vs - ve) > 1e-12:
+                t = vs / (vs - ve)
+                out.append((s[0] + t * (e[0] - s[0]), s[1] + t * (e[1] - s[1])))
+            if e_in:
+                out.append(e)
+
+        def _same(a: Point2, b: Point2, tol: float = 1e-9) -> bool:
+            return abs(a[0] - b[0]) <= tol and abs(a[1] - b[1]) <= tol
+
+        cleaned: List[Point2] = []
+        for p in out:
+            if not cleaned or not _same(p, cleaned[-1]):
+                cleaned.append(p)
+        if len(cleaned) >= 3 and _same(cleaned[0], cleaned[-1]):
+            cleaned = cleaned[:-1]
+
+        result = self if len(cleaned) < 3 else FootprintAnalysis(cleaned, self.street_segments)
+        self._clipped[key] = result
+        return result
+
+    # -- Ridge frame -------------------------------------------------------------
+
+    @cached_property
+    def ridge_dir(self) -> Tuple[float, float]:
+        """Frontage-driven ridge direction, falling back to the longest edge (unit vector)."""
+        street_dir = ridge_dir_from_street_segments(self.street_segments)
+        if street_dir is not None:
+            return street_dir
+        if not len(self):
+            return (1.0, 0.0)
+        ex, ey = self.edges[self.longest_edge_index]
+        return _unit(float(ex), float(ey))
+
+    @cached_property
+    def ridge_frame(self) -> Tuple[float, float, float, float]:
+        """(rx, ry, sx, sy): unit ridge axis R and its left perpendicular S."""
+        # Normalised once more, as the ridge mesh always did (last-bit stable output)
+        rx, ry = _unit(*self.ridge_dir)
+        return rx, ry, -ry, rx
+
+    @cached_property
+    def projections(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Vertex projections (proj_r, proj_s) on the ridge axes, in ring order."""
+        rx, ry, sx, sy = self.ridge_frame
+        x, y = self.xy[:, 0], self.xy[:, 1]
+        return x * rx + y * ry, x * sx + y * sy
+
+    @cached_property
+    def spans(self) -> Tuple[float, float, float, float]:
+        """(r_min, r_max, s_min, s_max) of the footprint on the ridge axes."""
+        proj_r, proj_s = self.projections
+        return float(proj_r.min()), float(proj_r.max()), float(proj_s.min()), float(proj_s.max())
+
+    def support_point(self, axis: str, take_max: bool) -> Point2:
+        """First extreme vertex along the ridge axis "r" or "s" (max or min side)."""
+        proj = self.projections[0 if axis == "r" else 1]
+        return self.points[int(np.argmax(proj) if take_max else np.argmin(proj))]
+
+    def ridge_rise(self, slope_deg: float, max_rise_m: Optional[float] = None) -> float:
+        """Rise of a ridge roof sloping up from both long sides (half the S span)."""
+        r_min, r_max, s_min, s_max = self.spans
+        rise = 0.5 * (s_max - s_min) * math.tan(math.radians(float(slope_deg)))
+        if max_rise_m is not None and rise > float(max_rise_m):
+            rise = float(max_rise_m)
+        return float(rise)
+
+    def rise_max(self, slope_deg: float, max_rise_m: Optional[float] = None) -> float:
+        """Hip-roof bound: half the larger span times the slope, capped at `max_rise_m`."""
+        r_min, r_max, s_min, s_max = self.spans
+        rise = max(0.5 * (r_max - r_min), 0.5 * (s_max - s_min)) * math.tan(math.radians(float(slope_deg)))
+        if max_rise_m is not None:
+            rise = min(rise, float(max_rise_m))
+        return float(rise)
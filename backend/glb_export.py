@@ -0,0 +1,544 @@
+"""
+glTF 2.0 binary (GLB) export of envelope models for the web viewer.
+
+Responsibilities
+----------------
+- Convert a built envelope model (ifcopenshell.file or step_writer.StepModel)
+  into a GLB: one node per proxy element, one material per IfcStyledItem
+  colour, layer / ObjectType / Tag / GlobalId in the node extras.
+- Merge per-parcel GLBs into tiles (e.g. one per cadastral block) for
+  municipality overviews, cached on disk and rebuilt when a parcel changes.
+
+Notes
+-----
+- Geometry is evaluated from the entities the envelope exporter writes:
+  extruded polyline profiles, IfcPolygonalFaceSet and IfcFacetedBrep under
+  translation-only placements. Other items are skipped (logged at DEBUG).
+- glTF is Y-up: IFC (x, y, z) maps to (x, z, -y).
+- Positions are float32, so vertices stay local to their element and the
+  UTM offset lives in float64 node translations relative to the file origin
+  (scenes[0].extras.origin, IFC world coordinates).
+- No normals are written; viewers shade primitives without normals flat,
+  which is what a faceted envelope should look like.
+- Concurrent requests for the same tile build it once (per-tile lock);
+  different tiles are built in parallel.
+- Pure Python (struct/array); no glTF library needed.
+"""
+
+from __future__ import annotations
+
+from array import array
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import json
+import logging
+import os
+import struct
+import sys
+import threading
+
+logger = logging.getLogger(__name__)
+
+GLB_MEDIA_TYPE = "model/gltf-binary"
+
+_GLB_MAGIC = 0x46546C67  # "glTF"
+_CHUNK_JSON = 0x4E4F534A
+_CHUNK_BIN = 0x004E4942
+_ARRAY_BUFFER = 34962
+_ELEMENT_ARRAY_BUFFER = 34963
+_FLOAT = 5126
+_UNSIGNED_SHORT = 5123
+_UNSIGNED_INT = 5125
+_U32 = "I" if array("I").itemsize == 4 else "L"
+
+# Elements without an IfcStyledItem (ground slab, plain prisms)
+DEFAULT_RGB = (0.62, 0.62, 0.66)
+
+Vec3 = Tuple[float, float, float]
+
+
+def _to_gltf(v: Sequence[float]) -> List[float]:
+    """IFC Z-up (x, y, z) -> glTF Y-up (x, z, -y)."""
+    return [float(v[0]), float(v[2]), -float(v[1])]
+
+
+def _pad4(data: bytearray, fill: bytes) -> None:
+    while len(data) % 4:
+        data += fill
+
+
+def _le_bytes(values: array) -> bytes:
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+# =============================================================================
+# Triangulation
+# =============================================================================
+
+def _newell_normal(pts: Sequence[Vec3]) -> Vec3:
+    nx = ny = nz = 0.0
+    n = len(pts)
+    for i in range(n):
+        x1, y1, z1 = pts[i]
+        x2, y2, z2 = pts[(i + 1) % n]
+        nx += (y1 - y2) * (z1 + z2)
+        ny += (z1 - z2) * (x1 + x2)
+        nz += (x1 - x2) * (y1 + y2)
+    return nx, ny, nz
+
+
+def triangulate_polygon(pts: Sequence[Vec3]) -> List[Tuple[int, int, int]]:
+    """
+    Ear-clip a planar (possibly concave) polygon. Returns index triples into
+    `pts` with the polygon's own winding, so face orientation is preserved.
+    """
+    n = len(pts)
+    if n < 3:
+        return []
+    if n == 3:
+        return [(0, 1, 2)]
+
+    # Project onto the dominant plane of the Newell normal; the sign of the
+    # dropped axis tells whether the projection keeps the winding CCW.
+    nx, ny, nz = _newell_normal(pts)
+    ax, ay, az = abs(nx), abs(ny), abs(nz)
+    if az >= ax and az >= ay:
+        uv = [(p[0], p[1]) for p in pts]
+        flip = nz < 0
+    elif ax >= ay:
+        uv = [(p[1], p[2]) for p in pts]
+        flip = nx < 0
+    else:
+        uv = [(p[2], p[0]) for p in pts]
+        flip = ny < 0
+
+    order = list(range(n))
+    if flip:
+        order.reverse()
+
+    def cross(o: int, a: int, b: int) -> float:
+        return (uv[a][0] - uv[o][0]) * (uv[b][1] - uv[o][1]) - (uv[a][1] - uv[o][1]) * (uv[b][0] - uv[o][0])
+
+    def inside(p: int, a: int, b: int, c: int) -> bool:
+        return cross(a, b, p) >= 0.0 and cross(b, c, p) >= 0.0 and cross(c, a, p) >= 0.0
+
+    tris: List[Tuple[int, int, int]] = []
+    guard = 0
+    while len(order) > 3 and guard < n * n:
+        guard += 1
+        m = len(order)
+        for k in range(m):
+            a, b, c = order[k - 1], order[k], order[(k + 1) % m]
+            if cross(a, b, c) <= 0.0:
+                continue
+            if any(inside(p, a, b, c) for p in order if p not in (a, b, c) and uv[p] not in (uv[a], uv[b], uv[c])):
+                continue
+            tris.append((a, b, c))
+            order.pop(k)
+            break
+        else:
+            # Degenerate remainder (collinear / self-touching): fan it
+            tris.extend((order[0], order[i], order[i + 1]) for i in range(1, len(order) - 1))
+            order = []
+    if len(order) == 3:
+        tris.append((order[0], order[1], order[2]))
+    if flip:
+        tris = [(a, c, b) for a, b, c in tris]
+    return tris
+
+
+# =============================================================================
+# GLB builder
+# =============================================================================
+
+class GlbBuilder:
+    """Accumulates meshes, materials and nodes and serializes one GLB."""
+
+    def __init__(self) -> None:
+        self.nodes: List[Dict[str, Any]] = []
+        self.meshes: List[Dict[str, Any]] = []
+        self.materials: List[Dict[str, Any]] = []
+        self.accessors: List[Dict[str, Any]] = []
+        self.buffer_views: List[Dict[str, Any]] = []
+        self._bin = bytearray()
+        self._material_ids: Dict[Tuple[str, Tuple[float, ...]], int] = {}
+
+    def material(self, name: str, rgb: Sequence[float], transparency: float = 0.0) -> int:
+        alpha = max(0.0, min(1.0, 1.0 - float(transparency)))
+        rgba = tuple(round(float(c), 6) for c in rgb) + (round(alpha, 6),)
+        key = (name, rgba)
+        idx = self._material_ids.get(key)
+        if idx is None:
+            mat: Dict[str, Any] = {
+                "name": name,
+                "pbrMetallicRoughness": {"baseColorFactor": list(rgba), "metallicFactor": 0.0, "roughnessFactor": 0.8},
+                "doubleSided": True,
+            }
+            if alpha < 1.0:
+                mat["alphaMode"] = "BLEND"
+            idx = len(self.materials)
+            self.materials.append(mat)
+            self._material_ids[key] = idx
+        return idx
+
+    def _view(self, data: bytes, target: int) -> int:
+        _pad4(self._bin, b"\x00")
+        self.buffer_views.append({"buffer": 0, "byteOffset": len(self._bin), "byteLength": len(data), "target": target})
+        self._bin += data
+        return len(self.buffer_views) - 1
+
+    def add_mesh(self, name: str, positions: Sequence[Vec3], triangles: Sequence[Tuple[int, int, int]], material: int) -> Optional[int]:
+        """Add a triangle mesh (positions already in glTF axes). Returns the mesh index."""
+        if not positions or not triangles:
+            return None
+        flat = array("f", (c for p in positions for c in p))
+        idx_type = "H" if len(positions) < 65536 else _U32
+        indices = array(idx_type, (i for t in triangles for i in t))
+
+        pos_view = self._view(_le_bytes(flat), _ARRAY_BUFFER)
+        idx_view = self._view(_le_bytes(indices), _ELEMENT_ARRAY_BUFFER)
+        xs, ys, zs = zip(*positions)
+        self.accessors.append({
+            "bufferView": pos_view, "componentType": _FLOAT, "count": len(positions), "type": "VEC3",
+            "min": [min(xs), min(ys), min(zs)], "max": [max(xs), max(ys), max(zs)],
+        })
+        self.accessors.append({
+            "bufferView": idx_view, "componentType": _UNSIGNED_SHORT if idx_type == "H" else _UNSIGNED_INT,
+            "count": len(indices), "type": "SCALAR",
+        })
+        self.meshes.append({
+            "name": name,
+            "primitives": [{
+                "attributes": {"POSITION": len(self.accessors) - 2},
+                "indices": len(self.accessors) - 1,
+                "material": material,
+            }],
+        })
+        return len(self.meshes) - 1
+
+    def add_node(self, node: Dict[str, Any]) -> int:
+        self.nodes.append(node)
+        return len(self.nodes) - 1
+
+    def to_bytes(self, roots: List[int], origin: Sequence[float], scene_extras: Optional[Dict[str, Any]] = None) -> bytes:
+        extras = {"origin": [float(c) for c in origin], "up_axis": "Y", "source_axes": "IFC Z-up (x, z, -y)"}
+        extras.update(scene_extras or {})
+        doc: Dict[str, Any] = {
+            "asset": {"version": "2.0", "generator": "parcel_project glb_export"},
+            "scene": 0,
+            "scenes": [{"nodes": roots, "extras": extras}],
+            "nodes": self.nodes,
+        }
+        for key, value in (("meshes", self.meshes), ("materials", self.materials),
+                           ("accessors", self.accessors), ("bufferViews", self.buffer_views)):
+            if value:
+                doc[key] = value
+        _pad4(self._bin, b"\x00")
+        if self._bin:
+            doc["buffers"] = [{"byteLength": len(self._bin)}]
+        return _pack_glb(doc, bytes(self._bin))
+
+
+def _pack_glb(doc: Dict[str, Any], bin_chunk: bytes) -> bytes:
+    js = bytearray(json.dumps(doc, separators=(",", ":")).encode("utf-8"))
+    _pad4(js, b" ")
+    chunks = struct.pack("<II", len(js), _CHUNK_JSON) + bytes(js)
+    if bin_chunk:
+        chunks += struct.pack("<II", len(bin_chunk), _CHUNK_BIN) + bin_chunk
+    return struct.pack("<III", _GLB_MAGIC, 2, 12 + len(chunks)) + chunks
+
+
+def read_glb(path: str | Path, json_only: bool = False) -> Tuple[Dict[str, Any], bytes]:
+    """Return (gltf JSON, BIN chunk) of a GLB file."""
+    with open(path, "rb") as fh:
+        magic, version, _length = struct.unpack("<III", fh.read(12))
+        if magic != _GLB_MAGIC or version != 2:
+            raise ValueError(f"{path} is not a glTF 2.0 binary")
+        js_len, js_type = struct.unpack("<II", fh.read(8))
+        if js_type != _CHUNK_JSON:
+            raise ValueError(f"{path}: first GLB chunk is not JSON")
+        doc = json.loads(fh.read(js_len).decode("utf-8"))
+        if json_only:
+            return doc, b""
+        head = fh.read(8)
+        if len(head) < 8:
+            return doc, b""
+        bin_len, _bin_type = struct.unpack("<II", head)
+        return doc, fh.read(bin_len)
+
+
+# =============================================================================
+# Envelope model -> GLB
+# =============================================================================
+
+def _coords(point: Any) -> Vec3:
+    c = list(point.Coordinates) + [0.0, 0.0, 0.0]
+    return float(c[0]), float(c[1]), float(c[2])
+
+
+def _placement_offset(placement: Any) -> Vec3:
+    """World offset of a chain of translation-only IfcLocalPlacements."""
+    x = y = z = 0.0
+    guard = 0
+    while placement is not None and guard < 32:
+        guard += 1
+        rel = getattr(placement, "RelativePlacement", None)
+        loc = getattr(rel, "Location", None) if rel is not None else None
+        if loc is not None:
+            dx, dy, dz = _coords(loc)
+            x, y, z = x + dx, y + dy, z + dz
+        placement = getattr(placement, "PlacementRelTo", None)
+    return x, y, z
+
+
+def _polygon_mesh(faces: Iterable[Sequence[int]], verts: Sequence[Vec3]) -> Tuple[List[Vec3], List[Tuple[int, int, int]]]:
+    tris: List[Tuple[int, int, int]] = []
+    for face in faces:
+        pts = [verts[i] for i in face]
+        tris.extend((face[a], face[b], face[c]) for a, b, c in triangulate_polygon(pts))
+    return list(verts), tris
+
+
+def _extrusion_mesh(item: Any) -> Tuple[List[Vec3], List[Tuple[int, int, int]]]:
+    curve = item.SweptArea.OuterCurve
+    ring = [_coords(p)[:2] for p in curve.Points]
+    if len(ring) > 1 and ring[0] == ring[-1]:
+        ring = ring[:-1]
+    ox, oy, oz = _coords(item.Position.Location) if item.Position is not None else (0.0, 0.0, 0.0)
+    depth = float(item.Depth)
+    n = len(ring)
+    # Extrusions are built CCW-up; make the top face CCW seen from above
+    area2 = sum(ring[i][0] * ring[(i + 1) % n][1] - ring[(i + 1) % n][0] * ring[i][1] for i in range(n))
+    if area2 < 0:
+        ring.reverse()
+    verts = [(x + ox, y + oy, oz) for x, y in ring] + [(x + ox, y + oy, oz + depth) for x, y in ring]
+    faces: List[List[int]] = [list(range(n - 1, -1, -1)), list(range(n, 2 * n))]
+    for i in range(n):
+        j = (i + 1) % n
+        faces.append([i, j, n + j, n + i])
+    return _polygon_mesh(faces, verts)
+
+
+def _faceset_mesh(item: Any) -> Tuple[List[Vec3], List[Tuple[int, int, int]]]:
+    verts = [tuple(float(c) for c in v[:3]) for v in item.Coordinates.CoordList]
+    faces = [[int(i) - 1 for i in f.CoordIndex] for f in item.Faces]
+    return _polygon_mesh(faces, verts)  # type: ignore[arg-type]
+
+
+def _brep_mesh(item: Any) -> Tuple[List[Vec3], List[Tuple[int, int, int]]]:
+    verts: List[Vec3] = []
+    index: Dict[int, int] = {}
+    faces: List[List[int]] = []
+    for face in item.Outer.CfsFaces:
+        for bound in face.Bounds:
+            loop = bound.Bound
+            if not hasattr(loop, "Polygon"):
+                continue
+            idx = []
+            for pt in loop.Polygon:
+                key = pt.id()
+                if key not in index:
+                    index[key] = len(verts)
+                    verts.append(_coords(pt))
+                idx.append(index[key])
+            if not bound.Orientation:
+                idx.reverse()
+            faces.append(idx)
+    return _polygon_mesh(faces, verts)
+
+
+def _item_mesh(item: Any) -> Optional[Tuple[List[Vec3], List[Tuple[int, int, int]]]]:
+    if item.is_a("IfcExtrudedAreaSolid"):
+        return _extrusion_mesh(item)
+    if item.is_a("IfcPolygonalFaceSet"):
+        return _faceset_mesh(item)
+    if item.is_a("IfcFacetedBrep"):
+        return _brep_mesh(item)
+    logger.debug("GLB export skips unsupported item %s", item.is_a())
+    return None
+
+
+def _styles_by_item(model: Any) -> Dict[int, Tuple[str, Tuple[float, float, float], float]]:
+    out = {}
+    for styled in model.by_type("IfcStyledItem"):
+        item = styled.Item
+        if item is None:
+            continue
+        for style in styled.Styles or []:
+            for rendering in getattr(style, "Styles", None) or []:
+                colour = getattr(rendering, "SurfaceColour", None)
+                if colour is None:
+                    continue
+                rgb = (float(colour.Red), float(colour.Green), float(colour.Blue))
+                transparency = float(getattr(rendering, "Transparency", None) or 0.0)
+                out[item.id()] = (str(styled.Name or style.Name or "Style"), rgb, transparency)
+                break
+    return out
+
+
+def _layers_by_item(model: Any) -> Dict[int, str]:
+    out = {}
+    for layer in model.by_type("IfcPresentationLayerAssignment"):
+        for item in layer.AssignedItems or []:
+            out[item.id()] = str(layer.Name)
+    return out
+
+
+def envelope_glb_bytes(model: Any, name: str = "envelope") -> bytes:
+    """Serialize the proxies of an envelope model as a GLB."""
+    styles = _styles_by_item(model)
+    layers = _layers_by_item(model)
+    builder = GlbBuilder()
+
+    proxies = [p for p in model.by_type("IfcBuildingElementProxy") if p.Representation is not None]
+    offsets = [_placement_offset(p.ObjectPlacement) for p in proxies]
+    origin: Vec3 = (
+        min((o[0] for o in offsets), default=0.0),
+        min((o[1] for o in offsets), default=0.0),
+        min((o[2] for o in offsets), default=0.0),
+    )
+
+    roots: List[int] = []
+    for proxy, offset in zip(proxies, offsets):
+        children: List[int] = []
+        for rep in proxy.Representation.Representations or []:
+            for item in rep.Items or []:
+                mesh = _item_mesh(item)
+                if mesh is None:
+                    continue
+                verts, tris = mesh
+                style_name, rgb, transparency = styles.get(item.id(), ("Default", DEFAULT_RGB, 0.0))
+                layer = layers.get(item.id())
+                material = builder.material(style_name, rgb, transparency)
+                mesh_idx = builder.add_mesh(layer or str(proxy.Name), [_to_gltf(v) for v in verts], tris, material)
+                if mesh_idx is None:
+                    continue
+                children.append(builder.add_node({"mesh": mesh_idx, "extras": {"layer": layer}}))
+        if not children:
+            continue
+        delta = (offset[0] - origin[0], offset[1] - origin[1], offset[2] - origin[2])
+        roots.append(builder.add_node({
+            "name": str(proxy.Name or proxy.is_a()),
+            "translation": _to_gltf(delta),
+            "children": children,
+            "extras": {
+                "GlobalId": proxy.GlobalId,
+                "ObjectType": proxy.ObjectType,
+                "Tag": proxy.Tag,
+            },
+        }))
+    return builder.to_bytes(roots, origin, {"name": name})
+
+
+def write_envelope_glb(model: Any, path: str | Path, name: Optional[str] = None) -> str:
+    """Write the GLB of an envelope model next to its IFC. Returns the path."""
+    path = Path(path)
+    data = envelope_glb_bytes(model, name=name or path.stem)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+    return str(path)
+
+
+# =============================================================================
+# Tiles (merged GLBs)
+# =============================================================================
+
+def merge_glbs(sources: Sequence[Tuple[str, str | Path]], name: str = "tile") -> bytes:
+    """
+    Merge GLBs written by this module into one. Each source becomes a named
+    root node (translated from its own origin to the merged origin); materials
+    with identical definitions are shared.
+    """
+    parsed = []
+    for src_name, path in sources:
+        doc, bin_chunk = read_glb(path)
+        origin = (doc.get("scenes") or [{}])[0].get("extras", {}).get("origin") or [0.0, 0.0, 0.0]
+        parsed.append((src_name, doc, bin_chunk, [float(c) for c in origin]))
+
+    origin = [min((p[3][i] for p in parsed), default=0.0) for i in range(3)]
+    out = GlbBuilder()
+    material_ids: Dict[str, int] = {}
+    roots: List[int] = []
+
+    for src_name, doc, bin_chunk, src_origin in parsed:
+        _pad4(out._bin, b"\x00")
+        bin_base = len(out._bin)
+        out._bin += bin_chunk
+        view_base = len(out.buffer_views)
+        for view in doc.get("bufferViews", []):
+            out.buffer_views.append(dict(view, byteOffset=bin_base + int(view.get("byteOffset", 0))))
+        acc_base = len(out.accessors)
+        for acc in doc.get("accessors", []):
+            out.accessors.append(dict(acc, bufferView=view_base + int(acc["bufferView"])))
+        mat_map = {}
+        for i, mat in enumerate(doc.get("materials", [])):
+            key = json.dumps(mat, sort_keys=True)
+            if key not in material_ids:
+                material_ids[key] = len(out.materials)
+                out.materials.append(mat)
+            mat_map[i] = material_ids[key]
+        mesh_base = len(out.meshes)
+        for mesh in doc.get("meshes", []):
+            prims = []
+            for prim in mesh.get("primitives", []):
+                p = dict(prim)
+                p["attributes"] = {k: acc_base + int(v) for k, v in prim.get("attributes", {}).items()}
+                if "indices" in prim:
+                    p["indices"] = acc_base + int(prim["indices"])
+                if "material" in prim:
+                    p["material"] = mat_map[int(prim["material"])]
+                prims.append(p)
+            out.meshes.append(dict(mesh, primitives=prims))
+        node_base = len(out.nodes)
+        for node in doc.get("nodes", []):
+            n = dict(node)
+            if "mesh" in n:
+                n["mesh"] = mesh_base + int(n["mesh"])
+            if "children" in n:
+                n["children"] = [node_base + int(c) for c in n["children"]]
+            out.nodes.append(n)
+
+        src_roots = [node_base + int(r) for r in (doc.get("scenes") or [{}])[0].get("nodes", [])]
+        delta = [src_origin[i] - origin[i] for i in range(3)]
+        roots.append(out.add_node({"name": src_name, "translation": _to_gltf(delta), "children": src_roots}))
+
+    return out.to_bytes(roots, origin, {"name": name, "sources": [s for s, _ in sources]})
+
+
+# One lock per tile file, so different tiles are merged in parallel
+_TILE_LOCKS: Dict[str, threading.Lock] = {}
+_TILE_LOCKS_GUARD = threading.Lock()
+
+
+def _tile_lock(out_path: Path) -> threading.Lock:
+    with _TILE_LOCKS_GUARD:
+        return _TILE_LOCKS.setdefault(str(out_path.resolve()), threading.Lock())
+
+
+def ensure_tile(out_path: str | Path, sources: Sequence[Tuple[str, str | Path]], name: str = "tile") -> Path:
+    """
+    Return a merged tile of `sources`, rebuilding the cached file when it is
+    missing, older than any source, or was built from a different parcel set.
+    """
+    out_path = Path(out_path)
+    sources = sorted((str(n), Path(p)) for n, p in sources)
+    names = [n for n, _ in sources]
+    newest = max((p.stat().st_mtime for _, p in sources), default=0.0)
+    with _tile_lock(out_path):
+        if out_path.exists() and out_path.stat().st_mtime >= newest:
+            try:
+                doc, _ = read_glb(out_path, json_only=True)
+                if doc["scenes"][0]["extras"].get("sources") == names:
+                    return out_path
+            except Exception:
+                pass
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        data = merge_glbs(sources, name=name)
+        tmp = out_path.with_name(out_path.name + ".tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, out_path)
+    return out_path
@@ -0,0 +1,246 @@
+"""
+gzip transfer encoding for HTTP responses.
+
+Responsibilities
+----------------
+- Serve the pre-compressed `<file>.gz` variant of an output (written by
+  compression.py) when the client's Accept-Encoding allows gzip, for
+  single-file routes (precompressed_file_response) and the /outputs mount
+  (PrecompressedStaticFiles).
+- Answer /outputs URLs of files kept only as their `.gz` variant (the plain
+  IFC in "ifczip" mode, which the browser viewer still loads).
+- Compress text responses (JSON, HTML, CSV, metrics, plain IFC text without
+  a variant) on the fly with GZipTextMiddleware.
+
+Notes
+-----
+- Responses that already carry a Content-Encoding (pre-compressed files) are
+  left alone by the middleware, as are binary types (GLB, ZIP) and
+  Server-Sent Events, which must reach the client unbuffered.
+- Streaming text responses are compressed chunk by chunk with a sync flush,
+  so each chunk is delivered as soon as it is produced.
+- Every response that could have been encoded differently gets
+  `Vary: Accept-Encoding` so caches keep the variants apart.
+- A file that exists only as its variant is sent gzip-encoded, or inflated
+  on the fly for the rare client that does not accept gzip.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+import gzip
+import mimetypes
+import os
+import stat
+import zlib
+
+import anyio
+from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.staticfiles import NotModifiedResponse
+
+from compression import GZIP_LEVEL, fresh_gzip_variant, gzip_variant
+
+_COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+)
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    """True if an Accept-Encoding header value allows gzip (q > 0, directly or via *)."""
+    if not accept_encoding:
+        return False
+    star = False
+    for part in accept_encoding.split(","):
+        token, _, params = part.partition(";")
+        token = token.strip().lower()
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if token in ("gzip", "x-gzip"):
+            return q > 0
+        if token == "*":
+            star = q > 0
+    return star
+
+
+def _media_type(path: Path) -> str:
+    return mimetypes.guess_type(path.name)[0] or "text/plain"
+
+
+def precompressed_file_response(
+    accept_encoding: Optional[str],
+    path: str | Path,
+    media_type: Optional[str] = None,
+    filename: Optional[str] = None,
+) -> FileResponse:
+    """
+    FileResponse for `path`, answered from its fresh `.gz` variant with
+    Content-Encoding: gzip when the client accepts it.
+    """
+    path = Path(path)
+    headers = {"Vary": "Accept-Encoding"}
+    gz = fresh_gzip_variant(path) if accepts_gzip(accept_encoding) else None
+    if gz is None:
+        return FileResponse(path, filename=filename, media_type=media_type, headers=headers)
+    headers["Content-Encoding"] = "gzip"
+    return FileResponse(gz, filename=filename, media_type=media_type or _media_type(path), headers=headers)
+
+
+def _inflate(path: Path, chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+    with gzip.open(path, "rb") as fin:
+        while chunk := fin.read(chunk_size):
+            yield chunk
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    StaticFiles answering from `<file>.gz` when it is fresh and the client
+    accepts gzip, and from `<file>.gz` alone when `<file>` no longer exists.
+    """
+
+    async def get_response(self, path: str, scope):
+        try:
+            return await super().get_response(path, scope)
+        except HTTPException as exc:
+            if exc.status_code != 404 or path.endswith(".gz"):
+                raise
+            gz, stat_result = await anyio.to_thread.run_sync(self.lookup_path, str(gzip_variant(path)))
+            if not (stat_result and stat.S_ISREG(stat_result.st_mode)):
+                raise
+            return self.variant_only_response(gz, stat_result, scope)
+
+    def variant_only_response(self, gz, stat_result, scope):
+        """Response for a file kept only as its `.gz` variant at `gz`."""
+        request_headers = Headers(scope=scope)
+        media_type = _media_type(Path(gz).with_suffix(""))
+        if not accepts_gzip(request_headers.get("accept-encoding")):
+            return StreamingResponse(_inflate(Path(gz)), media_type=media_type, headers={"Vary": "Accept-Encoding"})
+        response = FileResponse(
+            gz,
+            media_type=media_type,
+            stat_result=stat_result,
+            headers={"Content-Encoding": "gzip", "Vary": "Accept-Encoding"},
+        )
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200):
+        request_headers = Headers(scope=scope)
+        gz = fresh_gzip_variant(full_path) if accepts_gzip(request_headers.get("accept-encoding")) else None
+        if gz is None:
+            response = super().file_response(full_path, stat_result, scope, status_code)
+            response.headers.setdefault("vary", "Accept-Encoding")
+            return response
+        response = FileResponse(
+            gz,
+            status_code=status_code,
+            media_type=_media_type(Path(full_path)),
+            stat_result=os.stat(gz),
+            headers={"Content-Encoding": "gzip", "Vary": "Accept-Encoding"},
+        )
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+def _compressible(content_type: str) -> bool:
+    ct = content_type.split(";", 1)[0].strip().lower()
+    if ct == "text/event-stream":
+        return False
+    return ct.startswith("text/") or ct in _COMPRESSIBLE_TYPES or ct.endswith(("+json", "+xml"))
+
+
+class GZipTextMiddleware:
+    """
+    ASGI middleware gzip-encoding text responses of at least `minimum_size`
+    bytes for clients that accept gzip.
+    """
+
+    def __init__(self, app: Any, minimum_size: int = 1024, compresslevel: int = GZIP_LEVEL) -> None:
+        self.app = app
+        self.minimum_size = int(minimum_size)
+        self.compresslevel = int(compresslevel)
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or not accepts_gzip(Headers(scope=scope).get("accept-encoding")):
+            await self.app(scope, receive, send)
+            return
+        responder = _GZipResponder(send, self.minimum_size, self.compresslevel)
+        await self.app(scope, receive, responder.send_message)
+
+
+class _GZipResponder:
+    """Holds back http.response.start until the first body chunk decides the encoding."""
+
+    def __init__(self, send, minimum_size: int, compresslevel: int) -> None:
+        self.send = send
+        self.minimum_size = minimum_size
+        self.compresslevel = compresslevel
+        self.start: Optional[Dict[str, Any]] = None
+        self.compressor = None
+        self.passthrough = False
+
+    async def send_message(self, message: Dict[str, Any]) -> None:
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self._send_start()
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more = message.get("more_body", False)
+
+        if self.compressor is None:
+            headers = Headers(raw=self.start["headers"])
+            if (
+                "content-encoding" in headers
+                or not _compressible(headers.get("content-type", ""))
+                or (not more and len(body) < self.minimum_size)
+            ):
+                self.passthrough = True
+                await self._send_start()
+                await self.send(message)
+                return
+            self.compressor = zlib.compressobj(self.compresslevel, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            data = self._compress(body, more)
+            self._encode_start(None if more else len(data))
+            await self._send_start()
+            await self.send({"type": "http.response.body", "body": data, "more_body": more})
+            return
+
+        await self.send({"type": "http.response.body", "body": self._compress(body, more), "more_body": more})
+
+    def _compress(self, body: bytes, more: bool) -> bytes:
+        return self.compressor.compress(body) + self.compressor.flush(zlib.Z_SYNC_FLUSH if more else zlib.Z_FINISH)
+
+    def _encode_start(self, length: Optional[int]) -> None:
+        raw: List = [(k, v) for k, v in self.start["headers"] if k.lower() not in (b"content-length", b"vary")]
+        vary = [v for k, v in self.start["headers"] if k.lower() == b"vary"]
+        varies = {s.strip().lower() for v in vary for s in v.decode("latin-1").split(",")}
+        if "accept-encoding" not in varies:
+            vary.append(b"Accept-Encoding")
+        raw.append((b"vary", b", ".join(vary)))
+        raw.append((b"content-encoding", b"gzip"))
+        if length is not None:
+            raw.append((b"content-length", str(length).encode("latin-1")))
+        self.start = {**self.start, "headers": raw}
+
+    async def _send_start(self) -> None:
+        if self.start is not None:
+            start, self.start = self.start, None
+            await self.send(start)
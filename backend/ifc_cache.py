@@ -0,0 +1,195 @@
+"""
+Process-wide cache of parsed IFC files.
+
+Responsibilities
+----------------
+- open_ifc(path): the ifcopenshell.file of `path`, parsed once and shared
+  while the file keeps the same size and modification time.
+- derived(path, name, compute): artefacts computed from a parsed model
+  (footprints, bboxes, base Z, the tessellated MeshStore, ...), cached next
+  to the model and dropped with it. Artefacts exposing `nbytes` count
+  toward the budget.
+- LRU eviction under a memory budget (config: ifc_model_cache_mb).
+
+Notes
+-----
+- Entries are keyed by resolved path and validated against (size, mtime_ns)
+  on every lookup, so a re-uploaded or regenerated file is parsed again.
+- ifcopenshell does not report the memory of a parsed model; it is
+  estimated as PARSED_SIZE_FACTOR times the STEP size (the uncompressed
+  size for .ifczip). A model estimated above the whole budget is parsed but
+  not kept; a budget of 0 disables caching.
+- Concurrent first lookups of the same file parse it once (per-path lock);
+  different files are parsed in parallel. Likewise each derived artefact is
+  computed once per model (per-(path, name) lock kept on the entry, so it
+  goes away with it); path locks are pruned when their entry is dropped.
+- Cached models and artefacts are shared between requests and threads:
+  callers must treat them as read-only.
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+import threading
+import zipfile
+
+import ifcopenshell
+
+from config import IFC_MODEL_CACHE_BYTES
+from metrics import record_cache
+
+# Parsed ifcopenshell models take roughly this many bytes per STEP byte
+PARSED_SIZE_FACTOR = 10
+
+
+def _file_key(path: Path) -> Tuple[int, int]:
+    st = path.stat()
+    return st.st_size, st.st_mtime_ns
+
+
+def _estimated_bytes(path: Path, size: int) -> int:
+    step_size = size
+    if path.suffix.lower() == ".ifczip":
+        try:
+            with zipfile.ZipFile(path) as zf:
+                step_size = sum(info.file_size for info in zf.infolist())
+        except Exception:
+            pass
+    return step_size * PARSED_SIZE_FACTOR
+
+
+@dataclass
+class _Entry:
+    key: Tuple[int, int]
+    model: Any
+    cost: int
+    derived: Dict[Hashable, Any] = field(default_factory=dict)
+    derived_locks: Dict[Hashable, threading.Lock] = field(default_factory=dict)
+
+
+class IfcModelCache:
+    """LRU of parsed IFC models (and their derived artefacts) within `max_bytes`."""
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = int(max_bytes)
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._path_locks: Dict[str, threading.Lock] = {}
+
+    @property
+    def used_bytes(self) -> int:
+        return self._bytes
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _current(self, name: str, key: Tuple[int, int]) -> Optional[_Entry]:
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                return None
+            if entry.key != key:
+                self._drop(name)
+                return None
+            self._entries.move_to_end(name)
+            return entry
+
+    def _drop(self, name: str) -> None:
+        entry = self._entries.pop(name, None)
+        if entry is not None:
+            self._bytes -= entry.cost
+        self._prune_path_lock(name)
+
+    def _prune_path_lock(self, name: str) -> None:
+        """Forget the per-path lock of `name` unless a thread is using it."""
+        path_lock = self._path_locks.get(name)
+        if path_lock is not None and not path_lock.locked():
+            del self._path_locks[name]
+
+    def _evict(self, keep: _Entry) -> None:
+        """Drop least recently used entries (never `keep`) until within budget."""
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            oldest = next(iter(self._entries))
+            if self._entries[oldest] is keep:
+                break
+            self._drop(oldest)
+
+    def _load(self, path: Path) -> _Entry:
+        """Entry for `path`, parsing the file if no current entry exists."""
+        name = str(path)
+        key = _file_key(path)
+        entry = self._current(name, key)
+        if entry is not None:
+            record_cache("ifc_model", True)
+            return entry
+
+        with self._lock:
+            path_lock = self._path_locks.setdefault(name, threading.Lock())
+        with path_lock:
+            # Another thread may have parsed it while we waited
+            entry = self._current(name, key)
+            if entry is not None:
+                record_cache("ifc_model", True)
+                return entry
+            record_cache("ifc_model", False)
+            entry = _Entry(key=key, model=ifcopenshell.open(name), cost=_estimated_bytes(path, key[0]))
+            if entry.cost > self.max_bytes:
+                with self._lock:
+                    self._path_locks.pop(name, None)
+                return entry
+            with self._lock:
+                self._drop(name)
+                self._entries[name] = entry
+                self._bytes += entry.cost
+                self._evict(keep=entry)
+            return entry
+
+    def open(self, path: str | Path) -> Any:
+        """Parsed model of `path` (shared; do not modify)."""
+        return self._load(Path(path).resolve()).model
+
+    def derived(self, path: str | Path, name: Hashable, compute: Callable[[Any], Any]) -> Any:
+        """
+        `compute(model)` for the parsed model of `path`, cached under `name`
+        for as long as the model stays cached. Exceptions are not cached.
+        """
+        entry = self._load(Path(path).resolve())
+        if name in entry.derived:
+            record_cache("ifc_derived", True)
+            return entry.derived[name]
+
+        with self._lock:
+            name_lock = entry.derived_locks.setdefault(name, threading.Lock())
+        with name_lock:
+            # Another thread may have computed it while we waited
+            if name in entry.derived:
+                record_cache("ifc_derived", True)
+                return entry.derived[name]
+            record_cache("ifc_derived", False)
+            value = compute(entry.model)
+            entry.derived[name] = value
+        extra = int(getattr(value, "nbytes", 0) or 0)
+        if extra:
+            with self._lock:
+                if self._entries.get(str(Path(path).resolve())) is entry:
+                    entry.cost += extra
+                    self._bytes += extra
+                    self._evict(keep=entry)
+        return value
+
+
+_CACHE = IfcModelCache(IFC_MODEL_CACHE_BYTES)
+
+
+def open_ifc(path: str | Path) -> Any:
+    """Parsed ifcopenshell model of `path` from the process-wide cache."""
+    return _CACHE.open(path)
+
+
+def derived(path: str | Path, name: Hashable, compute: Callable[[Any], Any]) -> Any:
+    """Artefact `name` of the IFC at `path`, computed once per parsed model."""
+    return _CACHE.derived(path, name, compute)
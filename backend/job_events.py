@@ -0,0 +1,100 @@
+"""
+Per-job event fan-out for push progress streams (SSE).
+
+Responsibilities
+----------------
+- Let worker threads publish job events (status, progress, stage, log, file, end).
+- Deliver them to any number of asyncio subscribers without polling.
+- Format events as Server-Sent Events frames.
+
+Notes
+-----
+- Publishing never blocks a worker: events are handed to each subscriber's
+  event loop with call_soon_threadsafe.
+- Subscriber queues are bounded; a slow client that overflows is marked as
+  lagged and receives a fresh snapshot instead of the dropped events.
+- Jobs without subscribers cost one dict lookup per event.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+import asyncio
+import json
+import threading
+
+# Max undelivered events per subscriber before it is marked lagged
+SUBSCRIBER_QUEUE_SIZE = 1000
+
+# Statuses after which a job emits no further events
+TERMINAL_STATUSES = ("success", "error", "cancelled")
+
+
+@dataclass
+class Subscription:
+    """One stream consumer bound to an asyncio event loop."""
+    job_id: str
+    loop: asyncio.AbstractEventLoop
+    queue: asyncio.Queue = field(default_factory=lambda: asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE))
+    lagged: bool = False
+
+    def _offer(self, event: Dict[str, Any]) -> None:
+        # Runs on the subscriber's loop
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.lagged = True
+
+
+_LOCK = threading.Lock()
+_SUBSCRIBERS: Dict[str, List[Subscription]] = {}
+
+
+def subscribe(job_id: str) -> Subscription:
+    """Register a subscriber for a job. Must be called from a running event loop."""
+    sub = Subscription(job_id=job_id, loop=asyncio.get_running_loop())
+    with _LOCK:
+        _SUBSCRIBERS.setdefault(job_id, []).append(sub)
+    return sub
+
+
+def unsubscribe(sub: Subscription) -> None:
+    with _LOCK:
+        subs = _SUBSCRIBERS.get(sub.job_id)
+        if not subs:
+            return
+        if sub in subs:
+            subs.remove(sub)
+        if not subs:
+            _SUBSCRIBERS.pop(sub.job_id, None)
+
+
+def publish(job_id: str, event: str, data: Dict[str, Any], event_id: Optional[int] = None) -> None:
+    """Send an event to every subscriber of `job_id` (thread-safe, non-blocking)."""
+    with _LOCK:
+        subs = list(_SUBSCRIBERS.get(job_id) or ())
+    if not subs:
+        return
+    payload = {"event": event, "id": event_id, "data": data}
+    for sub in subs:
+        try:
+            sub.loop.call_soon_threadsafe(sub._offer, payload)
+        except RuntimeError:
+            # Loop already closed; the subscriber is gone
+            unsubscribe(sub)
+
+
+def subscriber_count(job_id: str) -> int:
+    with _LOCK:
+        return len(_SUBSCRIBERS.get(job_id) or ())
+
+
+def format_sse(event: str, data: Dict[str, Any], event_id: Optional[int] = None) -> str:
+    """Encode one Server-Sent Events frame."""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append("data: " + json.dumps(data, ensure_ascii=False, default=str))
+    return "\n".join(lines) + "\n\n"
@@ -0,0 +1,310 @@
+"""
+SQLite persistence for job records.
+
+Responsibilities
+----------------
+- Store job records (status, progress, logs, files, meta) in one SQLite table.
+- Look jobs up by id, or list them by status / municipality via indexes.
+- Apply a retention policy (max age, max count) to finished jobs.
+- Mark jobs left queued/running by a previous process as interrupted.
+- Keep per-parcel batch checkpoints so an interrupted batch can be resumed.
+- Keep per-parcel stage timings in their own table, one row per parcel, so
+  saving a job never re-serializes them.
+
+Notes
+-----
+- The database runs in WAL mode so API reads do not block worker writes.
+- One connection is shared by all threads and serialized with a lock.
+- Records are plain dicts; jobs.py converts them to/from Job objects.
+- List-like fields (files, logs, meta, options) are stored as JSON.
+- Schema 1 kept the timings as a JSON column of jobs; opening such a
+  database moves them into job_parcel_timings and drops the column
+  (ALTER TABLE ... DROP COLUMN, SQLite >= 3.35).
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import json
+import sqlite3
+import threading
+import time
+
+SCHEMA_VERSION = 2
+
+# Statuses that can be evicted by the retention policy
+FINISHED_STATUSES = ("success", "error", "cancelled")
+
+_COLUMNS = (
+    "id", "municipality", "all_parcels", "refcat", "status", "progress", "message",
+    "created_at", "started_at", "finished_at", "files", "logs", "log_seq", "meta",
+    "options",
+)
+_JSON_COLUMNS = ("files", "logs", "meta", "options")
+_LIST_COLUMNS = ("files", "logs")
+
+_DDL = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    municipality TEXT NOT NULL,
+    all_parcels INTEGER NOT NULL,
+    refcat TEXT,
+    status TEXT NOT NULL,
+    progress REAL NOT NULL,
+    message TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    files TEXT NOT NULL,
+    logs TEXT NOT NULL,
+    log_seq INTEGER NOT NULL,
+    meta TEXT NOT NULL,
+    options TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_municipality ON jobs(municipality, created_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_finished_at ON jobs(finished_at);
+CREATE TABLE IF NOT EXISTS job_checkpoints (
+    job_id TEXT NOT NULL,
+    refcat TEXT NOT NULL,
+    input_hash TEXT NOT NULL,
+    entry TEXT NOT NULL,
+    PRIMARY KEY (job_id, refcat)
+);
+CREATE TABLE IF NOT EXISTS job_parcel_timings (
+    job_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    record TEXT NOT NULL,
+    PRIMARY KEY (job_id, seq)
+);
+"""
+
+_INSERT_TIMING = (
+    "INSERT INTO job_parcel_timings (job_id, seq, record) VALUES "
+    "(?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM job_parcel_timings WHERE job_id = ?), ?)"
+)
+
+
+class JobStore:
+    """Thread-safe SQLite table of job records."""
+
+    def __init__(self, db_path: str | Path) -> None:
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_DDL)
+            self._migrate_parcel_timings()
+            self._conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+
+    def _migrate_parcel_timings(self) -> None:
+        """Schema 1 -> 2: move the jobs.parcel_timings JSON column into its own table."""
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        if "parcel_timings" not in columns:
+            return
+        rows = []
+        for job_id, raw in self._conn.execute("SELECT id, parcel_timings FROM jobs").fetchall():
+            try:
+                records = json.loads(raw) or []
+            except Exception:
+                records = []
+            rows.extend((job_id, seq, json.dumps(rec, default=str)) for seq, rec in enumerate(records, 1))
+        self._conn.execute("BEGIN")
+        try:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO job_parcel_timings (job_id, seq, record) VALUES (?, ?, ?)", rows
+            )
+            self._conn.execute("ALTER TABLE jobs DROP COLUMN parcel_timings")
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    # ------------------------------------------------------------------ rows
+
+    @staticmethod
+    def _to_row(record: Dict[str, Any]) -> tuple:
+        values = []
+        for col in _COLUMNS:
+            v = record.get(col)
+            if col in _JSON_COLUMNS:
+                v = json.dumps(v if v is not None else ([] if col in _LIST_COLUMNS else {}), default=str)
+            elif col == "all_parcels":
+                v = 1 if v else 0
+            elif col == "message":
+                v = v or ""
+            values.append(v)
+        return tuple(values)
+
+    @staticmethod
+    def _from_row(row: sqlite3.Row) -> Dict[str, Any]:
+        out = dict(row)
+        for col in _JSON_COLUMNS:
+            if col in out:
+                try:
+                    out[col] = json.loads(out[col])
+                except Exception:
+                    out[col] = [] if col in _LIST_COLUMNS else {}
+        if "all_parcels" in out:
+            out["all_parcels"] = bool(out["all_parcels"])
+        return out
+
+    # --------------------------------------------------------------- queries
+
+    def save(self, record: Dict[str, Any]) -> None:
+        """Insert or replace one job record."""
+        placeholders = ",".join("?" for _ in _COLUMNS)
+        sql = f"INSERT OR REPLACE INTO jobs ({','.join(_COLUMNS)}) VALUES ({placeholders})"
+        row = self._to_row(record)
+        with self._lock:
+            self._conn.execute(sql, row)
+
+    def load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._from_row(row) if row is not None else None
+
+    def delete(self, job_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+            self._conn.execute("DELETE FROM job_checkpoints WHERE job_id = ?", (job_id,))
+            self._conn.execute("DELETE FROM job_parcel_timings WHERE job_id = ?", (job_id,))
+
+    def add_parcel_timing(self, job_id: str, record: Dict[str, Any]) -> None:
+        """Append one parcel's stage timing record to a job."""
+        with self._lock:
+            self._conn.execute(_INSERT_TIMING, (job_id, job_id, json.dumps(record, default=str)))
+
+    def load_parcel_timings(self, job_id: str) -> List[Dict[str, Any]]:
+        """Every parcel timing record of a job, in recording order."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT record FROM job_parcel_timings WHERE job_id = ? ORDER BY seq", (job_id,)
+            ).fetchall()
+        out: List[Dict[str, Any]] = []
+        for (record,) in rows:
+            try:
+                out.append(json.loads(record))
+            except Exception:
+                continue
+        return out
+
+    def add_checkpoint(self, job_id: str, refcat: str, entry: Dict[str, Any]) -> None:
+        """Durably record one completed parcel of a batch job (manifest entry format)."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO job_checkpoints (job_id, refcat, input_hash, entry) VALUES (?, ?, ?, ?)",
+                (job_id, refcat, str(entry.get("input_hash") or ""), json.dumps(entry, default=str)),
+            )
+
+    def add_checkpoints(self, job_id: str, entries: Dict[str, Dict[str, Any]]) -> None:
+        """Bulk variant of add_checkpoint (one transaction)."""
+        rows = [
+            (job_id, rc, str(e.get("input_hash") or ""), json.dumps(e, default=str))
+            for rc, e in entries.items()
+        ]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO job_checkpoints (job_id, refcat, input_hash, entry) VALUES (?, ?, ?, ?)",
+                    rows,
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def load_checkpoints(self, job_id: str) -> Dict[str, Dict[str, Any]]:
+        """Return {refcat: entry} for every checkpointed parcel of a job."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT refcat, entry FROM job_checkpoints WHERE job_id = ?", (job_id,)
+            ).fetchall()
+        out: Dict[str, Dict[str, Any]] = {}
+        for refcat, entry in rows:
+            try:
+                out[refcat] = json.loads(entry)
+            except Exception:
+                continue
+        return out
+
+    def list(
+        self,
+        status: Optional[str] = None,
+        municipality: Optional[str] = None,
+        limit: int = 100,
+    ) -> List[Dict[str, Any]]:
+        """Newest-first job summaries (without logs), filtered by status and/or municipality."""
+        cols = "id, municipality, all_parcels, refcat, status, progress, message, created_at, started_at, finished_at"
+        where, args = [], []
+        if status:
+            where.append("status = ?")
+            args.append(status)
+        if municipality:
+            where.append("municipality = ?")
+            args.append(municipality)
+        sql = f"SELECT {cols} FROM jobs"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY created_at DESC LIMIT ?"
+        args.append(int(limit))
+        with self._lock:
+            rows = self._conn.execute(sql, args).fetchall()
+        return [self._from_row(r) for r in rows]
+
+    def count_by_status(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {r[0]: int(r[1]) for r in rows}
+
+    def mark_interrupted(self, message: str = "Interrupted by service restart.") -> int:
+        """Turn jobs left queued/running by a previous process into errors."""
+        now = time.time()
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE jobs SET status = 'error', message = ?, finished_at = ? "
+                "WHERE status IN ('queued', 'running')",
+                (message, now),
+            )
+        return cur.rowcount
+
+    def apply_retention(self, max_age_s: Optional[float], max_count: Optional[int]) -> int:
+        """
+        Delete finished jobs older than `max_age_s` and keep at most `max_count`
+        finished jobs (newest first). Returns the number of deleted rows.
+        """
+        placeholders = ",".join("?" for _ in FINISHED_STATUSES)
+        deleted = 0
+        with self._lock:
+            if max_age_s is not None and max_age_s > 0:
+                cur = self._conn.execute(
+                    f"DELETE FROM jobs WHERE status IN ({placeholders}) AND finished_at < ?",
+                    (*FINISHED_STATUSES, time.time() - float(max_age_s)),
+                )
+                deleted += max(cur.rowcount, 0)
+            if max_count is not None and max_count >= 0:
+                cur = self._conn.execute(
+                    f"DELETE FROM jobs WHERE id IN ("
+                    f"  SELECT id FROM jobs WHERE status IN ({placeholders})"
+                    f"  ORDER BY finished_at DESC LIMIT -1 OFFSET ?)",
+                    (*FINISHED_STATUSES, int(max_count)),
+                )
+                deleted += max(cur.rowcount, 0)
+            if deleted:
+                self._conn.execute(
+                    "DELETE FROM job_checkpoints WHERE job_id NOT IN (SELECT id FROM jobs)"
+                )
+                self._conn.execute(
+                    "DELETE FROM job_parcel_timings WHERE job_id NOT IN (SELECT id FROM jobs)"
+                )
+        return deleted
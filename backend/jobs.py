@@ -1,24 +1,56 @@
 """
-In-memory job registry for envelope generation.
+Job registry for envelope generation.
 
 Responsibilities
 ----------------
-- Stores all job objects in memory (no persistence).
+- Keeps active (queued/running) jobs in an in-memory hot cache (JOBS).
+- Persists every job to SQLite (job_store.py) so history survives restarts.
 - Provides lightweight helpers to create jobs, fetch jobs, and append logs.
+- Keeps job logs in a bounded ring buffer with sequence numbers so pollers
+  can fetch only lines they have not seen yet.
 - Used by the API layer and background workers to track progress and results.
+- Publishes status/progress/log/file changes to job_events subscribers.
 
 Notes
 -----
-- All state is lost on process restart.
+- Finished jobs are evicted from JOBS and read back from SQLite on demand;
+  the retention policy (config: job_retention_days, job_retention_max_count)
+  bounds the database.
+- Batch jobs checkpoint each completed parcel, so an interrupted batch can be
+  resumed by a new job that skips parcels with unchanged inputs.
+- Running jobs are checkpointed on status changes and at most every
+  PERSIST_INTERVAL_S on progress; jobs interrupted by a restart are marked
+  as errors at startup.
 - Thread-safety is minimal; callers should avoid heavy concurrent writes.
+- Only the last LOG_BUFFER_SIZE lines are kept per job; sequence numbers keep
+  increasing, so a reader can tell when lines were dropped.
+- Per-parcel stage timings are not kept on the Job: each record goes to the
+  store as it is produced and is read back for summaries and exports.
 """
 
 from __future__ import annotations
+from collections import deque
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional, Any
+from pathlib import Path
+from typing import Deque, Dict, List, Optional, Any, Tuple
 import time
 import uuid
 
+from config import JOB_DB_PATH, JOB_RETENTION_DAYS, JOB_RETENTION_MAX_COUNT
+from job_events import publish
+from job_store import JobStore
+
+# Max log lines retained per job (older lines are dropped)
+LOG_BUFFER_SIZE = 2000
+
+# Min seconds between progress checkpoints of a running job
+PERSIST_INTERVAL_S = 5.0
+
+
+def _new_log_buffer() -> Deque[Tuple[int, float, str]]:
+    return deque(maxlen=LOG_BUFFER_SIZE)
+
+
 @dataclass
 class Job:
     """
@@ -30,30 +62,112 @@ class Job:
     municipality: Municipality name.
     all_parcels: True for batch jobs; False for a single parcel.
     refcat: Cadastral reference code (only for single-parcel jobs).
-    status: Job state (queued | running | success | error).
+    status: Job state (queued | running | success | error | cancelled).
     progress: Completion ratio in [0.0, 1.0].
     message: Last status or error message.
     created_at/started_at/finished_at: Timestamps (epoch seconds).
     files: Output file paths produced by the job.
-    logs: Append-only log lines for UI or diagnostics.
+    logs: Ring buffer of (seq, timestamp, line) for UI or diagnostics.
+    log_seq: Sequence number of the last appended line (0 = none yet).
+    options: Request-level switches for the worker (e.g. incremental batch).
+    cancel_requested: Set by DELETE /jobs/{id}; workers stop at the next check.
+    file_index: File name -> path for downloads (derived from files, not persisted).
     """
     id: str
     municipality: str
     all_parcels: bool
     refcat: Optional[str]
-    status: str = "queued"          # queued | running | success | error
+    status: str = "queued"          # queued | running | success | error | cancelled
     progress: float = 0.0           # 0..1
     message: str = ""
     created_at: float = field(default_factory=time.time)
     started_at: Optional[float] = None
     finished_at: Optional[float] = None
     files: List[str] = field(default_factory=list)   # absolute paths
-    logs: List[str] = field(default_factory=list)
+    logs: Deque[Tuple[int, float, str]] = field(default_factory=_new_log_buffer)
+    log_seq: int = 0
     meta: Dict[str, Any] = field(default_factory=dict)
+    options: Dict[str, Any] = field(default_factory=dict)
+    cancel_requested: bool = False
+    file_index: Dict[str, str] = field(default_factory=dict, repr=False)
 
+# Hot cache: active jobs only (finished jobs live in the store)
 JOBS: Dict[str, Job] = {}
 
-def create_job(municipality: str, all_parcels: bool, refcat: Optional[str]) -> Job:
+_STORE: Optional[JobStore] = None
+_LAST_PERSIST: Dict[str, float] = {}
+
+def get_store() -> JobStore:
+    """
+    Return the process-wide job store, opening it on first use.
+    """
+    global _STORE
+    if _STORE is None:
+        _STORE = JobStore(JOB_DB_PATH)
+    return _STORE
+
+def init_job_store() -> Dict[str, int]:
+    """
+    Open the store, mark jobs orphaned by a previous process and apply retention.
+    """
+    store = get_store()
+    interrupted = store.mark_interrupted()
+    evicted = store.apply_retention(JOB_RETENTION_DAYS * 86400.0, JOB_RETENTION_MAX_COUNT)
+    return {"interrupted": interrupted, "evicted": evicted}
+
+def _job_to_record(job: Job) -> Dict[str, Any]:
+    return {
+        "id": job.id,
+        "municipality": job.municipality,
+        "all_parcels": job.all_parcels,
+        "refcat": job.refcat,
+        "status": job.status,
+        "progress": job.progress,
+        "message": job.message,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "files": list(job.files),
+        "logs": [list(entry) for entry in list(job.logs)],
+        "log_seq": job.log_seq,
+        "meta": job.meta,
+        "options": job.options,
+    }
+
+def _job_from_record(rec: Dict[str, Any]) -> Job:
+    logs = _new_log_buffer()
+    logs.extend((int(seq), float(ts), str(line)) for seq, ts, line in rec.get("logs") or [])
+    return Job(
+        id=rec["id"],
+        municipality=rec["municipality"],
+        all_parcels=bool(rec["all_parcels"]),
+        refcat=rec.get("refcat"),
+        status=rec.get("status") or "error",
+        progress=float(rec.get("progress") or 0.0),
+        message=rec.get("message") or "",
+        created_at=float(rec.get("created_at") or 0.0),
+        started_at=rec.get("started_at"),
+        finished_at=rec.get("finished_at"),
+        files=list(rec.get("files") or []),
+        logs=logs,
+        log_seq=int(rec.get("log_seq") or 0),
+        meta=dict(rec.get("meta") or {}),
+        options=dict(rec.get("options") or {}),
+    )
+
+def persist_job(job: Job) -> None:
+    """
+    Write the current job state to the store.
+    """
+    get_store().save(_job_to_record(job))
+    _LAST_PERSIST[job.id] = time.time()
+
+def create_job(
+    municipality: str,
+    all_parcels: bool,
+    refcat: Optional[str],
+    options: Optional[Dict[str, Any]] = None,
+) -> Job:
     """
     Create a new Job, assign a unique id, and store it in the in-memory registry.
 
@@ -62,21 +176,214 @@ def create_job(municipality: str, all_parcels: bool, refcat: Optional[str]) -> J
     municipality: Name of the municipality.
     all_parcels: True for batch jobs; False for a single parcel.
     refcat: Parcel reference code for single jobs (can be None for batch).
+    options: Optional worker switches (e.g. {"incremental": True}).
     """
     jid = uuid.uuid4().hex
-    job = Job(id=jid, municipality=municipality, all_parcels=all_parcels, refcat=refcat)
+    job = Job(
+        id=jid,
+        municipality=municipality,
+        all_parcels=all_parcels,
+        refcat=refcat,
+        options=dict(options or {}),
+    )
     JOBS[jid] = job
+    persist_job(job)
     return job
 
 def get_job(job_id: str) -> Optional[Job]:
     """
-    Return the Job by id, or None if it does not exist.
+    Return the Job by id (hot cache first, then the store), or None if it does not exist.
+    """
+    job = JOBS.get(job_id)
+    if job is not None:
+        return job
+    rec = get_store().load(job_id)
+    return _job_from_record(rec) if rec is not None else None
+
+def checkpoint_parcel(job: Job, refcat: str, entry: Dict[str, Any]) -> None:
+    """
+    Durably record a completed batch parcel (manifest entry) for resume.
+    """
+    get_store().add_checkpoint(job.id, refcat, entry)
+
+def checkpoint_parcels(job: Job, entries: Dict[str, Dict[str, Any]]) -> None:
+    """
+    Record several completed parcels at once (e.g. carried over on resume).
+    """
+    if entries:
+        get_store().add_checkpoints(job.id, entries)
+
+def load_checkpoints(job_id: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Return {refcat: manifest entry} checkpointed by a batch job.
+    """
+    return get_store().load_checkpoints(job_id)
+
+def add_parcel_timing(job: Job, record: Dict[str, Any]) -> None:
+    """
+    Record one parcel's stage durations (written straight to the store).
+    """
+    get_store().add_parcel_timing(job.id, record)
+
+def load_parcel_timings(job_id: str) -> List[Dict[str, Any]]:
+    """
+    Return every parcel timing record of a job, in recording order.
+    """
+    return get_store().load_parcel_timings(job_id)
+
+def discard_job(job: Job) -> None:
+    """
+    Forget a job that was never started (e.g. rejected by a full queue).
+    """
+    JOBS.pop(job.id, None)
+    _LAST_PERSIST.pop(job.id, None)
+    get_store().delete(job.id)
+
+def list_jobs(
+    status: Optional[str] = None,
+    municipality: Optional[str] = None,
+    limit: int = 100,
+) -> List[Dict[str, Any]]:
+    """
+    Newest-first job summaries from the store, with live state for active jobs.
     """
-    return JOBS.get(job_id)
+    rows = get_store().list(status=status, municipality=municipality, limit=limit)
+    for row in rows:
+        live = JOBS.get(row["id"])
+        if live is not None:
+            row.update(status=live.status, progress=live.progress, message=live.message)
+    return rows
+
+def job_counts() -> Dict[str, int]:
+    """
+    Number of stored jobs per status.
+    """
+    return get_store().count_by_status()
+
+def finish_job(job: Job) -> None:
+    """
+    Persist the final state, notify stream subscribers, evict the job from
+    the hot cache and apply the retention policy.
+    """
+    persist_job(job)
+    publish_end(job)
+    JOBS.pop(job.id, None)
+    _LAST_PERSIST.pop(job.id, None)
+    get_store().apply_retention(JOB_RETENTION_DAYS * 86400.0, JOB_RETENTION_MAX_COUNT)
 
 def append_log(job: Job, line: str) -> None:
     """
     Append a log line to the job and update the last message.
     """
-    job.logs.append(line)
+    job.log_seq += 1
+    ts = time.time()
+    job.logs.append((job.log_seq, ts, line))
     job.message = line
+    publish(job.id, "log", {"seq": job.log_seq, "ts": ts, "line": line}, event_id=job.log_seq)
+
+def set_status(job: Job, status: str, message: Optional[str] = None) -> None:
+    """
+    Update the job status (and `message`, if given) and notify subscribers.
+    """
+    job.status = status
+    if message is not None:
+        job.message = message
+    persist_job(job)
+    publish(job.id, "status", {"status": status, "message": job.message})
+
+def set_progress(job: Job, progress: float) -> None:
+    """
+    Update the completion ratio and notify subscribers.
+    """
+    job.progress = progress
+    if time.time() - _LAST_PERSIST.get(job.id, 0.0) >= PERSIST_INTERVAL_S:
+        persist_job(job)
+    publish(job.id, "progress", {"progress": progress})
+
+def add_file(job: Job, path: str) -> None:
+    """
+    Record a produced output file and notify subscribers.
+    """
+    job.files.append(path)
+    job.file_index.setdefault(Path(path).name, path)
+    publish(job.id, "file", {"file": Path(path).name, "path": path})
+
+def find_job_file(job: Job, filename: str) -> Optional[str]:
+    """
+    Return the path of the job output called `filename`, or None (O(1)).
+    """
+    path = job.file_index.get(filename)
+    if path is None and len(job.file_index) != len(job.files):
+        # Jobs loaded from the store start without an index
+        job.file_index = {}
+        for p in job.files:
+            job.file_index.setdefault(Path(p).name, p)
+        path = job.file_index.get(filename)
+    return path
+
+def publish_stage(job: Job, refcat: Optional[str], stage: str) -> None:
+    """
+    Notify subscribers that a parcel entered a pipeline stage.
+    """
+    publish(job.id, "stage", {"refcat": refcat, "stage": stage})
+
+def end_payload(job: Job) -> Dict[str, Any]:
+    """
+    Data of the final `end` event of a job stream.
+    """
+    return {"status": job.status, "message": job.message, "progress": job.progress}
+
+def publish_end(job: Job) -> None:
+    """
+    Notify subscribers that the worker finished; no events follow.
+    """
+    publish(job.id, "end", end_payload(job))
+
+def job_snapshot(job: Job) -> Dict[str, Any]:
+    """
+    Compact state used to (re)synchronize stream subscribers.
+    """
+    return {
+        "status": job.status,
+        "progress": job.progress,
+        "message": job.message,
+        "log_seq": job.log_seq,
+        "files": [{"file": Path(p).name, "path": p} for p in job.files],
+    }
+
+def tail_log_lines(job: Job, n: int) -> List[str]:
+    """
+    Return the text of the last n log lines.
+    """
+    if n <= 0:
+        return []
+    entries = list(job.logs)
+    return [line for _, _, line in entries[-n:]]
+
+def read_logs_after(job: Job, after: int = 0, limit: int = 500) -> Dict[str, Any]:
+    """
+    Return log lines with seq > after (at most `limit`, oldest first).
+
+    Sequence numbers are consecutive inside the buffer, so the start offset is
+    computed directly instead of scanning. `truncated` is True when lines
+    between `after` and the oldest retained line were already dropped.
+
+    Workers append while this runs, so everything is computed from one
+    snapshot of the buffer (list() copies it without yielding to them).
+    """
+    entries = list(job.logs)
+    last_seq = entries[-1][0] if entries else job.log_seq
+    first_seq = entries[0][0] if entries else last_seq + 1
+    start = max(0, after - first_seq + 1)
+    stop = start + max(0, limit)
+    lines = [
+        {"seq": seq, "ts": ts, "line": line}
+        for seq, ts, line in entries[start:stop]
+    ]
+    return {
+        "first_seq": first_seq,
+        "last_seq": last_seq,
+        "next_after": lines[-1]["seq"] if lines else max(after, last_seq),
+        "truncated": after < first_seq - 1,
+        "lines": lines,
+    }
@@ -0,0 +1,99 @@
+"""
+Logging configuration for the envelope service.
+
+Responsibilities
+----------------
+- Install one console handler (text or JSON lines) on the root logger.
+- Optionally add a JSON-lines file sink.
+- Apply the global level and per-module levels from config.json.
+
+Notes
+-----
+- Modules log through `logging.getLogger(__name__)`, so logger names are the
+  flat module names (pipeline, ifc_exporter, cadastre_client, ...).
+- Config keys: log_level, log_levels, log_format, log_json_path.
+- The legacy `debug_depth_log: true` enables DEBUG for pipeline and
+  ifc_exporter unless log_levels sets them explicitly.
+- Calling configure_logging again replaces the handlers it installed.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Dict, List
+import json
+import logging
+import sys
+
+LOG_FORMATS = ("text", "json")
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+# Modules whose debug output was previously gated by `debug_depth_log`
+DEPTH_DEBUG_LOGGERS = ("pipeline", "ifc_exporter")
+
+# LogRecord attributes that are not user-supplied `extra` fields
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_INSTALLED: List[logging.Handler] = []
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line, including `extra` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        out: Dict[str, Any] = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "thread": record.threadName,
+        }
+        for key, value in record.__dict__.items():
+            if key in _RESERVED or key.startswith("_"):
+                continue
+            out[key] = value
+        if record.exc_info:
+            out["exc"] = self.formatException(record.exc_info)
+        return json.dumps(out, ensure_ascii=False, default=str)
+
+
+def _level(value: Any, default: int = logging.INFO) -> int:
+    if isinstance(value, int):
+        return value
+    level = logging.getLevelName(str(value or "").strip().upper())
+    return level if isinstance(level, int) else default
+
+
+def configure_logging(config: Dict[str, Any]) -> None:
+    """Configure root handlers and module levels from a config dict."""
+    root = logging.getLogger()
+    for handler in _INSTALLED:
+        root.removeHandler(handler)
+        handler.close()
+    _INSTALLED.clear()
+
+    fmt = str(config.get("log_format") or "text").strip().lower()
+    console = logging.StreamHandler(sys.stderr)
+    console.setFormatter(JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT))
+    _INSTALLED.append(console)
+
+    json_path = config.get("log_json_path")
+    if json_path:
+        p = Path(json_path)
+        if not p.is_absolute():
+            p = Path(__file__).resolve().parent / p
+        p.parent.mkdir(parents=True, exist_ok=True)
+        sink = logging.FileHandler(str(p), encoding="utf-8")
+        sink.setFormatter(JsonFormatter())
+        _INSTALLED.append(sink)
+
+    for handler in _INSTALLED:
+        root.addHandler(handler)
+    root.setLevel(_level(config.get("log_level"), logging.INFO))
+
+    module_levels: Dict[str, Any] = dict(config.get("log_levels") or {})
+    if config.get("debug_depth_log"):
+        for name in DEPTH_DEBUG_LOGGERS:
+            module_levels.setdefault(name, "DEBUG")
+    for name, level in module_levels.items():
+        logging.getLogger(name).setLevel(_level(level))
@@ -5,19 +5,35 @@ Responsibilities
 ----------------
 - Serves a small UI from /static and the root path.
 - Exposes endpoints to list municipalities/parcels and to generate IFC envelopes.
-- Runs long-running generation tasks in background threads (per job).
-- Provides job status, logs, and download links for generated IFC files.
+- Runs long-running generation tasks on a bounded worker pool; single-parcel
+  jobs are dispatched ahead of batches and a full queue answers HTTP 429.
+- Provides job status, logs, and download links for generated IFC files,
+  plus a streaming ZIP of all files of a job.
+- Keeps a per-municipality build manifest so batches can run incrementally.
+- Offers a plan mode that returns envelope parameters without writing IFC.
+- Offers a combined mode that writes many parcels into one IFC per
+  municipality, zone or block.
+- Records per-parcel stage timings and exports them per job (JSON/CSV).
+- Exposes Prometheus-style process metrics at /metrics.
+- Streams job progress, stage, log and file events over Server-Sent Events.
+- Serves per-parcel envelope GLBs and merged GLB tiles for municipality
+  overviews in the web viewer.
+- gzip-encodes text responses and serves pre-compressed `.gz` variants of
+  outputs (IFC, GLB) to clients that accept gzip; see http_gzip.py.
 
 Notes
 -----
-- Job state is kept in memory (see jobs.py); restarting the process clears jobs.
+- Active jobs are kept in memory and all jobs are persisted to SQLite (see
+  jobs.py / job_store.py); jobs running during a restart are marked as errors.
 - Batch generation uses throttling constants to avoid WFS overload.
+- Transient batch failures (WFS outages, network errors) are retried at the
+  end of the batch with backoff; see failures.py.
 """
 
 from __future__ import annotations
 
 from fastapi import FastAPI, HTTPException, Request, UploadFile, File
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.exceptions import RequestValidationError
@@ -25,17 +41,62 @@ from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 from pathlib import Path
-import threading
+import asyncio
+import functools
 import time
 import json
+import csv
+import io
 import re
+from urllib.parse import quote
 
-from config import POUM_GML_PATH, OUTPUT_DIR, DEFAULT_MUNICIPALITIES
-from jobs import create_job, get_job, append_log, Job
-from pipeline import list_refcats_from_poum, generate_one
+from config import (
+    POUM_GML_PATH, OUTPUT_DIR, DEFAULT_MUNICIPALITIES,
+    WORKER_COUNT, WORKER_QUEUE_MAX, WORKER_RESERVED_INTERACTIVE, GZIP_MIN_SIZE,
+)
+from jobs import (
+    create_job, get_job, list_jobs, job_counts, init_job_store, append_log,
+    tail_log_lines, read_logs_after, Job, set_status, set_progress, add_file,
+    publish_stage, finish_job, discard_job, job_snapshot, end_payload,
+    checkpoint_parcel, checkpoint_parcels, load_checkpoints, find_job_file,
+    add_parcel_timing, load_parcel_timings,
+)
+from worker_pool import WorkerPool, QueueFullError
+from cancellation import CancelToken, JobCancelled, ParcelTimeout, run_with_deadline, sleep_unless_cancelled
+from failures import TRANSIENT, DETERMINISTIC, classify_failure, retry_delay
+from job_events import subscribe, unsubscribe, format_sse, TERMINAL_STATUSES
+from pipeline import (
+    list_refcats_from_poum, generate_one, plan_one, combine_one, compute_parcel_input_hashes, load_config,
+)
+from ifc_exporter import CombinedIfcExport, COMBINED_GROUPINGS, combined_group_key
+from glb_export import GLB_MEDIA_TYPE, ensure_tile
+from logging_setup import configure_logging
+from plan_export import PLAN_FORMATS, plan_format_available, plan_output_path, write_plan_rows
+from timing import STAGES, StageTimer, summarize_stage_timings
+from metrics import observe_request, record_parcel, render_metrics
+from manifest import (
+    manifest_path, load_manifest, save_manifest, diff_manifest, delete_output, delete_dropped_companions, make_entry,
+    output_present,
+)
 from simplify_cadastre_like import generate_simplified_cadastre_like_file
+from zip_stream import iter_zip
+from compression import ensure_gzip_variant, finalize_ifc_output
+from http_gzip import GZipTextMiddleware, PrecompressedStaticFiles, precompressed_file_response
 from volume_compliance import run_volume_compliance_check, run_element_clash_check
 
+configure_logging(load_config())
+init_job_store()
+
+# Single-parcel jobs go ahead of batches; see worker_pool.py
+POOL = WorkerPool(
+    workers=WORKER_COUNT,
+    max_queued=WORKER_QUEUE_MAX,
+    reserved_interactive=WORKER_RESERVED_INTERACTIVE,
+)
+
+# Seconds suggested to clients in Retry-After when the queue is full
+QUEUE_FULL_RETRY_AFTER_S = 30
+
 app = FastAPI(title="Parcel BIM/GIS Automation API", version="1.0")
 
 
@@ -49,10 +110,25 @@ async def request_validation_exception_handler(request: Request, exc: RequestVal
         },
     )
 
-# --- Serve UI from / (backend/static/index.html) ---
-STATIC_DIR = Path(__file__).resolve().parent / "static"
+# --- Serve UI from / (backend/Static/index.html) ---
+STATIC_DIR = Path(__file__).resolve().parent / "Static"
 app.mount("/static", StaticFiles(directory=str(STATIC_DIR)), name="static")
-app.mount("/outputs", StaticFiles(directory=str(OUTPUT_DIR)), name="outputs")
+app.mount("/outputs", PrecompressedStaticFiles(directory=str(OUTPUT_DIR)), name="outputs")
+
+
+@app.middleware("http")
+async def request_metrics_middleware(request: Request, call_next):
+    """Time every request and record it under its route template."""
+    t0 = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        route_path = getattr(route, "path", None) or "<unmatched>"
+        observe_request(request.method, route_path, status_code, time.perf_counter() - t0)
 
 
 @app.get("/", include_in_schema=False)
@@ -67,26 +143,59 @@ def health():
     return {"ok": True, "message": "Backend is running."}
 
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus text exposition of request, job, WFS, cache and process metrics."""
+    return Response(
+        content=render_metrics(job_counts()),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(GZipTextMiddleware, minimum_size=GZIP_MIN_SIZE)
 
 MUNICIPALITY_TO_SLUG = {"Malgrat de Mar": "malgrat"}
 
 
+def _add_output_files(job: Job, result: Dict[str, Any]) -> None:
+    """Register the IFC of a generated parcel (result or manifest entry) and its ifcZIP/GLB companions."""
+    add_file(job, result["ifc_path"])
+    for key in ("ifczip_path", "glb_path"):
+        p = result.get(key)
+        if p and p != result["ifc_path"] and Path(p).exists():
+            add_file(job, p)
+
+
 class GenerateRequest(BaseModel):
     """Request body for /generate."""
     municipality: str
     all_parcels: bool
     refcat: Optional[str] = None
+    incremental: bool = False
 
 
 class GenerateResponse(BaseModel):
     """Response body for /generate."""
     job_id: str
+    queue_position: Optional[int] = None
+
+
+class PlanRequest(BaseModel):
+    """Request body for /plan (municipality-wide parameter export)."""
+    municipality: str
+    format: str = "json"
+
+
+class CombinedRequest(BaseModel):
+    """Request body for /generate/combined (many parcels per IFC file)."""
+    municipality: str
+    group_by: str = "municipality"
 
 
 class SimplifyCadastreRequest(BaseModel):
@@ -172,6 +281,29 @@ async def upload_architect_ifc(file: UploadFile = File(...)) -> Dict[str, str]:
     }
 
 
+def _start_worker(worker, job: Job, interactive: bool = False, **kwargs: Any) -> int:
+    """
+    Queue a job worker on the pool and return its queue position. The job is
+    finalized (persisted, `end` event) when the worker returns. Raises HTTP 429
+    and forgets the job when the queue is full.
+    """
+    def _main() -> None:
+        try:
+            worker(job, **kwargs)
+        finally:
+            finish_job(job)
+
+    try:
+        return POOL.submit(job.id, _main, interactive=interactive)
+    except QueueFullError as e:
+        discard_job(job)
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(QUEUE_FULL_RETRY_AFTER_S)},
+        )
+
+
 def run_simplify_cadastre_job(
     job: Job,
     *,
@@ -183,9 +315,9 @@ def run_simplify_cadastre_job(
     angle_threshold: float,
 ) -> None:
     """Execute simplify-cadastre preprocessing in background and update job state."""
-    job.status = "running"
     job.started_at = time.time()
-    append_log(job, "SimplifyCadastre job started")
+    set_status(job, "running", message="SimplifyCadastre job started")
+    append_log(job, job.message)
 
     try:
         append_log(job, f"source={source} | poum_mode={poum_mode}")
@@ -206,20 +338,18 @@ def run_simplify_cadastre_job(
         street_engine_used = result.get("street_engine_used")
 
         if output_file:
-            job.files = [str(output_file)]
+            add_file(job, str(output_file))
 
-        job.progress = 1.0
-        job.status = "success"
+        set_progress(job, 1.0)
         job.finished_at = time.time()
-        job.message = f"Done. Generated simplified file with {parcel_count} parcels."
+        set_status(job, "success", message=f"Done. Generated simplified file with {parcel_count} parcels.")
         append_log(job, job.message)
         if street_engine_used:
             append_log(job, f"street_engine_used={street_engine_used}")
 
     except Exception as e:
-        job.status = "error"
         job.finished_at = time.time()
-        job.message = str(e)
+        set_status(job, "error", message=str(e))
         append_log(job, f"ERROR: {str(e)}")
 
 
@@ -284,22 +414,18 @@ def post_simplify_cadastre(req: SimplifyCadastreRequest):
     )
     job = create_job(req.municipality, all_parcels=False, refcat=None)
 
-    t = threading.Thread(
-        target=run_simplify_cadastre_job,
-        kwargs={
-            "job": job,
-            "source": source,
-            "poum_mode": poum_mode,
-            "output_path": output_path,
-            "max_distance": max_distance,
-            "offset_distance": offset_distance,
-            "angle_threshold": angle_threshold,
-        },
-        daemon=True,
+    position = _start_worker(
+        run_simplify_cadastre_job,
+        job,
+        source=source,
+        poum_mode=poum_mode,
+        output_path=output_path,
+        max_distance=max_distance,
+        offset_distance=offset_distance,
+        angle_threshold=angle_threshold,
     )
-    t.start()
 
-    return GenerateResponse(job_id=job.id)
+    return GenerateResponse(job_id=job.id, queue_position=position)
 
 
 @app.post("/check/volume-compliance")
@@ -371,6 +497,10 @@ CHUNK_SIZE = 20          # Number of parcels per batch
 REQUEST_DELAY = 0.30     # Delay (s) after each WFS call
 CHUNK_DELAY = 1.50       # Delay (s) after each batch
 MAX_FAILS = 200          # Abort job if failures exceed this
+PARCEL_TIMEOUT_S = 180.0 # Wall-clock budget per parcel (0 disables)
+RETRY_ROUNDS = 3         # Deferred retry rounds for transient failures
+RETRY_BACKOFF_S = 30.0   # Delay before the first retry round (doubles each round)
+RETRY_BACKOFF_MAX_S = 300.0
 
 
 def _chunks(lst: List[str], n: int):
@@ -379,11 +509,31 @@ def _chunks(lst: List[str], n: int):
         yield lst[i:i + n]
 
 
+def _record_parcel_timing(job: Job, refcat: str, status: str, timer: StageTimer) -> None:
+    """Store one parcel's stage durations on the job."""
+    add_parcel_timing(job, {"refcat": refcat, "status": status, **timer.as_dict()})
+    record_parcel(status)
+
+
+def _parcel_token(job: Job) -> CancelToken:
+    """Cancel/deadline token for one parcel of `job`."""
+    return CancelToken(lambda: job.cancel_requested, PARCEL_TIMEOUT_S)
+
+
+def _parcel_timer(job: Job, refcat: Optional[str], token: CancelToken) -> StageTimer:
+    """Stage timer that checks `token` and publishes a stage event at every stage boundary."""
+    def _on_stage(name: str) -> None:
+        token.check(name)
+        publish_stage(job, refcat, name)
+
+    return StageTimer(on_stage=_on_stage)
+
+
 def run_job(job: Job) -> None:
     """Execute a job (single or batch) and update its state/logs in place."""
-    job.status = "running"
     job.started_at = time.time()
-    append_log(job, "Job started")
+    set_status(job, "running", message="Job started")
+    append_log(job, job.message)
 
     try:
         municipality_slug = MUNICIPALITY_TO_SLUG.get(job.municipality, "municipality")
@@ -391,70 +541,263 @@ def run_job(job: Job) -> None:
         # -------------------- ALL PARCELS (BATCH) --------------------
         if job.all_parcels:
             refcats = list_refcats_from_poum(POUM_GML_PATH)
-            total = max(len(refcats), 1)
-            append_log(job, f"Batch mode: {len(refcats)} parcels")
+            incremental = bool(job.options.get("incremental"))
+
+            mpath = manifest_path(OUTPUT_DIR, municipality_slug)
+            manifest = load_manifest(mpath, municipality_slug)
+            previous = dict(manifest.get("parcels") or {})
+            input_hashes = compute_parcel_input_hashes(refcats, POUM_GML_PATH)
+
             job.meta = {
-                "mode": "batch",
+                "mode": "incremental" if incremental else "batch",
                 "preprocess_geometry_used_count": 0,
                 "preprocess_geometry_source_files": [],
             }
 
+            if incremental:
+                diff = diff_manifest(manifest, input_hashes)
+                todo = diff.to_generate
+                append_log(
+                    job,
+                    f"Incremental mode: {len(refcats)} parcels | added={len(diff.added)} "
+                    f"changed={len(diff.changed)} unchanged={len(diff.unchanged)} removed={len(diff.removed)}",
+                )
+                removed_files = 0
+                for refcat in diff.removed:
+                    if delete_output(previous.get(refcat)):
+                        removed_files += 1
+                if diff.removed:
+                    append_log(job, f"Removed {removed_files} outputs of {len(diff.removed)} parcels no longer in POUM")
+                job.meta.update(
+                    {
+                        "added_count": len(diff.added),
+                        "changed_count": len(diff.changed),
+                        "unchanged_count": len(diff.unchanged),
+                        "removed_count": len(diff.removed),
+                    }
+                )
+                new_parcels = {rc: previous[rc] for rc in diff.unchanged}
+            else:
+                todo = refcats
+                append_log(job, f"Batch mode: {len(refcats)} parcels")
+                new_parcels = {}
+
             produced_paths: List[str] = []
+
+            # Resume: carry over parcels the interrupted job already produced
+            # from the same inputs, and only generate the rest.
+            resume_of = job.options.get("resume_of")
+            if resume_of:
+                pending = set(todo)
+                carried = {
+                    rc: entry
+                    for rc, entry in load_checkpoints(resume_of).items()
+                    if rc in pending and entry.get("input_hash") == input_hashes.get(rc) and output_present(entry)
+                }
+                todo = [rc for rc in todo if rc not in carried]
+                new_parcels.update(carried)
+                checkpoint_parcels(job, carried)
+                for rc in sorted(carried):
+                    entry = carried[rc]
+                    if not entry.get("skipped") and entry.get("ifc_path"):
+                        produced_paths.append(entry["ifc_path"])
+                        _add_output_files(job, entry)
+                job.meta["resumed_from"] = resume_of
+                job.meta["resumed_count"] = len(carried)
+                append_log(
+                    job,
+                    f"Resuming job {resume_of}: {len(carried)} parcels already done, {len(todo)} remaining",
+                )
+
+            total = max(len(todo), 1)
+            timed_out: List[str] = []
+            deferred: Dict[str, str] = {}            # refcat -> last transient error
+            recovered: List[str] = []
+            hard_failures: List[Dict[str, Any]] = []
             fails = 0
             done = 0
-
-            for batch_i, group in enumerate(_chunks(refcats, CHUNK_SIZE), start=1):
-                append_log(job, f"--- Batch {batch_i} ({len(group)} parcels) ---")
-
-                for refcat in group:
-                    try:
-                        append_log(job, f"[{done+1}/{total}] Generating IFC for {refcat}...")
-
-                        result = generate_one(
+            cancelled = False
+
+            def _attempt(refcat: str) -> Optional[Exception]:
+                """
+                Generate one parcel and record its output and stage timings.
+                Returns None on success or the failure; JobCancelled propagates.
+                """
+                t0 = time.perf_counter()
+                token = _parcel_token(job)
+                timer = _parcel_timer(job, refcat, token)
+                try:
+                    result = run_with_deadline(
+                        functools.partial(
+                            generate_one,
                             refcat=refcat,
                             poum_gml_path=POUM_GML_PATH,
                             output_dir=OUTPUT_DIR,
                             municipality_slug=municipality_slug,
-                        )
-
-                        # diagnostic log
-                        append_log(job, f"Zone={result.get('zone')} | rule_sources={result.get('rule_sources')}")
-
-                        if result.get("used_preprocess_geometry"):
-                            job.meta["preprocess_geometry_used_count"] = int(job.meta.get("preprocess_geometry_used_count", 0)) + 1
-                            src = result.get("preprocess_source_file")
-                            if src:
-                                existing = set(job.meta.get("preprocess_geometry_source_files", []))
-                                existing.add(str(src))
-                                job.meta["preprocess_geometry_source_files"] = sorted(existing)
+                            timer=timer,
+                            token=token,
+                        ),
+                        token,
+                        discard=delete_output,
+                    )
+                except JobCancelled:
+                    _record_parcel_timing(job, refcat, "cancelled", timer)
+                    raise
+                except Exception as e:
+                    if isinstance(e, ParcelTimeout):
+                        status = "timeout"
+                        timed_out.append(refcat)
+                        job.meta["timed_out"] = list(timed_out)
+                    else:
+                        status = "deferred" if classify_failure(e) == TRANSIENT else "error"
+                    _record_parcel_timing(job, refcat, status, timer)
+                    return e
+
+                # diagnostic log
+                append_log(job, f"Zone={result.get('zone')} | rule_sources={result.get('rule_sources')}")
+
+                if result.get("used_preprocess_geometry"):
+                    job.meta["preprocess_geometry_used_count"] = int(job.meta.get("preprocess_geometry_used_count", 0)) + 1
+                    src = result.get("preprocess_source_file")
+                    if src:
+                        existing = set(job.meta.get("preprocess_geometry_source_files", []))
+                        existing.add(str(src))
+                        job.meta["preprocess_geometry_source_files"] = sorted(existing)
+
+                if not result.get("skipped") and result.get("ifc_path"):
+                    produced_paths.append(result["ifc_path"])
+                    _add_output_files(job, result)
+
+                # A changed parcel may land under a new filename (e.g. zone edit)
+                delete_output(previous.get(refcat), keep=result.get("ifc_path"))
+                delete_dropped_companions(previous.get(refcat), result)
+                new_parcels[refcat] = make_entry(input_hashes[refcat], result, time.perf_counter() - t0)
+                checkpoint_parcel(job, refcat, new_parcels[refcat])
+                _record_parcel_timing(job, refcat, "skipped" if result.get("skipped") else "ok", timer)
+                return None
+
+            def _hard_fail(refcat: str, kind: str, error: str, attempts: int) -> None:
+                hard_failures.append({"refcat": refcat, "kind": kind, "error": error, "attempts": attempts})
+                append_log(job, f"ERROR rc={refcat} -> {error}")
+
+            for batch_i, group in enumerate(_chunks(todo, CHUNK_SIZE), start=1):
+                if cancelled:
+                    break
+                append_log(job, f"--- Batch {batch_i} ({len(group)} parcels) ---")
 
-                        if not result.get("skipped") and result.get("ifc_path"):
-                            produced_paths.append(result["ifc_path"])
+                for refcat in group:
+                    if job.cancel_requested:
+                        cancelled = True
+                        break
 
-                    except Exception as e:
+                    append_log(job, f"[{done+1}/{total}] Generating IFC for {refcat}...")
+                    try:
+                        error = _attempt(refcat)
+                    except JobCancelled:
+                        cancelled = True
+                        break
+
+                    if error is not None:
+                        message = f"{type(error).__name__}: {error}"
+                        if classify_failure(error) == TRANSIENT:
+                            # Retried at the end of the batch; not a failure yet
+                            deferred[refcat] = message
+                            append_log(job, f"DEFERRED rc={refcat} (transient) -> {message}")
+                        else:
+                            fails += 1
+                            _hard_fail(refcat, DETERMINISTIC, message, 1)
+
+                            # Abort if too many failures
+                            if fails >= MAX_FAILS:
+                                job.meta["stage_timings"] = summarize_stage_timings(load_parcel_timings(job.id))
+                                job.meta["hard_failures"] = hard_failures
+                                job.finished_at = time.time()
+                                set_status(job, "error", message=f"Too many failures ({fails}). Stopping.")
+                                append_log(job, job.message)
+                                set_progress(job, done / total if total else 1.0)
+                                return
+
+                    done += 1
+                    set_progress(job, done / total if total else 1.0)
+                    time.sleep(REQUEST_DELAY)
+
+                if not cancelled:
+                    time.sleep(CHUNK_DELAY)
+
+            # Deferred retry queue: transient failures get up to RETRY_ROUNDS
+            # more attempts, with exponential backoff between rounds.
+            retry_round = 0
+            while deferred and not cancelled and retry_round < RETRY_ROUNDS:
+                retry_round += 1
+                delay = retry_delay(retry_round, RETRY_BACKOFF_S, RETRY_BACKOFF_MAX_S)
+                append_log(
+                    job,
+                    f"--- Retry round {retry_round}/{RETRY_ROUNDS}: {len(deferred)} parcels, starting in {delay:g}s ---",
+                )
+                if sleep_unless_cancelled(delay, lambda: job.cancel_requested):
+                    cancelled = True
+                    break
+
+                for refcat in list(deferred):
+                    if job.cancel_requested:
+                        cancelled = True
+                        break
+                    try:
+                        error = _attempt(refcat)
+                    except JobCancelled:
+                        cancelled = True
+                        break
+
+                    if error is None:
+                        del deferred[refcat]
+                        recovered.append(refcat)
+                        append_log(job, f"RECOVERED rc={refcat} on retry {retry_round}")
+                    elif classify_failure(error) == TRANSIENT:
+                        deferred[refcat] = f"{type(error).__name__}: {error}"
+                    else:
+                        del deferred[refcat]
                         fails += 1
-                        append_log(job, f"ERROR rc={refcat} -> {type(e).__name__}: {e}")
-
-                        # Abort if too many failures
-                        if fails >= MAX_FAILS:
-                            job.status = "error"
-                            job.finished_at = time.time()
-                            job.message = f"Too many failures ({fails}). Stopping."
-                            append_log(job, job.message)
-                            job.progress = done / total if total else 1.0
-                            return
-
-                    finally:
-                        done += 1
-                        job.progress = done / total if total else 1.0
-                        time.sleep(REQUEST_DELAY)
-
-                time.sleep(CHUNK_DELAY)
-
-            job.files = produced_paths
-            job.status = "success"
-            job.message = f"Done. Produced {len(produced_paths)} IFC files. Failed: {fails}."
-            append_log(job, job.message)
+                        _hard_fail(refcat, DETERMINISTIC, f"{type(error).__name__}: {error}", retry_round + 1)
+                    time.sleep(REQUEST_DELAY)
+
+            if not cancelled:
+                for refcat, message in deferred.items():
+                    fails += 1
+                    _hard_fail(refcat, TRANSIENT, message, retry_round + 1)
+
+            if cancelled:
+                # Parcels not reached keep their old entry (stale hash), so the
+                # next incremental run regenerates them and cleans old outputs.
+                for rc in todo:
+                    if rc not in new_parcels and rc in previous:
+                        new_parcels[rc] = previous[rc]
+
+            # Failed parcels are left out so the next incremental run retries them.
+            manifest["parcels"] = new_parcels
+            manifest["job_id"] = job.id
+            save_manifest(mpath, manifest)
+            job.meta["manifest_path"] = str(mpath)
+            job.meta["stage_timings"] = summarize_stage_timings(load_parcel_timings(job.id))
+            job.meta["timed_out"] = timed_out
+            job.meta["retry_rounds"] = retry_round
+            job.meta["recovered"] = recovered
+            job.meta["hard_failures"] = hard_failures
+
+            if cancelled:
+                job.message = (
+                    f"Cancelled after {done}/{len(todo)} parcels. "
+                    f"Produced {len(produced_paths)} IFC files. Failed: {fails}."
+                )
+                set_status(job, "cancelled")
+                append_log(job, job.message)
+            else:
+                set_progress(job, 1.0)
+                set_status(job, "success", message=(
+                    f"Done. Produced {len(produced_paths)} IFC files. "
+                    f"Recovered after retry: {len(recovered)}. Failed: {fails} "
+                    f"(timed out: {len(timed_out)})."
+                ))
+                append_log(job, job.message)
 
         # -------------------- SINGLE PARCEL --------------------
         else:
@@ -463,12 +806,22 @@ def run_job(job: Job) -> None:
 
             append_log(job, f"Single mode: {job.refcat}")
 
-            result = generate_one(
-                refcat=job.refcat,
-                poum_gml_path=POUM_GML_PATH,
-                output_dir=OUTPUT_DIR,
-                municipality_slug=municipality_slug,
+            token = _parcel_token(job)
+            timer = _parcel_timer(job, job.refcat, token)
+            result = run_with_deadline(
+                functools.partial(
+                    generate_one,
+                    refcat=job.refcat,
+                    poum_gml_path=POUM_GML_PATH,
+                    output_dir=OUTPUT_DIR,
+                    municipality_slug=municipality_slug,
+                    timer=timer,
+                    token=token,
+                ),
+                token,
+                discard=delete_output,
             )
+            _record_parcel_timing(job, job.refcat, "skipped" if result.get("skipped") else "ok", timer)
 
             # diagnostic log
             append_log(job, f"Zone={result.get('zone')} | rule_sources={result.get('rule_sources')}")
@@ -476,56 +829,288 @@ def run_job(job: Job) -> None:
                 "mode": "single",
                 "used_preprocess_geometry": bool(result.get("used_preprocess_geometry")),
                 "preprocess_source_file": result.get("preprocess_source_file"),
+                "stage_timings": summarize_stage_timings(load_parcel_timings(job.id)),
             }
 
             if result.get("skipped"):
                 job.files = []
-                job.status = "success"
-                job.message = f"Skipped (non-buildable). Zone={result.get('zone')}"
+                set_status(job, "success", message=f"Skipped (non-buildable). Zone={result.get('zone')}")
                 append_log(job, job.message)
             else:
-                job.files = [result["ifc_path"]]
-                job.status = "success"
-                job.message = "Done. Produced 1 IFC file."
+                _add_output_files(job, result)
+                set_status(job, "success", message="Done. Produced 1 IFC file.")
                 append_log(job, job.message)
 
-            job.progress = 1.0
+            set_progress(job, 1.0)
+
+        job.finished_at = time.time()
 
+    except JobCancelled:
         job.finished_at = time.time()
+        job.message = "Cancelled."
+        set_status(job, "cancelled")
+        append_log(job, job.message)
 
     except HTTPException as he:
-        job.status = "error"
         job.finished_at = time.time()
-        job.message = str(he.detail)
+        set_status(job, "error", message=str(he.detail))
         append_log(job, f"ERROR: {he.detail}")
 
     except Exception as e:
-        job.status = "error"
         job.finished_at = time.time()
-        job.message = str(e)
+        set_status(job, "error", message=str(e))
+        append_log(job, f"ERROR: {str(e)}")
+
+
+def run_plan_job(job: Job) -> None:
+    """Compute envelope parameters for every parcel and write them as one JSON/Parquet file."""
+    job.started_at = time.time()
+    set_status(job, "running", message="Plan job started")
+    append_log(job, job.message)
+
+    try:
+        municipality_slug = MUNICIPALITY_TO_SLUG.get(job.municipality, "municipality")
+        fmt = str(job.options.get("format") or "json")
+
+        refcats = list_refcats_from_poum(POUM_GML_PATH)
+        total = max(len(refcats), 1)
+        append_log(job, f"Plan mode: {len(refcats)} parcels | format={fmt}")
+        job.meta = {"mode": "plan", "format": fmt, "failed": []}
+
+        rows: List[Dict[str, Any]] = []
+        fails = 0
+
+        for done, refcat in enumerate(refcats, start=1):
+            if job.cancel_requested:
+                job.finished_at = time.time()
+                job.message = f"Cancelled after {done - 1}/{len(refcats)} parcels; no plan file written."
+                set_status(job, "cancelled")
+                append_log(job, job.message)
+                return
+
+            used_wfs = False
+            try:
+                row = plan_one(refcat=refcat, poum_gml_path=POUM_GML_PATH)
+                used_wfs = bool(row.get("used_wfs"))
+                rows.append(row)
+            except Exception as e:
+                fails += 1
+                job.meta["failed"].append(refcat)
+                append_log(job, f"ERROR rc={refcat} -> {type(e).__name__}: {e}")
+
+                if fails >= MAX_FAILS:
+                    job.finished_at = time.time()
+                    set_status(job, "error", message=f"Too many failures ({fails}). Stopping.")
+                    append_log(job, job.message)
+                    return
+            finally:
+                set_progress(job, done / total)
+                # Only parcels that hit the WFS need throttling
+                if used_wfs:
+                    time.sleep(REQUEST_DELAY)
+
+        out_path = write_plan_rows(rows, plan_output_path(OUTPUT_DIR, municipality_slug, fmt), fmt)
+
+        add_file(job, out_path)
+        set_progress(job, 1.0)
+        job.finished_at = time.time()
+        set_status(job, "success", message=f"Done. Planned {len(rows)} parcels. Failed: {fails}.")
+        append_log(job, job.message)
+
+    except Exception as e:
+        job.finished_at = time.time()
+        set_status(job, "error", message=str(e))
         append_log(job, f"ERROR: {str(e)}")
 
 
+def run_combined_job(job: Job) -> None:
+    """Write every parcel envelope into one IFC per municipality, zone or block."""
+    job.started_at = time.time()
+    set_status(job, "running", message="Combined job started")
+    append_log(job, job.message)
+
+    export: Optional[CombinedIfcExport] = None
+    try:
+        municipality_slug = MUNICIPALITY_TO_SLUG.get(job.municipality, "municipality")
+        group_by = str(job.options.get("group_by") or "municipality")
+        export = CombinedIfcExport(
+            OUTPUT_DIR, municipality_slug, group_by=group_by,
+            deterministic=bool(load_config().get("deterministic_ifc", True)),
+        )
+
+        refcats = list_refcats_from_poum(POUM_GML_PATH)
+        total = max(len(refcats), 1)
+        append_log(job, f"Combined mode: {len(refcats)} parcels | group_by={group_by}")
+        job.meta = {"mode": "combined", "group_by": group_by, "failed": [], "timed_out": []}
+
+        fails = 0
+
+        for done, refcat in enumerate(refcats, start=1):
+            if job.cancel_requested:
+                raise JobCancelled("Job cancelled")
+
+            token = _parcel_token(job)
+            timer = _parcel_timer(job, refcat, token)
+            used_wfs = False
+            try:
+                result = run_with_deadline(
+                    functools.partial(combine_one, refcat=refcat, poum_gml_path=POUM_GML_PATH, export=export, timer=timer),
+                    token,
+                )
+                used_wfs = bool(result.get("used_wfs"))
+                _record_parcel_timing(job, refcat, "ok", timer)
+            except JobCancelled:
+                _record_parcel_timing(job, refcat, "cancelled", timer)
+                raise
+            except Exception as e:
+                fails += 1
+                status = "timeout" if isinstance(e, ParcelTimeout) else "error"
+                job.meta["timed_out" if status == "timeout" else "failed"].append(refcat)
+                _record_parcel_timing(job, refcat, status, timer)
+                append_log(job, f"ERROR rc={refcat} -> {type(e).__name__}: {e}")
+
+                if fails >= MAX_FAILS:
+                    export.abort()
+                    job.meta["stage_timings"] = summarize_stage_timings(load_parcel_timings(job.id))
+                    job.finished_at = time.time()
+                    set_status(job, "error", message=f"Too many failures ({fails}). Stopping.")
+                    append_log(job, job.message)
+                    return
+            finally:
+                set_progress(job, done / total)
+                # Only parcels that hit the WFS need throttling
+                if used_wfs:
+                    time.sleep(REQUEST_DELAY)
+
+        paths = export.close()
+        config = load_config()
+        for p in paths:
+            _add_output_files(
+                job,
+                finalize_ifc_output(
+                    p, config.get("ifc_output_format", "ifc"), bool(config.get("precompress_outputs", True))
+                ),
+            )
+        job.meta["parcel_counts"] = {Path(w.out_path).name: w.parcel_count for w in export.writers.values()}
+        job.meta["stage_timings"] = summarize_stage_timings(load_parcel_timings(job.id))
+        set_progress(job, 1.0)
+        job.finished_at = time.time()
+        set_status(
+            job, "success",
+            message=f"Done. Wrote {len(refcats) - fails} parcels into {len(paths)} IFC files. Failed: {fails}.",
+        )
+        append_log(job, job.message)
+
+    except JobCancelled:
+        if export is not None:
+            export.abort()
+        job.finished_at = time.time()
+        job.message = "Cancelled; no combined IFC written."
+        set_status(job, "cancelled")
+        append_log(job, job.message)
+
+    except Exception as e:
+        if export is not None:
+            export.abort()
+        job.finished_at = time.time()
+        set_status(job, "error", message=str(e))
+        append_log(job, f"ERROR: {str(e)}")
+
+
+@app.get("/plan")
+def get_plan(municipality: str, refcat: str) -> Dict[str, Any]:
+    """Return envelope parameters for one parcel without writing an IFC."""
+    if municipality not in DEFAULT_MUNICIPALITIES:
+        raise HTTPException(status_code=400, detail="Unknown municipality")
+
+    refcat = (refcat or "").strip()
+    if not refcat:
+        raise HTTPException(status_code=400, detail="refcat is required")
+
+    try:
+        return plan_one(refcat=refcat, poum_gml_path=POUM_GML_PATH)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Plan failed: {e}")
+
+
+@app.post("/plan", response_model=GenerateResponse)
+def post_plan(req: PlanRequest):
+    """Start a municipality-wide plan job (JSON or Parquet rows, no IFC)."""
+    if req.municipality not in DEFAULT_MUNICIPALITIES:
+        raise HTTPException(status_code=400, detail="Unknown municipality")
+
+    fmt = (req.format or "json").strip().lower()
+    if fmt not in PLAN_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(PLAN_FORMATS)}")
+    if not plan_format_available(fmt):
+        # Fail before the job runs, not after every parcel has been planned
+        raise HTTPException(status_code=400, detail="Parquet output requires pyarrow to be installed.")
+
+    job = create_job(req.municipality, all_parcels=True, refcat=None, options={"plan": True, "format": fmt})
+
+    position = _start_worker(run_plan_job, job)
+
+    return GenerateResponse(job_id=job.id, queue_position=position)
+
+
 @app.post("/generate", response_model=GenerateResponse)
 def post_generate(req: GenerateRequest):
-    """Create a new job (single or batch) and start it in a background thread."""
+    """Create a new job (single or batch) and queue it on the worker pool."""
     if req.municipality not in DEFAULT_MUNICIPALITIES:
         raise HTTPException(status_code=400, detail="Unknown municipality")
 
     if not req.all_parcels and not (req.refcat and req.refcat.strip()):
         raise HTTPException(status_code=400, detail="refcat is required when all_parcels=false")
 
-    job = create_job(req.municipality, req.all_parcels, req.refcat.strip() if req.refcat else None)
+    if req.incremental and not req.all_parcels:
+        raise HTTPException(status_code=400, detail="incremental requires all_parcels=true")
+
+    job = create_job(
+        req.municipality,
+        req.all_parcels,
+        req.refcat.strip() if req.refcat else None,
+        options={"incremental": bool(req.incremental)},
+    )
+
+    position = _start_worker(run_job, job, interactive=not req.all_parcels)
+
+    return GenerateResponse(job_id=job.id, queue_position=position)
+
 
-    t = threading.Thread(target=run_job, args=(job,), daemon=True)
-    t.start()
+@app.post("/generate/combined", response_model=GenerateResponse)
+def post_generate_combined(req: CombinedRequest):
+    """
+    Start a job that writes all parcel envelopes of a municipality into
+    combined IFC files (one per municipality, zone or block).
+    """
+    if req.municipality not in DEFAULT_MUNICIPALITIES:
+        raise HTTPException(status_code=400, detail="Unknown municipality")
+
+    group_by = (req.group_by or "municipality").strip().lower()
+    if group_by not in COMBINED_GROUPINGS:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of: {', '.join(COMBINED_GROUPINGS)}")
+
+    job = create_job(req.municipality, all_parcels=True, refcat=None, options={"combined": True, "group_by": group_by})
+
+    position = _start_worker(run_combined_job, job)
+
+    return GenerateResponse(job_id=job.id, queue_position=position)
 
-    return GenerateResponse(job_id=job.id)
+
+@app.get("/jobs")
+def get_jobs(status: Optional[str] = None, municipality: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+    """List jobs newest first, optionally filtered by status and/or municipality."""
+    if limit < 1 or limit > 1000:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 1000")
+    return list_jobs(status=status, municipality=municipality, limit=limit)
 
 
 @app.get("/jobs/{job_id}")
-def get_job_status(job_id: str) -> Dict[str, Any]:
-    """Return job status, progress, logs, and downloadable files."""
+def get_job_status(job_id: str, include_logs: bool = True) -> Dict[str, Any]:
+    """
+    Return job status, progress, logs, and downloadable files.
+    Pollers that follow logs through /jobs/{job_id}/logs can pass include_logs=false.
+    """
     job = get_job(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
@@ -546,26 +1131,312 @@ def get_job_status(job_id: str) -> Dict[str, Any]:
         "status": job.status,
         "progress": job.progress,
         "message": job.message,
+        "queue_position": POOL.position(job.id) if job.status == "queued" else None,
         "meta": job.meta,
-        "logs": job.logs[-500:],
+        "logs": tail_log_lines(job, 500) if include_logs else [],
+        "log_seq": job.log_seq,
         "files": downloadable,
     }
 
 
+@app.delete("/jobs/{job_id}")
+def cancel_job(job_id: str) -> Dict[str, Any]:
+    """
+    Cancel a job. Queued jobs are removed immediately; running generation and
+    plan jobs stop cooperatively before the next parcel or pipeline stage.
+    """
+    job = get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status not in ("queued", "running"):
+        raise HTTPException(status_code=409, detail=f"Job already finished ({job.status})")
+
+    if job.status == "queued" and POOL.remove(job.id):
+        job.finished_at = time.time()
+        job.message = "Cancelled before start."
+        set_status(job, "cancelled")
+        append_log(job, job.message)
+        finish_job(job)
+        return {"job_id": job.id, "status": job.status}
+
+    if not job.cancel_requested:
+        job.cancel_requested = True
+        append_log(job, "Cancellation requested.")
+    return {"job_id": job.id, "status": "cancelling"}
+
+
+@app.post("/jobs/{job_id}/resume", response_model=GenerateResponse)
+def resume_job(job_id: str):
+    """
+    Resume an interrupted, failed or cancelled batch as a new job. Parcels
+    checkpointed by the old job whose inputs are unchanged (and whose IFC
+    still exists) are carried over instead of being regenerated.
+    """
+    job = get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not job.all_parcels or job.options.get("plan") or job.options.get("combined"):
+        raise HTTPException(status_code=400, detail="Only batch generation jobs can be resumed")
+    if job.status not in ("error", "cancelled"):
+        raise HTTPException(status_code=409, detail=f"Job cannot be resumed ({job.status})")
+
+    new_job = create_job(
+        job.municipality,
+        all_parcels=True,
+        refcat=None,
+        options={"incremental": bool(job.options.get("incremental")), "resume_of": job.id},
+    )
+
+    position = _start_worker(run_job, new_job)
+
+    return GenerateResponse(job_id=new_job.id, queue_position=position)
+
+
+@app.get("/jobs/{job_id}/logs")
+def get_job_logs(job_id: str, after: int = 0, limit: int = 500) -> Dict[str, Any]:
+    """Return log lines with sequence number greater than `after` (oldest first)."""
+    job = get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if after < 0:
+        raise HTTPException(status_code=400, detail="after must be >= 0")
+    if limit < 1 or limit > 5000:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 5000")
+
+    return {"job_id": job.id, "status": job.status, **read_logs_after(job, after=after, limit=limit)}
+
+
+# Seconds between SSE keep-alive comments when a job is quiet
+SSE_KEEPALIVE_S = 15.0
+
+
+@app.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str, request: Request, after: Optional[int] = None):
+    """
+    Server-Sent Events stream for one job.
+
+    Emits `snapshot` first (status, progress, files, log_seq), replays log lines
+    with seq > `after` (or the Last-Event-ID header), then pushes `status`,
+    `progress`, `stage`, `log` and `file` events as they happen and closes with
+    `end` once the worker finishes.
+    """
+    job = get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    if after is None:
+        last_event_id = request.headers.get("last-event-id")
+        after = int(last_event_id) if last_event_id and last_event_id.isdigit() else 0
+
+    async def _events():
+        sub = subscribe(job.id)
+        try:
+            # Subscribe before the snapshot so no event falls in between
+            yield format_sse("snapshot", job_snapshot(job))
+            replay = read_logs_after(job, after=after, limit=job.logs.maxlen or 0)
+            last_seq = after
+            for entry in replay["lines"]:
+                last_seq = entry["seq"]
+                yield format_sse("log", entry, event_id=entry["seq"])
+
+            if job.status in TERMINAL_STATUSES and sub.queue.empty():
+                yield format_sse("end", end_payload(job))
+                return
+
+            while True:
+                if await request.is_disconnected():
+                    return
+                if sub.lagged:
+                    sub.lagged = False
+                    yield format_sse("snapshot", job_snapshot(job))
+                    if job.status in TERMINAL_STATUSES:
+                        # The dropped events may have included `end`
+                        yield format_sse("end", end_payload(job))
+                        return
+                try:
+                    ev = await asyncio.wait_for(sub.queue.get(), timeout=SSE_KEEPALIVE_S)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+
+                if ev["event"] == "log":
+                    if ev["id"] <= last_seq:
+                        continue  # already replayed
+                    last_seq = ev["id"]
+                yield format_sse(ev["event"], ev["data"], event_id=ev["id"])
+                if ev["event"] == "end":
+                    return
+        finally:
+            unsubscribe(sub)
+
+    return StreamingResponse(
+        _events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/jobs/{job_id}/timings")
+def get_job_timings(job_id: str, format: str = "json"):
+    """Export per-parcel stage durations (seconds) of a job as JSON or CSV."""
+    job = get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    fmt = (format or "json").strip().lower()
+    records = load_parcel_timings(job.id)
+    if fmt == "json":
+        return {
+            "job_id": job.id,
+            "summary": summarize_stage_timings(records),
+            "parcels": records,
+        }
+    if fmt != "csv":
+        raise HTTPException(status_code=400, detail="format must be one of: json, csv")
+
+    columns = ["refcat", "status", *STAGES, "total"]
+    extra = sorted({k for rec in records for k in rec} - set(columns))
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=columns + extra, restval="")
+    writer.writeheader()
+    writer.writerows(records)
+    return Response(
+        content=buf.getvalue(),
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="{job.id}_timings.csv"'},
+    )
+
+
+@app.get("/download/{job_id}.zip")
+def download_zip(job_id: str, deflate: bool = False):
+    """
+    Stream all files of a job as one ZIP archive, built on the fly.
+    Entries are stored unless deflate=true.
+    """
+    job = get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not job.files:
+        raise HTTPException(status_code=404, detail="Job has no files")
+
+    return StreamingResponse(
+        iter_zip(list(job.files), deflate=deflate),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{job.id}.zip"'},
+    )
+
+
 @app.get("/download/{job_id}/{filename}")
-def download_file(job_id: str, filename: str):
-    """Download a generated IFC file for a job."""
+def download_file(job_id: str, filename: str, request: Request):
+    """
+    Download a generated file of a job. Served gzip-encoded from its
+    pre-compressed variant when the client accepts gzip.
+    """
     job = get_job(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
 
-    for p in job.files:
-        path = Path(p)
-        if path.name == filename and path.exists():
-            return FileResponse(str(path), filename=path.name, media_type="application/octet-stream")
+    p = find_job_file(job, filename)
+    if p and Path(p).exists():
+        return precompressed_file_response(
+            request.headers.get("accept-encoding"), p, media_type="application/octet-stream", filename=Path(p).name
+        )
 
     raise HTTPException(status_code=404, detail="File not found for this job")
 
+
+# -----------------------------------------------------------------------------
+# GLB (web viewer)
+# -----------------------------------------------------------------------------
+
+# <slug>_<refcat>_<zone>_envelope.glb
+_GLB_NAME_RE = re.compile(r"^(?P<refcat>[A-Za-z0-9]+)_(?P<zone>.+)_envelope$")
+
+
+def _parcel_glbs(municipality: str) -> Dict[str, Dict[str, Any]]:
+    """refcat -> {path, zone} of the newest envelope GLB of each parcel in OUTPUT_DIR."""
+    if municipality not in DEFAULT_MUNICIPALITIES:
+        raise HTTPException(status_code=400, detail="Unknown municipality")
+    slug = MUNICIPALITY_TO_SLUG.get(municipality, "municipality")
+    out: Dict[str, Dict[str, Any]] = {}
+    for p in OUTPUT_DIR.glob(f"{slug}_*_envelope.glb"):
+        m = _GLB_NAME_RE.match(p.stem[len(slug) + 1:])
+        if not m:
+            continue
+        mtime = p.stat().st_mtime
+        prev = out.get(m.group("refcat"))
+        if prev is None or mtime > prev["mtime"]:
+            out[m.group("refcat")] = {"path": p, "zone": m.group("zone"), "mtime": mtime}
+    return out
+
+
+def _glb_tiles(municipality: str, group_by: str) -> Dict[str, List[str]]:
+    """
+    tile id -> refcats, grouping the municipality's parcel GLBs like the
+    combined export. Tile ids are ASCII-safe so they can be used in URLs
+    and file names.
+    """
+    group_by = (group_by or "block").strip().lower()
+    if group_by not in COMBINED_GROUPINGS:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of: {', '.join(COMBINED_GROUPINGS)}")
+    tiles: Dict[str, List[str]] = {}
+    for refcat, info in sorted(_parcel_glbs(municipality).items()):
+        key = combined_group_key(group_by, refcat, info["zone"])
+        safe = "".join(c if (c.isascii() and c.isalnum()) or c in "-_" else "_" for c in key)
+        tiles.setdefault(safe, []).append(refcat)
+    return tiles
+
+
+@app.get("/glb/{municipality}/parcels/{refcat}.glb")
+def get_parcel_glb(municipality: str, refcat: str, request: Request):
+    """GLB of one parcel envelope (written next to its IFC when export_glb is on)."""
+    info = _parcel_glbs(municipality).get(refcat.strip())
+    if not info:
+        raise HTTPException(status_code=404, detail="No GLB for this parcel; generate it first")
+    return precompressed_file_response(
+        request.headers.get("accept-encoding"), info["path"], media_type=GLB_MEDIA_TYPE, filename=info["path"].name
+    )
+
+
+@app.get("/glb/{municipality}/tiles")
+def list_glb_tiles(municipality: str, group_by: str = "block") -> Dict[str, Any]:
+    """Overview tiles of a municipality: one merged GLB per block, zone or the whole municipality."""
+    tiles = _glb_tiles(municipality, group_by)
+    group_by = group_by.strip().lower()
+    base = f"/glb/{quote(municipality)}/tiles"
+    return {
+        "municipality": municipality,
+        "group_by": group_by,
+        "parcel_count": sum(len(v) for v in tiles.values()),
+        "tiles": [
+            {"tile": key, "parcels": len(refcats), "url": f"{base}/{key}.glb?group_by={group_by}"}
+            for key, refcats in sorted(tiles.items())
+        ],
+    }
+
+
+@app.get("/glb/{municipality}/tiles/{tile}.glb")
+def get_glb_tile(municipality: str, tile: str, request: Request, group_by: str = "block"):
+    """
+    One overview tile: the parcel GLBs of the group merged into a single GLB.
+    Built on first request and cached under outputs/tiles until a parcel changes.
+    """
+    refcats = _glb_tiles(municipality, group_by).get(tile)
+    if not refcats:
+        raise HTTPException(status_code=404, detail="Unknown tile")
+    glbs = _parcel_glbs(municipality)
+    slug = MUNICIPALITY_TO_SLUG.get(municipality, "municipality")
+    out_path = OUTPUT_DIR / "tiles" / f"{slug}_{group_by.strip().lower()}_{tile}.glb"
+    try:
+        path = ensure_tile(out_path, [(rc, glbs[rc]["path"]) for rc in refcats], name=f"{slug} {tile}")
+        if load_config().get("precompress_outputs", True):
+            ensure_gzip_variant(path)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Tile build failed: {e}")
+    return precompressed_file_response(
+        request.headers.get("accept-encoding"), path, media_type=GLB_MEDIA_TYPE, filename=path.name
+    )
+
 #cd "C:\Users\rauf1\OneDrive\Masaüstü\WORK!\backend"
 #..\.venv\Scripts\Activate.ps1
 #uvicorn main:app --reload --host 127.0.0.1 --port 8000
@@ -0,0 +1,189 @@
+"""
+Per-municipality build manifest for batch envelope generation.
+
+Responsibilities
+----------------
+- Persist the outcome of the last successful batch as JSON:
+  refcat -> input hash, output path, timings.
+- Diff the current per-parcel input hashes against that manifest so an
+  incremental batch only regenerates added or changed parcels.
+- Remove outputs of parcels that disappeared from the POUM.
+
+Notes
+-----
+- One manifest per municipality slug under OUTPUT_DIR/manifests.
+- Writes are atomic (temp file + replace) so a crash never leaves a
+  half-written manifest behind.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import json
+import os
+import time
+
+from compression import remove_variants
+
+MANIFEST_VERSION = 1
+
+
+@dataclass
+class ManifestDiff:
+    """
+    Result of comparing current inputs with the stored manifest.
+
+    added: refcats not present in the manifest.
+    changed: refcats whose input hash differs or whose output is missing.
+    unchanged: refcats whose output can be reused as-is.
+    removed: refcats present in the manifest but no longer in the POUM.
+    """
+    added: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    unchanged: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+
+    @property
+    def to_generate(self) -> List[str]:
+        return sorted(self.added + self.changed)
+
+
+def manifest_path(output_dir: str | Path, municipality_slug: str) -> Path:
+    """Return the manifest location for a municipality."""
+    return Path(output_dir) / "manifests" / f"{municipality_slug}_manifest.json"
+
+
+def empty_manifest(municipality_slug: str) -> Dict[str, Any]:
+    return {
+        "version": MANIFEST_VERSION,
+        "municipality_slug": municipality_slug,
+        "updated_at": None,
+        "job_id": None,
+        "parcels": {},
+    }
+
+
+def load_manifest(path: str | Path, municipality_slug: str) -> Dict[str, Any]:
+    """
+    Load a manifest from disk. Missing, unreadable or outdated manifests are
+    treated as empty, which makes the next incremental run a full rebuild.
+    """
+    p = Path(path)
+    if not p.exists():
+        return empty_manifest(municipality_slug)
+    try:
+        data = json.loads(p.read_text(encoding="utf-8"))
+    except Exception:
+        return empty_manifest(municipality_slug)
+    if not isinstance(data, dict) or data.get("version") != MANIFEST_VERSION:
+        return empty_manifest(municipality_slug)
+    if not isinstance(data.get("parcels"), dict):
+        data["parcels"] = {}
+    return data
+
+
+def save_manifest(path: str | Path, manifest: Dict[str, Any]) -> None:
+    """Atomically write the manifest to disk."""
+    p = Path(path)
+    p.parent.mkdir(parents=True, exist_ok=True)
+    manifest["updated_at"] = time.time()
+    tmp = p.with_name(p.name + ".tmp")
+    tmp.write_text(json.dumps(manifest, indent=2, sort_keys=True), encoding="utf-8")
+    os.replace(tmp, p)
+
+
+def make_entry(input_hash: str, result: Dict[str, Any], elapsed_s: float) -> Dict[str, Any]:
+    """Build the manifest record for one generated parcel."""
+    return {
+        "input_hash": input_hash,
+        "ifc_path": result.get("ifc_path"),
+        "ifczip_path": result.get("ifczip_path"),
+        "viewer_ifc_path": result.get("viewer_ifc_path"),
+        "glb_path": result.get("glb_path"),
+        "skipped": bool(result.get("skipped")),
+        "zone": result.get("zone"),
+        "elapsed_s": round(float(elapsed_s), 4),
+        "generated_at": time.time(),
+    }
+
+
+def output_present(entry: Dict[str, Any]) -> bool:
+    """True if the entry's IFC still exists (or the parcel was skipped)."""
+    if entry.get("skipped"):
+        return True
+    out = entry.get("ifc_path")
+    return bool(out) and Path(out).exists()
+
+
+def diff_manifest(manifest: Dict[str, Any], input_hashes: Dict[str, str]) -> ManifestDiff:
+    """Classify current refcats against the last successful batch."""
+    parcels: Dict[str, Any] = manifest.get("parcels") or {}
+    diff = ManifestDiff()
+
+    for refcat in sorted(input_hashes):
+        entry = parcels.get(refcat)
+        if not isinstance(entry, dict):
+            diff.added.append(refcat)
+        elif entry.get("input_hash") != input_hashes[refcat] or not output_present(entry):
+            diff.changed.append(refcat)
+        else:
+            diff.unchanged.append(refcat)
+
+    diff.removed = sorted(set(parcels) - set(input_hashes))
+    return diff
+
+
+def delete_output(entry: Optional[Dict[str, Any]], keep: Optional[str] = None) -> bool:
+    """
+    Delete the IFC (and its ifcZIP, GLB and .gz variants, including the
+    viewer copy of an ifcZIP-only output) referenced by a manifest entry.
+    `keep` protects an IFC path that is still in use (e.g. a regenerated
+    parcel that kept the same filename), together with its companions.
+    Returns True if the IFC was removed.
+    """
+    if not isinstance(entry, dict):
+        return False
+    out = entry.get("ifc_path")
+    if not out:
+        return False
+    p = Path(out)
+    if keep and p.resolve() == Path(keep).resolve():
+        return False
+    for extra in (entry.get("glb_path"), entry.get("ifczip_path")):
+        if extra and Path(extra) != p:
+            try:
+                Path(extra).unlink(missing_ok=True)
+            except Exception:
+                pass
+        remove_variants(extra)
+    remove_variants(entry.get("viewer_ifc_path"))
+    remove_variants(p)
+    try:
+        if p.exists():
+            p.unlink()
+            return True
+    except Exception:
+        pass
+    return False
+
+
+def delete_dropped_companions(entry: Optional[Dict[str, Any]], result: Dict[str, Any]) -> None:
+    """
+    Delete the GLB and ifcZIP of a previous manifest entry that its
+    regeneration (`result`) no longer writes, e.g. after export_glb was
+    switched off. delete_output leaves them when the IFC path is reused.
+    """
+    if not isinstance(entry, dict):
+        return
+    current = {Path(p).resolve() for p in (result.get("ifc_path"), result.get("glb_path"), result.get("ifczip_path")) if p}
+    for key in ("glb_path", "ifczip_path"):
+        extra = entry.get(key)
+        if not extra or Path(extra).resolve() in current:
+            continue
+        try:
+            Path(extra).unlink(missing_ok=True)
+        except Exception:
+            pass
+        remove_variants(extra)
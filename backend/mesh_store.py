@@ -0,0 +1,187 @@
+"""
+Tessellated geometry of an IFC model, produced in one pass.
+
+Responsibilities
+----------------
+- build_mesh_store(model): run one multi-core ifcopenshell.geom.iterator
+  over the model (world coordinates) and keep every product's triangle
+  mesh in a compact MeshStore: NumPy vertex/face arrays for all products,
+  plus per-product id, IFC class and containing storey.
+- Row queries used by the compliance and clash checks: vertices,
+  triangles and bbox of any subset of products.
+
+Notes
+-----
+- Vertices stay float64: architect models are often in UTM coordinates,
+  where float32 would lose centimetres.
+- Products the kernel skips or cannot tessellate (spaces, openings, broken
+  representations) are simply absent; callers fall back to the raw
+  IfcCartesianPoint walk for them.
+- Returns None without the ifcopenshell geometry kernel.
+- Stores are built once per parsed model through ifc_cache.derived and
+  count toward its memory budget (MeshStore.nbytes).
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Any, Dict, Iterable, List, Optional
+import os
+
+import numpy as np
+
+try:
+    import ifcopenshell.geom as _ifc_geom  # type: ignore
+except Exception:  # pragma: no cover - environment without geom kernel
+    _ifc_geom = None  # type: ignore
+
+
+@dataclass(frozen=True)
+class MeshStore:
+    """
+    Triangle meshes of all tessellated products, row i being one product:
+    its vertices are verts[vert_offsets[i]:vert_offsets[i + 1]] and its
+    faces faces[face_offsets[i]:face_offsets[i + 1]] (indices into verts).
+    """
+
+    verts: np.ndarray          # (V, 3) float64, world coordinates
+    faces: np.ndarray          # (F, 3) int32, indices into verts
+    product_ids: np.ndarray    # (P,) int64, IFC entity ids
+    types: List[str]           # (P,) IFC class names
+    storey_ids: np.ndarray     # (P,) int64, containing IfcBuildingStorey id (0 = none)
+    vert_offsets: np.ndarray   # (P + 1,) int64
+    face_offsets: np.ndarray   # (P + 1,) int64
+    row_of: Dict[int, int]     # IFC entity id -> row
+
+    def __len__(self) -> int:
+        return len(self.product_ids)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.verts, self.faces, self.product_ids, self.storey_ids, self.vert_offsets, self.face_offsets)
+        return int(sum(a.nbytes for a in arrays))
+
+    def rows(self, product_ids: Iterable[int]) -> np.ndarray:
+        """Rows of the given products, skipping those without a mesh."""
+        return np.array([self.row_of[i] for i in product_ids if i in self.row_of], dtype=np.int64)
+
+    def storey_rows(self, storey_id: int) -> np.ndarray:
+        """Rows of the products directly contained in a storey."""
+        return np.flatnonzero(self.storey_ids == int(storey_id))
+
+    def _ranges(self, offsets: np.ndarray, rows: Optional[np.ndarray]) -> np.ndarray:
+        """Concatenated index ranges offsets[r]:offsets[r + 1] of `rows` (all when None)."""
+        if rows is None:
+            return np.arange(offsets[-1], dtype=np.int64)
+        rows = np.asarray(rows, dtype=np.int64)
+        if rows.size == 0:
+            return np.zeros(0, dtype=np.int64)
+        starts, ends = offsets[rows], offsets[rows + 1]
+        lengths = ends - starts
+        # Position of every output index within its range, shifted to its start
+        shift = np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+        return np.arange(int(lengths.sum()), dtype=np.int64) + shift
+
+    def vertices(self, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """(N, 3) vertices of the given rows (all products when None)."""
+        return self.verts[self._ranges(self.vert_offsets, rows)]
+
+    def triangles(self, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """(T, 3, 3) triangle corner coordinates of the given rows (all when None)."""
+        return self.verts[self.faces[self._ranges(self.face_offsets, rows)]]
+
+    @cached_property
+    def product_bboxes(self) -> np.ndarray:
+        """(P, 2, 3) min/max corners of every product (one reduceat pass)."""
+        if not len(self):
+            return np.zeros((0, 2, 3))
+        starts = self.vert_offsets[:-1]
+        return np.stack(
+            (np.minimum.reduceat(self.verts, starts, axis=0), np.maximum.reduceat(self.verts, starts, axis=0)),
+            axis=1,
+        )
+
+    def bbox(self, rows: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+        """(2, 3) min/max corners of the given rows, or None if they have no vertices."""
+        v = self.vertices(rows)
+        if len(v) == 0:
+            return None
+        return np.stack((v.min(axis=0), v.max(axis=0)))
+
+
+def _storey_index(model: Any) -> Dict[int, int]:
+    """IFC entity id -> id of the IfcBuildingStorey that directly contains it."""
+    out: Dict[int, int] = {}
+    for rel in model.by_type("IfcRelContainedInSpatialStructure"):
+        structure = getattr(rel, "RelatingStructure", None)
+        if structure is None or not structure.is_a("IfcBuildingStorey"):
+            continue
+        for el in getattr(rel, "RelatedElements", None) or []:
+            out[el.id()] = structure.id()
+    return out
+
+
+def _iterator_settings() -> Any:
+    settings = _ifc_geom.settings()
+    try:
+        settings.set(settings.USE_WORLD_COORDS, True)
+    except Exception:
+        settings.set("use-world-coords", True)
+    return settings
+
+
+def build_mesh_store(model: Any, workers: Optional[int] = None) -> Optional[MeshStore]:
+    """
+    Tessellate every product of `model` in one geom.iterator pass on
+    `workers` threads (default: all cores but one). None without the kernel.
+    """
+    if _ifc_geom is None:
+        return None
+    if workers is None:
+        workers = max(1, (os.cpu_count() or 2) - 1)
+
+    storey_of = _storey_index(model)
+    ids: List[int] = []
+    types: List[str] = []
+    storeys: List[int] = []
+    vert_chunks: List[np.ndarray] = []
+    face_chunks: List[np.ndarray] = []
+    vert_offsets = [0]
+    face_offsets = [0]
+
+    it = _ifc_geom.iterator(_iterator_settings(), model, workers)
+    if it.initialize():
+        while True:
+            shape = it.get()
+            try:
+                verts = np.asarray(shape.geometry.verts, dtype=np.float64).reshape(-1, 3)
+                faces = np.asarray(shape.geometry.faces, dtype=np.int64).reshape(-1, 3)
+            except Exception:
+                verts = faces = None
+            if verts is not None and len(verts) and len(faces):
+                product_id = int(shape.id)
+                try:
+                    product_type = model.by_id(product_id).is_a()
+                except Exception:
+                    product_type = str(getattr(shape, "type", ""))
+                ids.append(product_id)
+                types.append(product_type)
+                storeys.append(storey_of.get(product_id, 0))
+                face_chunks.append(faces + vert_offsets[-1])
+                vert_chunks.append(verts)
+                vert_offsets.append(vert_offsets[-1] + len(verts))
+                face_offsets.append(face_offsets[-1] + len(faces))
+            if not it.next():
+                break
+
+    return MeshStore(
+        verts=np.concatenate(vert_chunks) if vert_chunks else np.zeros((0, 3)),
+        faces=(np.concatenate(face_chunks) if face_chunks else np.zeros((0, 3), dtype=np.int64)).astype(np.int32),
+        product_ids=np.array(ids, dtype=np.int64),
+        types=types,
+        storey_ids=np.array(storeys, dtype=np.int64),
+        vert_offsets=np.array(vert_offsets, dtype=np.int64),
+        face_offsets=np.array(face_offsets, dtype=np.int64),
+        row_of={pid: row for row, pid in enumerate(ids)},
+    )
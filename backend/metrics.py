@@ -0,0 +1,226 @@
+"""
+Process metrics in Prometheus text exposition format.
+
+Responsibilities
+----------------
+- Collect HTTP request latency histograms per route template.
+- Count WFS calls, their latency and errors.
+- Count cache hits/misses per named cache (POUM index, preprocess store, ...).
+- Track generated parcels for a parcels/second rate.
+- Render everything (plus job counts, queue depth, stage timings and RSS)
+  for the `/metrics` endpoint.
+
+Notes
+-----
+- No dependency on prometheus_client; the text format is written directly.
+- All collectors are process-local and guarded by one lock.
+- RSS uses psutil when installed, otherwise /proc/self/statm (Linux).
+"""
+
+from __future__ import annotations
+
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+import os
+import threading
+import time
+
+from timing import process_stage_summary
+
+try:
+    import psutil as _psutil  # type: ignore
+    _HAS_PSUTIL = True
+except Exception:  # pragma: no cover - optional dependency
+    _HAS_PSUTIL = False
+
+# Latency buckets (seconds) shared by HTTP and WFS histograms
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Window used for the parcels/second gauge
+RATE_WINDOW_S = 60.0
+
+_LOCK = threading.Lock()
+
+
+class _Histogram:
+    """Cumulative-bucket histogram keyed by a label tuple."""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.buckets = buckets
+        self.series: Dict[Tuple[str, ...], List[float]] = {}   # labels -> [b0..bn, +Inf, sum]
+
+    def observe(self, labels: Tuple[str, ...], value: float) -> None:
+        row = self.series.get(labels)
+        if row is None:
+            row = [0.0] * (len(self.buckets) + 2)
+            self.series[labels] = row
+        for i, le in enumerate(self.buckets):
+            if value <= le:
+                row[i] += 1
+        row[-2] += 1
+        row[-1] += value
+
+
+_HTTP_LATENCY = _Histogram()
+_HTTP_REQUESTS: Dict[Tuple[str, str, str], int] = {}    # (method, route, status) -> count
+_WFS_LATENCY = _Histogram()
+_WFS_ERRORS: Dict[str, int] = {}                        # error type -> count
+_CACHE: Dict[str, List[int]] = {}                       # cache -> [hits, misses]
+_PARCELS: Dict[str, int] = {}                           # status -> count
+_PARCEL_TIMES: Deque[float] = deque(maxlen=10000)
+
+
+# -----------------------------------------------------------------------------
+# Recording helpers
+# -----------------------------------------------------------------------------
+
+def observe_request(method: str, route: str, status_code: int, seconds: float) -> None:
+    """Record one HTTP request; `route` should be the route template, not the raw URL."""
+    with _LOCK:
+        _HTTP_LATENCY.observe((method, route), seconds)
+        key = (method, route, str(status_code))
+        _HTTP_REQUESTS[key] = _HTTP_REQUESTS.get(key, 0) + 1
+
+
+def observe_wfs_call(seconds: float, error: Optional[str] = None) -> None:
+    """Record one WFS request; `error` is the exception type name when it failed."""
+    outcome = "error" if error else "ok"
+    with _LOCK:
+        _WFS_LATENCY.observe((outcome,), seconds)
+        if error:
+            _WFS_ERRORS[error] = _WFS_ERRORS.get(error, 0) + 1
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    """Count a lookup on a named cache."""
+    with _LOCK:
+        row = _CACHE.setdefault(cache, [0, 0])
+        row[0 if hit else 1] += 1
+
+
+def record_parcel(status: str) -> None:
+    """Count one generated parcel (ok | skipped | error)."""
+    with _LOCK:
+        _PARCELS[status] = _PARCELS.get(status, 0) + 1
+        _PARCEL_TIMES.append(time.time())
+
+
+def process_rss_bytes() -> Optional[int]:
+    """Resident set size of this process, or None if it cannot be read."""
+    if _HAS_PSUTIL:
+        try:
+            return int(_psutil.Process().memory_info().rss)
+        except Exception:
+            pass
+    try:
+        with open("/proc/self/statm", "r", encoding="ascii") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        return None
+
+
+# -----------------------------------------------------------------------------
+# Rendering
+# -----------------------------------------------------------------------------
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _fmt(value: float) -> str:
+    if value == int(value):
+        return str(int(value))
+    return repr(float(value))
+
+
+def _render_histogram(lines: List[str], name: str, help_text: str, hist: _Histogram, label_names: Tuple[str, ...]) -> None:
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for labels, row in sorted(hist.series.items()):
+        for i, le in enumerate(hist.buckets):
+            lines.append(f"{name}_bucket{_labels(label_names + ('le',), labels + (_fmt(le),))} {_fmt(row[i])}")
+        lines.append(f"{name}_bucket{_labels(label_names + ('le',), labels + ('+Inf',))} {_fmt(row[-2])}")
+        lines.append(f"{name}_sum{_labels(label_names, labels)} {row[-1]!r}")
+        lines.append(f"{name}_count{_labels(label_names, labels)} {_fmt(row[-2])}")
+
+
+def render_metrics(job_counts: Dict[str, int]) -> str:
+    """
+    Render all metrics as Prometheus text. `job_counts` maps job status to
+    the number of jobs in that status.
+    """
+    now = time.time()
+
+    with _LOCK:
+        http_requests = dict(_HTTP_REQUESTS)
+        wfs_errors = dict(_WFS_ERRORS)
+        cache = {k: list(v) for k, v in _CACHE.items()}
+        parcels = dict(_PARCELS)
+        recent = sum(1 for t in _PARCEL_TIMES if now - t <= RATE_WINDOW_S)
+        lines: List[str] = []
+        _render_histogram(lines, "envelope_http_request_duration_seconds", "HTTP request latency by route.", _HTTP_LATENCY, ("method", "route"))
+        _render_histogram(lines, "envelope_wfs_request_duration_seconds", "Cadastre WFS request latency.", _WFS_LATENCY, ("outcome",))
+
+    lines.append("# HELP envelope_http_requests_total HTTP requests by route and status code.")
+    lines.append("# TYPE envelope_http_requests_total counter")
+    for (method, route, status), count in sorted(http_requests.items()):
+        lines.append(f"envelope_http_requests_total{_labels(('method', 'route', 'status'), (method, route, status))} {count}")
+
+    lines.append("# HELP envelope_wfs_errors_total Failed Cadastre WFS requests by error type.")
+    lines.append("# TYPE envelope_wfs_errors_total counter")
+    for err, count in sorted(wfs_errors.items()):
+        lines.append(f"envelope_wfs_errors_total{_labels(('error',), (err,))} {count}")
+
+    lines.append("# HELP envelope_jobs Jobs in the registry by status.")
+    lines.append("# TYPE envelope_jobs gauge")
+    by_status: Dict[str, int] = {s: 0 for s in ("queued", "running", "success", "error")}
+    by_status.update(job_counts)
+    for status, count in sorted(by_status.items()):
+        lines.append(f"envelope_jobs{_labels(('status',), (status,))} {count}")
+
+    lines.append("# HELP envelope_queue_depth Jobs waiting to start.")
+    lines.append("# TYPE envelope_queue_depth gauge")
+    lines.append(f"envelope_queue_depth {by_status.get('queued', 0)}")
+
+    lines.append("# HELP envelope_parcels_total Generated parcels by outcome.")
+    lines.append("# TYPE envelope_parcels_total counter")
+    for status, count in sorted(parcels.items()):
+        lines.append(f"envelope_parcels_total{_labels(('status',), (status,))} {count}")
+
+    lines.append(f"# HELP envelope_parcels_per_second Parcels finished per second over the last {int(RATE_WINDOW_S)}s.")
+    lines.append("# TYPE envelope_parcels_per_second gauge")
+    lines.append(f"envelope_parcels_per_second {recent / RATE_WINDOW_S!r}")
+
+    lines.append("# HELP envelope_cache_requests_total Cache lookups by cache and result.")
+    lines.append("# TYPE envelope_cache_requests_total counter")
+    for name, (hits, misses) in sorted(cache.items()):
+        lines.append(f"envelope_cache_requests_total{_labels(('cache', 'result'), (name, 'hit'))} {hits}")
+        lines.append(f"envelope_cache_requests_total{_labels(('cache', 'result'), (name, 'miss'))} {misses}")
+    lines.append("# HELP envelope_cache_hit_ratio Cache hit ratio since process start.")
+    lines.append("# TYPE envelope_cache_hit_ratio gauge")
+    for name, (hits, misses) in sorted(cache.items()):
+        total = hits + misses
+        lines.append(f"envelope_cache_hit_ratio{_labels(('cache',), (name,))} {(hits / total if total else 0.0)!r}")
+
+    stages = process_stage_summary()
+    lines.append("# HELP envelope_stage_duration_seconds Pipeline stage durations (quantiles over a recent window).")
+    lines.append("# TYPE envelope_stage_duration_seconds summary")
+    for stage, s in sorted(stages.items()):
+        for q, key in (("0.5", "p50"), ("0.95", "p95"), ("1", "max")):
+            lines.append(f"envelope_stage_duration_seconds{_labels(('stage', 'quantile'), (stage, q))} {s[key]!r}")
+        lines.append(f"envelope_stage_duration_seconds_sum{_labels(('stage',), (stage,))} {s['sum']!r}")
+        lines.append(f"envelope_stage_duration_seconds_count{_labels(('stage',), (stage,))} {s['count']}")
+
+    rss = process_rss_bytes()
+    if rss is not None:
+        lines.append("# HELP process_resident_memory_bytes Resident memory size in bytes.")
+        lines.append("# TYPE process_resident_memory_bytes gauge")
+        lines.append(f"process_resident_memory_bytes {rss}")
+
+    return "\n".join(lines) + "\n"
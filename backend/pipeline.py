@@ -7,6 +7,9 @@ Responsibilities
 - Resolves parcel polygon source (POUM, Cadastre, or both).
 - Applies zoning rules to compute height/depth and roof constraints.
 - Exports IFC envelope files and normalizes output paths.
+- Returns the envelope as an in-memory EnvelopeGeometry alongside (or,
+  with write_ifc=False, instead of) the files.
+- Hashes per-parcel inputs so batch runs can skip unchanged parcels.
 
 Data flow
 ---------
@@ -17,24 +20,36 @@ Notes
 -----
 - Configuration supports layered overrides (default → config.json → ENV override).
 - Cadastre WFS failures are handled with fallbacks when possible.
+- Polygon-source and depth decisions are logged at DEBUG level
+  (logger "pipeline"; see logging_setup.py).
 """
 
 from __future__ import annotations
 
 from pathlib import Path
 from typing import Dict, Any, List, Optional, Tuple
+from dataclasses import asdict
 import time
 import shutil
 import math
 import json
+import hashlib
+import logging
 import os
 
 from pyproj import Transformer
 
-from cadastre_client import get_parcel_polygon_by_local_id
-from poum_index import build_refcat_to_poum_index, PoumInfo
+from cadastre_client import get_parcel_polygon_by_local_id, WfsUnavailableError
+from poum_index import build_refcat_to_poum_index, build_refcat_to_feature_digest, PoumInfo
 import regulations
-from ifc_exporter import create_ifc_envelope
+from ifc_exporter import create_ifc_envelope, compute_envelope_plan, describe_envelope, parcel_footprint, CombinedIfcExport
+from cancellation import CancelToken, JobCancelled, ParcelTimeout
+from compression import finalize_ifc_output, ensure_gzip_variant, remove_variants
+from manifest import delete_output
+from timing import StageTimer, timed_stage, record_stage_timings
+from metrics import record_cache
+
+logger = logging.getLogger(__name__)
 
 
 # --- Simple cache for POUM index ---
@@ -49,7 +64,9 @@ def _get_poum_index(poum_gml_path: str) -> Dict[str, PoumInfo]:
     p = Path(poum_gml_path)
     mtime = p.stat().st_mtime
 
-    if _POUM_CACHE["path"] != str(p.resolve()) or _POUM_CACHE["mtime"] != mtime or _POUM_CACHE["index"] is None:
+    hit = not (_POUM_CACHE["path"] != str(p.resolve()) or _POUM_CACHE["mtime"] != mtime or _POUM_CACHE["index"] is None)
+    record_cache("poum_index", hit)
+    if not hit:
         idx = build_refcat_to_poum_index(str(p))
         _POUM_CACHE["path"] = str(p.resolve())
         _POUM_CACHE["mtime"] = mtime
@@ -57,6 +74,55 @@ def _get_poum_index(poum_gml_path: str) -> Dict[str, PoumInfo]:
     return _POUM_CACHE["index"]
 
 
+# --- Simple cache for POUM feature digests (incremental batches) ---
+_POUM_DIGEST_CACHE: Dict[str, Any] = {
+    "path": None,
+    "mtime": None,
+    "index": None,
+}
+
+
+def _get_poum_digest_index(poum_gml_path: str) -> Dict[str, str]:
+    p = Path(poum_gml_path)
+    mtime = p.stat().st_mtime
+
+    hit = not (_POUM_DIGEST_CACHE["path"] != str(p.resolve()) or _POUM_DIGEST_CACHE["mtime"] != mtime or _POUM_DIGEST_CACHE["index"] is None)
+    record_cache("poum_digest", hit)
+    if not hit:
+        idx = build_refcat_to_feature_digest(str(p))
+        _POUM_DIGEST_CACHE["path"] = str(p.resolve())
+        _POUM_DIGEST_CACHE["mtime"] = mtime
+        _POUM_DIGEST_CACHE["index"] = idx
+    return _POUM_DIGEST_CACHE["index"]
+
+
+# --- Simple cache for the preprocess JSON (parsed once per file version) ---
+_PREPROCESS_CACHE: Dict[str, Any] = {
+    "path": None,
+    "mtime": None,
+    "data": None,
+}
+
+
+def _get_preprocess_data(p: Path) -> Optional[Dict[str, Any]]:
+    try:
+        mtime = p.stat().st_mtime
+    except OSError:
+        return None
+
+    hit = not (_PREPROCESS_CACHE["path"] != str(p.resolve()) or _PREPROCESS_CACHE["mtime"] != mtime)
+    record_cache("preprocess_store", hit)
+    if not hit:
+        try:
+            data = json.loads(p.read_text(encoding="utf-8"))
+        except Exception:
+            data = None
+        _PREPROCESS_CACHE["path"] = str(p.resolve())
+        _PREPROCESS_CACHE["mtime"] = mtime
+        _PREPROCESS_CACHE["data"] = data if isinstance(data, dict) else None
+    return _PREPROCESS_CACHE["data"]
+
+
 # -----------------------------------------------------------------------------
 # Configuration loader
 # -----------------------------------------------------------------------------
@@ -76,13 +142,21 @@ def _load_config() -> dict:
       - ground_height: float
       - default_depth_m: float or null
       - force_depth_m: bool
-      - debug_depth_log: bool
+      - debug_depth_log: bool (legacy; enables DEBUG logs for pipeline/ifc_exporter)
+      - log_level / log_levels / log_format / log_json_path (see logging_setup.py)
       - polygon_source: 'poum'|'cadastre'|'both'
       - poum_mode: 'parcel'|'zone'
       - poum_zone_area_ratio_threshold: float
       - poum_simplify_zone: bool
       - poum_simplify_method: string
       - roof_rise_max_m: float
+      - envelope_representation: 'faceset'|'brep'
+      - ifc_writer: 'ifcopenshell'|'step'
+      - ifc_skeleton_template: bool (clone the IFC skeleton from a per-process template)
+      - export_glb: bool (write a GLB next to each envelope IFC)
+      - ifc_output_format: 'ifc'|'ifczip'|'both' (ifczip keeps the plain IFC as .gz for the viewer)
+      - precompress_outputs: bool (write .gz variants for gzip downloads)
+      - deterministic_ifc: bool (seeded GlobalIds + fixed header time stamp)
             - generate_use_preprocess_geometry: bool
     """
     # Base: code defaults
@@ -91,12 +165,23 @@ def _load_config() -> dict:
         "default_depth_m": None,
         "force_depth_m": False,
         "debug_depth_log": False,
+        "log_level": "INFO",
+        "log_levels": {},
+        "log_format": "text",
+        "log_json_path": None,
         "polygon_source": "both",
         "poum_mode": "parcel",
         "poum_zone_area_ratio_threshold": 3.0,
         "poum_simplify_zone": True,
         "poum_simplify_method": "convex_hull",
         "roof_rise_max_m": 10.0,
+        "envelope_representation": "faceset",
+        "ifc_writer": "ifcopenshell",
+        "ifc_skeleton_template": False,
+        "export_glb": True,
+        "ifc_output_format": "ifc",
+        "precompress_outputs": True,
+        "deterministic_ifc": True,
         "poum_zone_intersection": True,
         "generate_use_preprocess_geometry": False,
     }
@@ -124,6 +209,10 @@ def _load_config() -> dict:
     return defaults
 
 
+def load_config() -> dict:
+    """Public accessor for the layered configuration (see `_load_config`)."""
+    return _load_config()
+
 
 def list_refcats_from_poum(poum_gml_path: str) -> List[str]:
     idx = _get_poum_index(poum_gml_path)
@@ -270,12 +359,8 @@ def _load_preprocessed_parcel_geometry(refcat: str, config: Dict[str, Any]) -> O
     if p is None or not p.exists():
         return None
 
-    try:
-        data = json.loads(p.read_text(encoding="utf-8"))
-    except Exception:
-        return None
-
-    if not isinstance(data, dict):
+    data = _get_preprocess_data(p)
+    if data is None:
         return None
 
     parcel = data.get(refcat)
@@ -354,42 +439,112 @@ def _load_preprocessed_parcel_geometry(refcat: str, config: Dict[str, Any]) -> O
     }
 
 
-def generate_one(
+# Config keys that change the generated envelope or the files written for it.
+# Anything else in config.json (logging, service knobs) must not invalidate
+# previously generated parcels. Adding a key changes every config hash, so the
+# next incremental batch rebuilds all parcels once.
+GENERATION_CONFIG_KEYS = (
+    "ground_height",
+    "default_depth_m",
+    "force_depth_m",
+    "polygon_source",
+    "poum_mode",
+    "poum_zone_area_ratio_threshold",
+    "poum_simplify_zone",
+    "poum_simplify_method",
+    "poum_zone_intersection",
+    "roof_rise_max_m",
+    "envelope_representation",
+    "ifc_output_format",
+    "export_glb",
+    "precompress_outputs",
+    "deterministic_ifc",
+    "generate_use_preprocess_geometry",
+)
+
+# Bump when exporter geometry changes so incremental batches rebuild everything.
+INPUT_HASH_VERSION = 2
+
+
+def _sha256_json(value: Any) -> str:
+    raw = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def compute_parcel_input_hashes(refcats: List[str], poum_gml_path: str) -> Dict[str, str]:
+    """
+    Return {refcat: input_hash} covering every input that shapes the envelope:
+    POUM feature (attributes + polygon), preprocess parcel entry, zone rule
+    from regulations and the generation-relevant config keys.
+
+    Cadastre WFS polygons are not fetched here; parcels sourced from the live
+    WFS are assumed stable between runs.
+    """
+    config = _load_config()
+    config_hash = _sha256_json({k: config.get(k) for k in GENERATION_CONFIG_KEYS})
+
+    idx = _get_poum_index(poum_gml_path)
+    digests = _get_poum_digest_index(poum_gml_path)
+
+    preprocess: Optional[Dict[str, Any]] = None
+    if config.get("generate_use_preprocess_geometry", False):
+        p = _resolve_preprocess_output_path(config)
+        if p is not None and p.exists():
+            preprocess = _get_preprocess_data(p)
+
+    hashes: Dict[str, str] = {}
+    for refcat in refcats:
+        poum_info = idx.get(refcat)
+        zone = (poum_info.zone if poum_info else None) or "UNKNOWN"
+        zc = regulations.canonical_zone(zone)
+        rule = regulations.ZONE_RULES.get(zc, regulations.DEFAULT_RULE)
+
+        hashes[refcat] = _sha256_json(
+            {
+                "version": INPUT_HASH_VERSION,
+                "config": config_hash,
+                "poum": digests.get(refcat),
+                "preprocess": (preprocess or {}).get(refcat),
+                "rule": asdict(rule),
+            }
+        )
+    return hashes
+
+
+def _resolve_parcel_polygon(
     refcat: str,
     poum_gml_path: str,
-    output_dir: str | Path,
-    municipality_slug: str = "malgrat",
-    include_cadaster_ground: bool = True,
+    config: Dict[str, Any],
+    timer: Optional[StageTimer] = None,
 ) -> Dict[str, Any]:
     """
-    Generate a single parcel envelope:
-    WFS/POUM polygon → POUM zone → rules (regulations/POUM/default) → IFC
+    Resolve zone and footprint polygon for a parcel:
+    preprocess JSON → POUM (parcel/zone) → Cadastre WFS, according to config.
+    Returns the closed footprint ring (EPSG:25831 / UTM metres) plus provenance.
     """
-    output_dir = Path(output_dir)
-    output_dir.mkdir(parents=True, exist_ok=True)
-
-    idx = _get_poum_index(poum_gml_path)
-    poum_info = idx.get(refcat)
+    with timed_stage(timer, "poum_lookup"):
+        idx = _get_poum_index(poum_gml_path)
+        poum_info = idx.get(refcat)
 
     zone = (poum_info.zone if poum_info else None) or "UNKNOWN"
 
-    config = _load_config()
     xy = None
     street_metrics: Optional[Dict[str, Any]] = None
     street_segments: Optional[List[Dict[str, Any]]] = None
     used_preprocess_geometry = False
     preprocess_source_file: Optional[str] = None
+    used_wfs = False
 
     if config.get("generate_use_preprocess_geometry", False):
-        pre = _load_preprocessed_parcel_geometry(refcat, config)
+        with timed_stage(timer, "preprocess_load"):
+            pre = _load_preprocessed_parcel_geometry(refcat, config)
         if pre is not None:
             xy = pre["points"]
             street_metrics = pre.get("street_metrics")
             street_segments = pre.get("street_segments")
             used_preprocess_geometry = True
             preprocess_source_file = pre.get("source_file")
-            if config.get("debug_depth_log"):
-                print(f"[SRC] Using preprocess geometry for {refcat} from {pre.get('source_file')}")
+            logger.debug("[SRC] Using preprocess geometry for %s from %s", refcat, preprocess_source_file, extra={"refcat": refcat})
 
     # 1) Attempt to obtain polygon according to config: POUM, Cadastre or both
     polygon_source = config.get("polygon_source", "both")
@@ -401,13 +556,13 @@ def generate_one(
         poum_mode = config.get("poum_mode", "parcel")  # 'parcel' or 'zone'
         strict = True if poum_mode == "parcel" else False
 
-        poum_poly = get_polygon_by_refcat(poum_gml_path, refcat, strict=strict)
+        with timed_stage(timer, "poum_lookup"):
+            poum_poly = get_polygon_by_refcat(poum_gml_path, refcat, strict=strict)
         if poum_poly:
             # If strict (parcel), it's exact
             if strict:
                 xy = poum_poly
-                if config.get("debug_depth_log"):
-                    print(f"[SRC] Using POUM polygon for {refcat} (mode={poum_mode})")
+                logger.debug("[SRC] Using POUM polygon for %s (mode=%s)", refcat, poum_mode, extra={"refcat": refcat})
             else:
                 # Non-strict: simplify zone polygons, compare areas, and intersect with cadastre
                 try:
@@ -418,14 +573,19 @@ def generate_one(
                         try:
                             simplified = convex_hull(poum_poly)
                             poum_poly_use = simplified
-                            if config.get("debug_depth_log"):
-                                print(f"[SRC] Simplified POUM zone polygon for {refcat}: {len(poum_poly)} -> {len(simplified)} pts")
+                            logger.debug(
+                                "[SRC] Simplified POUM zone polygon for %s: %d -> %d pts",
+                                refcat, len(poum_poly), len(simplified), extra={"refcat": refcat},
+                            )
                         except Exception:
                             # Fallback to original if simplification fails
                             poum_poly_use = poum_poly
 
-                    lonlat = get_parcel_polygon_by_local_id(refcat)
-                    cad_xy = _transform_wgs84_to_utm(lonlat)
+                    used_wfs = True
+                    with timed_stage(timer, "wfs_fetch"):
+                        lonlat = get_parcel_polygon_by_local_id(refcat)
+                    with timed_stage(timer, "crs_transform"):
+                        cad_xy = _transform_wgs84_to_utm(lonlat)
                     cad_xy = _ensure_closed(cad_xy)
 
                     # Area checks to avoid using very large zone polygons
@@ -438,68 +598,89 @@ def generate_one(
                     if not config.get("poum_zone_intersection", True):
                         if polygon_source in ("cadastre", "both"):
                             xy = cad_xy
-                            if config.get("debug_depth_log"):
-                                print(f"[SRC] POUM zone intersection disabled for {refcat}; using CADASTRE parcel")
+                            logger.debug("[SRC] POUM zone intersection disabled for %s; using CADASTRE parcel", refcat, extra={"refcat": refcat})
                         else:
                             xy = poum_poly_use
-                            if config.get("debug_depth_log"):
-                                print(f"[SRC] POUM zone intersection disabled for {refcat}; using POUM zone polygon")
+                            logger.debug("[SRC] POUM zone intersection disabled for %s; using POUM zone polygon", refcat, extra={"refcat": refcat})
 
                     else:
                         if a_cad > 0 and (a_poum / a_cad) > threshold:
                             xy = cad_xy
-                            if config.get("debug_depth_log"):
-                                print(f"[SRC] POUM zone too large for {refcat} (area_ratio={a_poum/a_cad:.1f} > {threshold}); using CADASTRE parcel")
+                            logger.debug(
+                                "[SRC] POUM zone too large for %s (area_ratio=%.1f > %s); using CADASTRE parcel",
+                                refcat, a_poum / a_cad, threshold, extra={"refcat": refcat},
+                            )
                         else:
                             from ifc_exporter import polygon_intersection
                             inter = polygon_intersection(cad_xy, poum_poly_use)
                             if inter is not None:
                                 xy = inter
-                                if config.get("debug_depth_log"):
-                                    print(f"[SRC] Using POUM (zone) intersected with CADASTRE for {refcat}")
+                                logger.debug("[SRC] Using POUM (zone) intersected with CADASTRE for %s", refcat, extra={"refcat": refcat})
                             else:
                                 xy = cad_xy
-                                if config.get("debug_depth_log"):
-                                    print(f"[SRC] POUM provided zone for {refcat} but intersection failed; using CADASTRE parcel")
+                                logger.debug("[SRC] POUM provided zone for %s but intersection failed; using CADASTRE parcel", refcat, extra={"refcat": refcat})
                 except Exception as e:
                     # Cadastre fetch failed; if in 'both' mode, fall back to POUM polygon
                     if polygon_source == "both":
                         xy = poum_poly_use
-                        if config.get("debug_depth_log"):
-                            print(f"[SRC] POUM polygon used for {refcat} (cadastre fetch failed: {e})")
+                        logger.warning("[SRC] POUM polygon used for %s (cadastre fetch failed: %s)", refcat, e, extra={"refcat": refcat})
                     else:
                         raise
         else:
             # If strict and not found, check if a non-strict POUM feature exists
             if strict:
-                maybe = get_polygon_by_refcat(poum_gml_path, refcat, strict=False)
-                if maybe is not None and config.get("debug_depth_log"):
-                    print(f"[SRC] POUM has a feature containing {refcat}, but it's a grouped/zone feature; falling back")
+                with timed_stage(timer, "poum_lookup"):
+                    maybe = get_polygon_by_refcat(poum_gml_path, refcat, strict=False)
+                if maybe is not None:
+                    logger.debug("[SRC] POUM has a feature containing %s, but it's a grouped/zone feature; falling back", refcat, extra={"refcat": refcat})
             if polygon_source == "poum":
                 raise RuntimeError(f"Parcel {refcat} not found in POUM.gml (mode={poum_mode}) and polygon_source=poum")
 
     if xy is None and polygon_source in ("cadastre", "both"):
         # Fallback to cadastre WFS
+        used_wfs = True
         try:
-            lonlat = get_parcel_polygon_by_local_id(refcat)
+            with timed_stage(timer, "wfs_fetch"):
+                lonlat = get_parcel_polygon_by_local_id(refcat)
         except Exception as e:
             msg = str(e)
             # WFS maintenance / HTML responses
             if "<html" in msg.lower() or "text/html" in msg.lower():
-                raise RuntimeError("Service unavailable (WFS returned HTML / maintenance).") from e
+                raise WfsUnavailableError("Service unavailable (WFS returned HTML / maintenance).") from e
             raise
 
         # 2) Project to meters
-        xy = _transform_wgs84_to_utm(lonlat)
-        if config.get("debug_depth_log"):
-            print(f"[SRC] Using CADASTRE WFS polygon for {refcat}")
+        with timed_stage(timer, "crs_transform"):
+            xy = _transform_wgs84_to_utm(lonlat)
+        logger.debug("[SRC] Using CADASTRE WFS polygon for %s", refcat, extra={"refcat": refcat})
 
     if not xy:
         raise RuntimeError(f"Parcel {refcat} not found in POUM.gml nor in cadastre WFS")
 
     xy = _ensure_closed(xy)
 
-    # 3) Rules
+    return {
+        "poum_info": poum_info,
+        "zone": zone,
+        "xy": xy,
+        "street_metrics": street_metrics,
+        "street_segments": street_segments,
+        "used_preprocess_geometry": used_preprocess_geometry,
+        "preprocess_source_file": preprocess_source_file,
+        "used_wfs": used_wfs,
+    }
+
+
+def _resolve_envelope_rules(
+    zone: str,
+    poum_info: Optional[PoumInfo],
+    xy: List[Tuple[float, float]],
+    config: Dict[str, Any],
+) -> Dict[str, Any]:
+    """
+    Resolve height, depth and roof slopes for a parcel, recording where each
+    value came from in `rule_sources`.
+    """
     height_m, depth_m, rule_sources = _pick_height_and_depth(zone, poum_info)
 
     # If a default depth is configured, apply it as fallback; if force_depth_m is True,
@@ -517,51 +698,286 @@ def generate_one(
     if depth_m is None:
         depth_m = _bbox_depth(xy)
 
+    real_slope_deg, virtual_slope_deg, roof_sources = _pick_roof_slopes(zone)
+    rule_sources.extend(roof_sources)
+
+    return {
+        "height_m": height_m,
+        "depth_m": depth_m,
+        "real_slope_deg": real_slope_deg,
+        "virtual_slope_deg": virtual_slope_deg,
+        "rule_sources": rule_sources,
+    }
+
+
+def generate_one(
+    refcat: str,
+    poum_gml_path: str,
+    output_dir: str | Path,
+    municipality_slug: str = "malgrat",
+    include_cadaster_ground: bool = True,
+    timer: Optional[StageTimer] = None,
+    write_ifc: bool = True,
+    token: Optional[CancelToken] = None,
+) -> Dict[str, Any]:
+    """
+    Generate a single parcel envelope:
+    WFS/POUM polygon → POUM zone → rules (regulations/POUM/default) → IFC
+
+    The result's "envelope" is the in-memory EnvelopeGeometry of the same
+    envelope. With write_ifc=False no file is written (ifc_path, ifczip_path,
+    viewer_ifc_path and glb_path are None), for callers that only need that
+    description.
+
+    Stage durations are accumulated on `timer` (a fresh one if omitted), returned
+    under "timings" and added to the process-wide stage statistics. Pass a timer
+    to keep partial timings when generation raises.
+
+    `token` (the parcel's CancelToken) is checked before every write and
+    once more before returning; when it fires, the files this call wrote
+    are deleted, so a parcel abandoned by run_with_deadline leaves none.
+    """
+    timer = timer if timer is not None else StageTimer()
+    try:
+        return _generate_one(
+            refcat=refcat,
+            poum_gml_path=poum_gml_path,
+            output_dir=output_dir,
+            municipality_slug=municipality_slug,
+            include_cadaster_ground=include_cadaster_ground,
+            timer=timer,
+            write_ifc=write_ifc,
+            token=token,
+        )
+    finally:
+        record_stage_timings(timer.as_dict())
+
+
+def _generate_one(
+    refcat: str,
+    poum_gml_path: str,
+    output_dir: str | Path,
+    municipality_slug: str,
+    include_cadaster_ground: bool,
+    timer: StageTimer,
+    write_ifc: bool,
+    token: Optional[CancelToken] = None,
+) -> Dict[str, Any]:
+    output_dir = Path(output_dir)
+
+    config = _load_config()
+    parcel = _resolve_parcel_polygon(refcat, poum_gml_path, config, timer)
+    zone = parcel["zone"]
+    xy = parcel["xy"]
+
+    # 3) Rules
+    with timer.stage("rule_resolution"):
+        rules = _resolve_envelope_rules(zone, parcel["poum_info"], xy, config)
+    rule_sources = rules["rule_sources"]
+
+    # Debug logging for depth decisions
+    logger.debug(
+        "[CONFIG] zone=%s, rule_depth=%s, sources=%s",
+        zone, rules["depth_m"], rule_sources, extra={"refcat": refcat},
+    )
+
+    params = _envelope_params(parcel, rules, config, include_cadaster_ground)
+    # One footprint analysis (depth clip, ridge frame) for the description and the export
+    footprint = parcel_footprint(params["footprint_points"], params["street_segments"])
+    envelope = describe_envelope(
+        footprint_points=params["footprint_points"],
+        height=params["height"],
+        depth_m=params["depth_m"],
+        roof_slope_deg_real=params["roof_slope_deg_real"],
+        roof_slope_deg_virtual=params["roof_slope_deg_virtual"],
+        max_roof_rise_m=params["max_roof_rise_m"],
+        ground_height=params["ground_height"],
+        ground_footprint_points=params["ground_footprint_points"],
+        include_cadaster_ground=include_cadaster_ground,
+        street_segments=params["street_segments"],
+        footprint=footprint,
+    )
+    result = {
+        "refcat": refcat,
+        "zone": zone,
+        "ifc_path": None,
+        "ifczip_path": None,
+        "viewer_ifc_path": None,
+        "glb_path": None,
+        "envelope": envelope,
+        "rule_sources": rule_sources,
+        "used_preprocess_geometry": parcel["used_preprocess_geometry"],
+        "preprocess_source_file": parcel["preprocess_source_file"],
+        "skipped": False,
+    }
+    if not write_ifc:
+        result["timings"] = timer.as_dict()
+        return result
+
     # 4) Standard filename
+    output_dir.mkdir(parents=True, exist_ok=True)
     safe_zone = zone.replace("/", "_").replace("\\", "_").replace(" ", "_")
     out_name = f"{municipality_slug}_{refcat}_{safe_zone}_envelope.ifc"
     out_path = output_dir / out_name
+    glb_path = out_path.with_suffix(".glb") if config.get("export_glb", True) else None
 
     # 5) IFC export
-    real_slope_deg, virtual_slope_deg, roof_sources = _pick_roof_slopes(zone)
-    rule_sources.extend(roof_sources)
+    create_ifc_envelope(
+        out_path=str(out_path),
+        timer=timer,
+        writer=config.get("ifc_writer", "ifcopenshell"),
+        use_template=bool(config.get("ifc_skeleton_template", False)),
+        glb_path=str(glb_path) if glb_path else None,
+        guid_seed=_guid_seed(refcat, params, "parcel") if config.get("deterministic_ifc", True) else None,
+        token=token,
+        footprint=footprint,
+        **params,
+    )
+
+    written = {"ifc_path": str(out_path), "glb_path": str(glb_path) if glb_path else None}
+    try:
+        # 6) Normalize (in case exporter writes to a subfolder)
+        with timer.stage("normalize_output"):
+            written["ifc_path"] = _normalize_output_to_root(str(out_path), output_dir)
+
+        # 7) ifcZIP and pre-compressed variants for gzip downloads
+        precompress = bool(config.get("precompress_outputs", True))
+        with timer.stage("compress_output"):
+            outputs = finalize_ifc_output(written["ifc_path"], config.get("ifc_output_format", "ifc"), precompress)
+            written.update(outputs)
+            if glb_path and precompress:
+                ensure_gzip_variant(glb_path)
+            elif glb_path:
+                remove_variants(glb_path)
+
+        if token is not None:
+            token.check()
+    except (ParcelTimeout, JobCancelled):
+        delete_output(written)
+        raise
+
+    result.update(
+        ifc_path=outputs["ifc_path"],
+        ifczip_path=outputs["ifczip_path"],
+        viewer_ifc_path=outputs["viewer_ifc_path"],
+        glb_path=str(glb_path) if glb_path else None,
+        timings=timer.as_dict(),
+    )
+    return result
 
-    # Use configured ground_height if present
-    ground_h = config.get("ground_height", 1.0)
 
-    # Optional debug logging for depth decisions
-    if config.get("debug_depth_log"):
-        print(f"[CONFIG] zone={zone}, rule_depth={depth_m}, sources={rule_sources}")
+def _guid_seed(refcat: str, params: Dict[str, Any], kind: str) -> str:
+    """
+    GlobalId seed of a parcel: hash of the refcat and every envelope input,
+    so unchanged inputs reproduce the same GlobalIds (and bytes). `kind`
+    keeps single-parcel and combined files from sharing GlobalIds.
+    """
+    return _sha256_json({"kind": kind, "refcat": refcat, "version": INPUT_HASH_VERSION, "params": params})
 
-    create_ifc_envelope(
-        ground_footprint_points=xy,  
+
+def _envelope_params(
+    parcel: Dict[str, Any],
+    rules: Dict[str, Any],
+    config: Dict[str, Any],
+    include_cadaster_ground: bool,
+) -> Dict[str, Any]:
+    """Keyword arguments shared by create_ifc_envelope and the combined export."""
+    xy = parcel["xy"]
+    return {
+        "ground_footprint_points": xy,
+        "footprint_points": xy,
+        "height": rules["height_m"],
+        "zone_key": parcel["zone"],
+        "roof_slope_deg_real": rules["real_slope_deg"],
+        "roof_slope_deg_virtual": rules["virtual_slope_deg"],
+        # Use configured ground_height if present
+        "ground_height": config.get("ground_height", 1.0),
+        "depth_m": rules["depth_m"],
+        "max_roof_rise_m": config.get("roof_rise_max_m"),
+        "include_cadaster_ground": include_cadaster_ground,
+        "street_metrics": parcel["street_metrics"],
+        "street_segments": parcel["street_segments"],
+        "representation": config.get("envelope_representation", "faceset"),
+    }
+
+
+def combine_one(
+    refcat: str,
+    poum_gml_path: str,
+    export: CombinedIfcExport,
+    include_cadaster_ground: bool = True,
+    timer: Optional[StageTimer] = None,
+) -> Dict[str, Any]:
+    """
+    Add a parcel envelope to a combined (multi-parcel) IFC export instead of
+    writing its own file. Returns the parcel's zone and combined file path.
+    """
+    timer = timer if timer is not None else StageTimer()
+    try:
+        config = _load_config()
+        parcel = _resolve_parcel_polygon(refcat, poum_gml_path, config, timer)
+        with timer.stage("rule_resolution"):
+            rules = _resolve_envelope_rules(parcel["zone"], parcel["poum_info"], parcel["xy"], config)
+
+        params = _envelope_params(parcel, rules, config, include_cadaster_ground)
+        guid_seed = _guid_seed(refcat, params, "combined") if export.deterministic else None
+        zone_key = params.pop("zone_key")
+        ifc_path = export.add_parcel(refcat=refcat, zone_key=zone_key, timer=timer, guid_seed=guid_seed, **params)
+
+        return {
+            "refcat": refcat,
+            "zone": parcel["zone"],
+            "ifc_path": ifc_path,
+            "rule_sources": rules["rule_sources"],
+            "used_wfs": parcel["used_wfs"],
+            "timings": timer.as_dict(),
+        }
+    finally:
+        record_stage_timings(timer.as_dict())
+
+
+def plan_one(refcat: str, poum_gml_path: str) -> Dict[str, Any]:
+    """
+    Compute the envelope parameters of a parcel without building any IFC:
+    polygon resolution → rules → depth clipping → ridge rise.
+
+    Returns one flat row (JSON/Parquet friendly) with the same numbers
+    `generate_one` would bake into the IFC.
+    """
+    config = _load_config()
+    parcel = _resolve_parcel_polygon(refcat, poum_gml_path, config)
+    xy = parcel["xy"]
+    rules = _resolve_envelope_rules(parcel["zone"], parcel["poum_info"], xy, config)
+
+    plan = compute_envelope_plan(
         footprint_points=xy,
-        height=height_m,
-        zone_key=zone,
-        out_path=str(out_path),
-        roof_slope_deg_real=real_slope_deg,
-        roof_slope_deg_virtual=virtual_slope_deg,
-        ground_height=ground_h,
-        depth_m=depth_m,
+        height=rules["height_m"],
+        depth_m=rules["depth_m"],
+        roof_slope_deg_real=rules["real_slope_deg"],
+        roof_slope_deg_virtual=rules["virtual_slope_deg"],
         max_roof_rise_m=config.get("roof_rise_max_m"),
-        include_cadaster_ground=include_cadaster_ground,
-        street_metrics=street_metrics,
-        street_segments=street_segments,
+        street_segments=parcel["street_segments"],
     )
 
-    # 6) Normalize (in case exporter writes to a subfolder)
-    final_path = _normalize_output_to_root(str(out_path), output_dir)
-
     return {
         "refcat": refcat,
-        "zone": zone,
-        "ifc_path": final_path,
-        "rule_sources": rule_sources,
-        "used_preprocess_geometry": used_preprocess_geometry,
-        "preprocess_source_file": preprocess_source_file,
-        "skipped": False,
+        "zone": parcel["zone"],
+        "height_m": float(rules["height_m"]),
+        "depth_m": float(rules["depth_m"]),
+        "roof_slope_real_deg": rules["real_slope_deg"],
+        "roof_slope_virtual_deg": rules["virtual_slope_deg"],
+        "ridge_rise_m": plan["ridge_rise_m"],
+        "ridge_rise_virtual_m": plan["ridge_rise_virtual_m"],
+        "ridge_height_m": float(rules["height_m"]) + plan["ridge_rise_m"],
+        "parcel_area_m2": plan["parcel_area_m2"],
+        "footprint_area_m2": plan["footprint_area_m2"],
+        "footprint_xy": plan["footprint_xy"],
+        "rule_sources": list(rules["rule_sources"]),
+        "used_preprocess_geometry": parcel["used_preprocess_geometry"],
+        "used_wfs": parcel["used_wfs"],
     }
 
+
 def _pick_roof_slopes(zone: str) -> Tuple[float, float, list[str]]:
     zc = regulations.canonical_zone(zone)
     zr = regulations.ZONE_RULES.get(zc, regulations.DEFAULT_RULE)
@@ -0,0 +1,65 @@
+"""
+Writers for plan-mode output (envelope parameters without IFC).
+
+Responsibilities
+----------------
+- Serialize the rows produced by `pipeline.plan_one` as JSON or Parquet.
+
+Notes
+-----
+- Parquet output requires `pyarrow`; JSON has no extra dependency.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Dict, List
+import json
+
+try:
+    import pyarrow as _pa  # type: ignore
+    import pyarrow.parquet as _pq  # type: ignore
+    _HAS_PYARROW = True
+except Exception:  # pragma: no cover - optional dependency
+    _HAS_PYARROW = False
+
+PLAN_FORMATS = ("json", "parquet")
+
+
+def plan_format_available(fmt: str) -> bool:
+    """True when the optional dependency of `fmt` is installed (pyarrow for Parquet)."""
+    return fmt != "parquet" or _HAS_PYARROW
+
+
+def plan_output_path(output_dir: str | Path, municipality_slug: str, fmt: str) -> Path:
+    """Return the municipality-wide plan file location for a format."""
+    return Path(output_dir) / f"{municipality_slug}_plan.{fmt}"
+
+
+def write_plan_rows(rows: List[Dict[str, Any]], out_path: str | Path, fmt: str = "json") -> str:
+    """
+    Write plan rows to `out_path` and return the path as string.
+
+    Raises ValueError for unknown formats and RuntimeError when Parquet is
+    requested but pyarrow is not installed.
+    """
+    fmt = (fmt or "json").strip().lower()
+    if fmt not in PLAN_FORMATS:
+        raise ValueError(f"format must be one of: {', '.join(PLAN_FORMATS)}")
+
+    p = Path(out_path)
+    p.parent.mkdir(parents=True, exist_ok=True)
+
+    if fmt == "json":
+        p.write_text(json.dumps(rows, indent=2, ensure_ascii=False), encoding="utf-8")
+        return str(p)
+
+    if not _HAS_PYARROW:
+        raise RuntimeError("Parquet output requires pyarrow to be installed.")
+
+    normalized = [
+        {**row, "footprint_xy": [[float(x), float(y)] for x, y in row.get("footprint_xy") or []]}
+        for row in rows
+    ]
+    _pq.write_table(_pa.Table.from_pylist(normalized), str(p))
+    return str(p)
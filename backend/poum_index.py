@@ -6,6 +6,7 @@ Responsibilities
 - Parse POUM.gml and build a {refcat: PoumInfo} lookup table.
 - Extract zone codes and numeric constraints (ALTMAX, PROFEDIF).
 - Provide polygon extraction for a given refcat in the POUM CRS.
+- Provide per-refcat feature digests for change detection between runs.
 
 Notes
 -----
@@ -14,6 +15,7 @@ Notes
 
 from __future__ import annotations
 
+import hashlib
 import xml.etree.ElementTree as ET
 from dataclasses import dataclass
 from typing import Optional, Dict
@@ -95,6 +97,46 @@ def build_refcat_to_poum_index(poum_gml_path: str) -> Dict[str, PoumInfo]:
     return index
 
 
+def build_refcat_to_feature_digest(poum_gml_path: str) -> Dict[str, str]:
+    """
+    Build an index from POUM.gml:
+        ogr:RC (may be comma-separated) -> SHA-256 of every feature listing it
+
+    The digest covers the serialized feature XML (attributes and geometry), so
+    any edit to a parcel's zoning fields or polygon changes its digest. Used to
+    detect changed parcels between batch runs without re-reading geometry.
+    """
+    tree = ET.parse(poum_gml_path)
+    root = tree.getroot()
+
+    ns = {
+        "ogr": "http://ogr.maptools.org/",
+        "gml": "http://www.opengis.net/gml/3.2",
+    }
+
+    parts: Dict[str, list] = {}
+
+    for fm in root.findall("ogr:featureMember", ns):
+        if len(fm) == 0:
+            continue
+
+        feat = fm[0]
+
+        rc_text = feat.findtext("ogr:RC", default=None, namespaces=ns)
+        if not rc_text:
+            continue
+
+        feat_digest = hashlib.sha256(ET.tostring(feat)).hexdigest()
+        for rc in [x.strip() for x in rc_text.split(",")]:
+            if rc:
+                parts.setdefault(rc, []).append(feat_digest)
+
+    return {
+        rc: hashlib.sha256("|".join(digests).encode("utf-8")).hexdigest()
+        for rc, digests in parts.items()
+    }
+
+
 def get_polygon_by_refcat(poum_gml_path: str, refcat: str, strict: bool = False):
     """
     Return first polygon exterior ring coordinates for a given refcat (RC) from
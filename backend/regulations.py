@@ -17,6 +17,9 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from typing import Optional, Dict
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 # -----------------------------
@@ -152,9 +155,9 @@ def get_rule(zone_code: str) -> ZoneRule:
     z = canonical_zone(zone_code)
     rule = ZONE_RULES.get(z)
     if rule is None:
-        print(
-            f"[AVISO] No se encontró normativa para la zona '{zone_code}' "
-            f"(canónica='{z}'). Se utilizará DEFAULT_RULE."
+        logger.warning(
+            "[AVISO] No se encontró normativa para la zona '%s' (canónica='%s'). Se utilizará DEFAULT_RULE.",
+            zone_code, z, extra={"zone": z},
         )
         return DEFAULT_RULE
     return rule
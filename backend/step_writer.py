@@ -0,0 +1,333 @@
+"""
+Direct STEP (ISO 10303-21) writer for envelope IFC files.
+
+Responsibilities
+----------------
+- StepModel: a minimal stand-in for ifcopenshell.file that supports the
+  calls the envelope exporter makes (create_entity, attribute get/set,
+  id(), is_a(), to_string(), write()) and serializes straight to STEP text.
+- Shared STEP text helpers (header, string literals, \\X2\\ escaping) used by
+  this writer and the combined (multi-parcel) export.
+
+Notes
+-----
+- Only the fixed set of IFC4X3 entity types the envelope uses is known
+  (IFC4X3_ATTRIBUTES); anything else raises, so a new exporter entity fails
+  loudly instead of being written wrong. Add it to the table (explicit
+  attributes in schema order, inherited ones first).
+- Entity ids are assigned 1, 2, 3, ... in creation order, exactly like
+  ifcopenshell does for a fresh file, so both backends number the same
+  model identically and the output is byte-stable for a given input.
+- Typed values (IfcReal(...), IfcLabel(...)) take no id and are written
+  inline, as in ifcopenshell.
+- is_a(name) matches the exact type only (no subtype lookup).
+- The header time stamp is the current time unless StepModel.time_stamp is
+  set (e.g. to stable_time_stamp() for byte-reproducible files).
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import math
+import os
+import time
+
+SCHEMA = "IFC4X3"
+
+_ROOT = ("GlobalId", "OwnerHistory", "Name", "Description")
+_OBJECT = _ROOT + ("ObjectType",)
+_PRODUCT = _OBJECT + ("ObjectPlacement", "Representation")
+_SPATIAL = _PRODUCT + ("LongName", "CompositionType")
+
+# Explicit attributes per entity type, in IFC4X3 schema order
+IFC4X3_ATTRIBUTES: Dict[str, Tuple[str, ...]] = {
+    # Project, units, context
+    "IfcProject": _OBJECT + ("LongName", "Phase", "RepresentationContexts", "UnitsInContext"),
+    "IfcSIUnit": ("Dimensions", "UnitType", "Prefix", "Name"),
+    "IfcUnitAssignment": ("Units",),
+    "IfcGeometricRepresentationContext": (
+        "ContextIdentifier", "ContextType", "CoordinateSpaceDimension", "Precision",
+        "WorldCoordinateSystem", "TrueNorth",
+    ),
+    # Spatial structure and relationships
+    "IfcSite": _SPATIAL + ("RefLatitude", "RefLongitude", "RefElevation", "LandTitleNumber", "SiteAddress"),
+    "IfcBuilding": _SPATIAL + ("ElevationOfRefHeight", "ElevationOfTerrain", "BuildingAddress"),
+    "IfcBuildingStorey": _SPATIAL + ("Elevation",),
+    "IfcBuildingElementProxy": _PRODUCT + ("Tag", "PredefinedType"),
+    "IfcRelAggregates": _ROOT + ("RelatingObject", "RelatedObjects"),
+    "IfcRelContainedInSpatialStructure": _ROOT + ("RelatedElements", "RelatingStructure"),
+    "IfcRelDefinesByProperties": _ROOT + ("RelatedObjects", "RelatingPropertyDefinition"),
+    "IfcPropertySet": _ROOT + ("HasProperties",),
+    "IfcPropertySingleValue": ("Name", "Specification", "NominalValue", "Unit"),
+    # Placement
+    "IfcCartesianPoint": ("Coordinates",),
+    "IfcDirection": ("DirectionRatios",),
+    "IfcAxis2Placement3D": ("Location", "Axis", "RefDirection"),
+    "IfcLocalPlacement": ("PlacementRelTo", "RelativePlacement"),
+    # Geometry
+    "IfcPolyline": ("Points",),
+    "IfcArbitraryClosedProfileDef": ("ProfileType", "ProfileName", "OuterCurve"),
+    "IfcExtrudedAreaSolid": ("SweptArea", "Position", "ExtrudedDirection", "Depth"),
+    "IfcPlane": ("Position",),
+    "IfcHalfSpaceSolid": ("BaseSurface", "AgreementFlag"),
+    "IfcBooleanResult": ("Operator", "FirstOperand", "SecondOperand"),
+    "IfcBooleanClippingResult": ("Operator", "FirstOperand", "SecondOperand"),
+    "IfcPolyLoop": ("Polygon",),
+    "IfcFaceOuterBound": ("Bound", "Orientation"),
+    "IfcFace": ("Bounds",),
+    "IfcConnectedFaceSet": ("CfsFaces",),
+    "IfcFacetedBrep": ("Outer",),
+    "IfcCartesianPointList3D": ("CoordList", "TagList"),
+    "IfcIndexedPolygonalFace": ("CoordIndex",),
+    "IfcPolygonalFaceSet": ("Coordinates", "Closed", "Faces", "PnIndex"),
+    # Representation and presentation
+    "IfcShapeRepresentation": ("ContextOfItems", "RepresentationIdentifier", "RepresentationType", "Items"),
+    "IfcProductDefinitionShape": ("Name", "Description", "Representations"),
+    "IfcPresentationLayerAssignment": ("Name", "Description", "AssignedItems", "Identifier"),
+    "IfcColourRgb": ("Name", "Red", "Green", "Blue"),
+    "IfcSurfaceStyleRendering": (
+        "SurfaceColour", "Transparency", "DiffuseColour", "TransmissionColour",
+        "DiffuseTransmissionColour", "ReflectionColour", "SpecularColour",
+        "SpecularHighlight", "ReflectanceMethod",
+    ),
+    "IfcSurfaceStyle": ("Name", "Side", "Styles"),
+    "IfcStyledItem": ("Item", "Styles", "Name"),
+}
+
+# Enumeration-valued attributes (written as .VALUE.)
+_ENUM_ATTRIBUTES: Dict[str, frozenset] = {
+    "IfcSIUnit": frozenset({"UnitType", "Prefix", "Name"}),
+    "IfcSite": frozenset({"CompositionType"}),
+    "IfcBuilding": frozenset({"CompositionType"}),
+    "IfcBuildingStorey": frozenset({"CompositionType"}),
+    "IfcBuildingElementProxy": frozenset({"PredefinedType"}),
+    "IfcArbitraryClosedProfileDef": frozenset({"ProfileType"}),
+    "IfcBooleanResult": frozenset({"Operator"}),
+    "IfcBooleanClippingResult": frozenset({"Operator"}),
+    "IfcSurfaceStyleRendering": frozenset({"ReflectanceMethod"}),
+    "IfcSurfaceStyle": frozenset({"Side"}),
+}
+
+# Attributes redeclared as DERIVE in a subtype (always written as *)
+_DERIVED_ATTRIBUTES: Dict[str, frozenset] = {
+    "IfcSIUnit": frozenset({"Dimensions"}),
+}
+
+# Defined types accepted by create_entity(type, value)
+TYPED_VALUES = frozenset({"IfcReal", "IfcLabel", "IfcText", "IfcIdentifier", "IfcInteger", "IfcBoolean"})
+
+_CANONICAL = {name.upper(): name for name in (*IFC4X3_ATTRIBUTES, *TYPED_VALUES)}
+_INDEX: Dict[str, Dict[str, int]] = {
+    t: {a: i for i, a in enumerate(attrs)} for t, attrs in IFC4X3_ATTRIBUTES.items()
+}
+
+
+# =============================================================================
+# STEP text helpers
+# =============================================================================
+
+def step_string(value: str) -> str:
+    """STEP string literal ('' escapes a quote; non-ASCII as \\X2\\ runs)."""
+    return step_ascii("'" + str(value).replace("'", "''") + "'")
+
+
+def step_ascii(literal: str) -> str:
+    """Encode non-ASCII characters of a string literal as \\X2\\...\\X0\\ runs."""
+    if literal.isascii():
+        return literal
+    out, run = [], []
+    for ch in literal:
+        if ord(ch) < 128:
+            if run:
+                out.append("\\X2\\" + "".join(run) + "\\X0\\")
+                run = []
+            out.append(ch)
+        else:
+            run.extend(f"{b:04X}" for b in _utf16_units(ch))
+    if run:
+        out.append("\\X2\\" + "".join(run) + "\\X0\\")
+    return "".join(out)
+
+
+def _utf16_units(ch: str) -> List[int]:
+    data = ch.encode("utf-16-be")
+    return [int.from_bytes(data[i:i + 2], "big") for i in range(0, len(data), 2)]
+
+
+def step_real(value: float) -> str:
+    """Shortest round-tripping REAL literal (`10.`, `0.25`, `1.E-05`)."""
+    v = float(value)
+    if not math.isfinite(v):
+        raise ValueError(f"STEP REAL must be finite, got {v!r}")
+    text = repr(v).upper()
+    mantissa, e, exponent = text.partition("E")
+    if mantissa.endswith(".0"):
+        mantissa = mantissa[:-1]
+    elif "." not in mantissa:
+        mantissa += "."
+    return mantissa + e + exponent
+
+
+def stable_time_stamp() -> str:
+    """
+    Header time stamp for reproducible output: SOURCE_DATE_EPOCH (UTC) when
+    set in the environment, otherwise the Unix epoch.
+    """
+    try:
+        epoch = int(os.environ.get("SOURCE_DATE_EPOCH", "0"))
+    except ValueError:
+        epoch = 0
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(epoch))
+
+
+def step_header(file_name: str, schema: str = SCHEMA, time_stamp: Optional[str] = None) -> str:
+    """HEADER section plus the opening of the DATA section."""
+    stamp = time_stamp or time.strftime("%Y-%m-%dT%H:%M:%S")
+    return (
+        "ISO-10303-21;\n"
+        "HEADER;\n"
+        "FILE_DESCRIPTION(('ViewDefinition [ReferenceView]'),'2;1');\n"
+        f"FILE_NAME({step_string(file_name)},'{stamp}',(''),(''),'IfcOpenShell','parcel_project','');\n"
+        f"FILE_SCHEMA(({step_string(schema)}));\n"
+        "ENDSEC;\n"
+        "DATA;\n"
+    )
+
+
+STEP_TRAILER = "ENDSEC;\nEND-ISO-10303-21;\n"
+
+
+# =============================================================================
+# Model
+# =============================================================================
+
+class StepEntity:
+    """One entity (or inline typed value) of a StepModel."""
+
+    __slots__ = ("_type", "_id", "_values")
+
+    def __init__(self, type_name: str, eid: int, values: List[Any]) -> None:
+        object.__setattr__(self, "_type", type_name)
+        object.__setattr__(self, "_id", eid)
+        object.__setattr__(self, "_values", values)
+
+    def id(self) -> int:
+        return self._id
+
+    def is_a(self, type_name: Optional[str] = None):
+        if type_name is None:
+            return self._type
+        return self._type.upper() == type_name.upper()
+
+    @property
+    def wrappedValue(self) -> Any:
+        return self._values[0]
+
+    def __getattr__(self, name: str) -> Any:
+        idx = _INDEX.get(self._type, {}).get(name)
+        if idx is None:
+            raise AttributeError(f"{self._type} has no attribute {name!r}")
+        return self._values[idx]
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        idx = _INDEX.get(self._type, {}).get(name)
+        if idx is None:
+            raise AttributeError(f"{self._type} has no attribute {name!r}")
+        self._values[idx] = value
+
+    def __repr__(self) -> str:
+        return f"#{self._id}={self._type}(...)" if self._id else f"{self._type}({self._values[0]!r})"
+
+    def to_string(self) -> str:
+        """This entity's DATA section line (`#id=IFCTYPE(...);`)."""
+        if not self._id:
+            return _format(self, False)
+        enums = _ENUM_ATTRIBUTES.get(self._type, ())
+        derived = _DERIVED_ATTRIBUTES.get(self._type, ())
+        attrs = IFC4X3_ATTRIBUTES[self._type]
+        args = ",".join(
+            "*" if a in derived else _format(v, a in enums)
+            for a, v in zip(attrs, self._values)
+        )
+        return f"#{self._id}={self._type.upper()}({args});"
+
+
+def _format(value: Any, enum: bool) -> str:
+    if value is None:
+        return "$"
+    if isinstance(value, StepEntity):
+        if value._id:
+            return f"#{value._id}"
+        inner = value._values[0]
+        return f"{value._type.upper()}({_format(inner, False)})"
+    if isinstance(value, bool):
+        return ".T." if value else ".F."
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, float):
+        return step_real(value)
+    if isinstance(value, str):
+        return f".{value.upper()}." if enum else step_string(value)
+    if isinstance(value, (list, tuple)):
+        return "(" + ",".join(_format(v, enum) for v in value) + ")"
+    raise TypeError(f"Cannot write {type(value).__name__} to STEP")
+
+
+class StepModel:
+    """
+    Envelope IFC model that serializes directly to STEP text.
+
+    Mirrors the subset of the ifcopenshell.file API the exporter uses, so
+    the same builder functions run against either backend.
+    """
+
+    schema = SCHEMA
+
+    def __init__(self, schema: str = SCHEMA) -> None:
+        if schema != SCHEMA:
+            raise ValueError(f"StepModel only writes {SCHEMA}")
+        self._entities: List[StepEntity] = []
+        self.time_stamp: Optional[str] = None
+
+    def create_entity(self, type_name: str, *args: Any, **kwargs: Any) -> StepEntity:
+        canonical = _CANONICAL.get(type_name.upper())
+        if canonical is None:
+            raise ValueError(f"StepModel does not know entity type {type_name}")
+        if canonical in TYPED_VALUES:
+            if len(args) != 1 or kwargs:
+                raise ValueError(f"{canonical} takes exactly one value")
+            return StepEntity(canonical, 0, [args[0]])
+
+        attrs = IFC4X3_ATTRIBUTES[canonical]
+        if len(args) > len(attrs):
+            raise ValueError(f"{canonical} takes at most {len(attrs)} attributes")
+        values: List[Any] = list(args) + [None] * (len(attrs) - len(args))
+        index = _INDEX[canonical]
+        for name, value in kwargs.items():
+            idx = index.get(name)
+            if idx is None:
+                raise AttributeError(f"{canonical} has no attribute {name!r}")
+            values[idx] = value
+        entity = StepEntity(canonical, len(self._entities) + 1, values)
+        self._entities.append(entity)
+        return entity
+
+    def by_id(self, eid: int) -> StepEntity:
+        return self._entities[eid - 1]
+
+    def by_type(self, type_name: str) -> List[StepEntity]:
+        return [e for e in self._entities if e.is_a(type_name)]
+
+    def __len__(self) -> int:
+        return len(self._entities)
+
+    def to_string(self, file_name: str = "") -> str:
+        lines = [step_header(file_name, time_stamp=self.time_stamp)]
+        lines.extend(e.to_string() + "\n" for e in self._entities)
+        lines.append(STEP_TRAILER)
+        return "".join(lines)
+
+    def write(self, path: str | Path) -> None:
+        path = Path(path)
+        path.write_text(self.to_string(path.name), encoding="ascii", newline="\n")
@@ -0,0 +1,50 @@
+"""
+Shared pytest setup: backend modules are flat (imported by name from
+backend/), so the backend directory goes on sys.path.
+
+Run from backend/:
+    python -m pytest -q tests
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture
+def job_store(tmp_path, monkeypatch):
+    """A fresh JobStore behind jobs.get_store(), with an empty hot cache."""
+    import jobs
+    from job_store import JobStore
+
+    store = JobStore(tmp_path / "jobs.sqlite3")
+    monkeypatch.setattr(jobs, "_STORE", store)
+    monkeypatch.setattr(jobs, "JOBS", {})
+    monkeypatch.setattr(jobs, "_LAST_PERSIST", {})
+    yield store
+    store.close()
+
+
+@pytest.fixture(scope="session")
+def main_module(tmp_path_factory):
+    """
+    The FastAPI app module. main opens the job store at import time, so the
+    first import gets a store in a temp directory instead of outputs/.
+    """
+    pytest.importorskip("fastapi")
+    if "main" not in sys.modules:
+        import jobs
+        from job_store import JobStore
+
+        jobs._STORE = JobStore(tmp_path_factory.mktemp("main") / "jobs.sqlite3")
+    import main
+
+    return main
@@ -0,0 +1,140 @@
+"""Parcel deadlines, cancellation and cleanup of abandoned parcels."""
+
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+
+import cancellation
+from cancellation import CancelToken, JobCancelled, ParcelTimeout, run_with_deadline, sleep_unless_cancelled
+
+
+@pytest.fixture(autouse=True)
+def _fast_poll(monkeypatch):
+    monkeypatch.setattr(cancellation, "_POLL_S", 0.01)
+
+
+def test_without_deadline_runs_inline():
+    token = CancelToken(lambda: False, None)
+    assert run_with_deadline(lambda: threading.current_thread().name, token) == threading.current_thread().name
+
+
+def test_without_deadline_still_honours_cancel():
+    token = CancelToken(lambda: True, None)
+    with pytest.raises(JobCancelled):
+        run_with_deadline(lambda: "never", token)
+
+
+def test_result_and_errors_come_back_from_the_helper_thread():
+    assert run_with_deadline(lambda: 42, CancelToken(lambda: False, 5.0)) == 42
+
+    def boom():
+        raise ValueError("bad geometry")
+
+    with pytest.raises(ValueError, match="bad geometry"):
+        run_with_deadline(boom, CancelToken(lambda: False, 5.0))
+
+
+def test_timeout_marks_token_expired_and_stops_at_next_check():
+    token = CancelToken(lambda: False, 0.05)
+    release = threading.Event()
+    stopped = []
+
+    def slow():
+        release.wait(5.0)
+        try:
+            token.check("ifc_write")
+        except ParcelTimeout:
+            stopped.append(True)
+            raise
+        return "late"
+
+    with pytest.raises(ParcelTimeout):
+        run_with_deadline(slow, token)
+    assert token.expired
+    release.set()
+    for _ in range(200):
+        if stopped:
+            break
+        time.sleep(0.01)
+    assert stopped == [True]
+
+
+def test_cancel_releases_the_worker():
+    cancelled = threading.Event()
+    token = CancelToken(cancelled.is_set, 5.0)
+    release = threading.Event()
+    threading.Timer(0.05, cancelled.set).start()
+    try:
+        with pytest.raises(JobCancelled):
+            run_with_deadline(lambda: release.wait(5.0), token)
+        assert token.expired
+    finally:
+        release.set()
+
+
+def test_late_result_is_discarded():
+    token = CancelToken(lambda: False, 0.05)
+    release = threading.Event()
+    discarded = threading.Event()
+    seen = []
+
+    def late():
+        release.wait(5.0)
+        return {"ifc_path": "x.ifc"}
+
+    def discard(result):
+        seen.append(result)
+        discarded.set()
+
+    with pytest.raises(ParcelTimeout):
+        run_with_deadline(late, token, discard=discard)
+    release.set()
+    assert discarded.wait(5.0)
+    assert seen == [{"ifc_path": "x.ifc"}]
+
+
+def test_result_in_time_is_not_discarded():
+    seen = []
+    assert run_with_deadline(lambda: "ok", CancelToken(lambda: False, 5.0), discard=seen.append) == "ok"
+    assert seen == []
+
+
+def test_sleep_unless_cancelled():
+    assert sleep_unless_cancelled(0.02, lambda: False) is False
+    assert sleep_unless_cancelled(5.0, lambda: True) is True
+
+
+def test_envelope_writer_removes_outputs_when_the_token_fires(tmp_path, monkeypatch):
+    pytest.importorskip("ifcopenshell")
+    import ifc_exporter
+
+    square = [(0.0, 0.0), (10.0, 0.0), (10.0, 10.0), (0.0, 10.0)]
+    out_path = tmp_path / "parcel.ifc"
+    glb_path = tmp_path / "parcel.glb"
+    token = CancelToken(lambda: False, 60.0)
+
+    real_glb = ifc_exporter.write_envelope_glb
+
+    def glb_past_deadline(model, path):
+        real_glb(model, path)
+        token.deadline = time.monotonic() - 1.0
+
+    monkeypatch.setattr(ifc_exporter, "write_envelope_glb", glb_past_deadline)
+    with pytest.raises(ParcelTimeout):
+        ifc_exporter.create_ifc_envelope(
+            footprint_points=square, height=6.0, zone_key="Z1", out_path=str(out_path),
+            glb_path=str(glb_path), token=token,
+        )
+    assert not out_path.exists()
+    assert not glb_path.exists()
+
+    # An expired token stops before anything is written, leaving older files alone
+    out_path.write_text("previous run")
+    with pytest.raises(ParcelTimeout):
+        ifc_exporter.create_ifc_envelope(
+            footprint_points=square, height=6.0, zone_key="Z1", out_path=str(out_path), token=token,
+        )
+    assert out_path.read_text() == "previous run"
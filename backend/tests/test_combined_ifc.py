@@ -0,0 +1,120 @@
+"""Combined (multi-parcel) IFC export: grouping, streaming and rollback."""
+
+from __future__ import annotations
+
+import pytest
+
+ifcopenshell = pytest.importorskip("ifcopenshell")
+
+import ifc_exporter  # noqa: E402
+from ifc_exporter import CombinedIfcExport, CombinedIfcWriter, combined_group_key  # noqa: E402
+
+
+def _square(x0, size=12.0):
+    y0 = 4581000.0
+    return [(x0, y0), (x0 + size, y0), (x0 + size, y0 + size), (x0, y0 + size)]
+
+
+def _envelope(i):
+    return {"footprint_points": _square(431000.0 + 20.0 * i), "height": 9.0, "roof_slope_deg_real": 30.0}
+
+
+def _sites(path):
+    return sorted(s.Name for s in ifcopenshell.open(str(path)).by_type("IfcSite"))
+
+
+@pytest.mark.parametrize(
+    "group_by, refcat, expected",
+    [
+        ("municipality", "0123456DG7102S0001AB", "all"),
+        ("zone", "0123456DG7102S0001AB", "13b/Z1"),
+        ("block", "0123456DG7102S0001AB", "01234DG7102S"),
+        ("block", "0123456DG7102S", "01234DG7102S"),
+        ("block", " 01234 ", "01234"),
+    ],
+)
+def test_combined_group_key(group_by, refcat, expected):
+    assert combined_group_key(group_by, refcat, "13b/Z1") == expected
+
+
+def test_path_for_names_group_files(tmp_path):
+    assert CombinedIfcExport(tmp_path, "malgrat").path_for("all") == tmp_path / "malgrat_combined.ifc"
+    by_zone = CombinedIfcExport(tmp_path, "malgrat", group_by="zone")
+    assert by_zone.path_for("13b/Z1") == tmp_path / "malgrat_zone_13b_Z1_combined.ifc"
+    assert by_zone.path_for("Zona ñ") == tmp_path / "malgrat_zone_Zona___combined.ifc"
+    with pytest.raises(ValueError):
+        CombinedIfcExport(tmp_path, "malgrat", group_by="street")
+
+
+def test_close_writes_one_site_per_parcel(tmp_path):
+    export = CombinedIfcExport(tmp_path, "malgrat", group_by="zone")
+    paths = [
+        export.add_parcel("P1", "Z1", **_envelope(0)),
+        export.add_parcel("P2", "Z2", **_envelope(1)),
+        export.add_parcel("P3", "Z1", **_envelope(2)),
+    ]
+    assert not any(tmp_path.glob("*.ifc"))
+    closed = export.close()
+
+    assert sorted(closed) == sorted(set(paths))
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["malgrat_zone_Z1_combined.ifc", "malgrat_zone_Z2_combined.ifc"]
+    # The municipality-level site plus one IfcSite per parcel
+    assert _sites(tmp_path / "malgrat_zone_Z1_combined.ifc") == ["P1", "P3", "malgrat zone Z1"]
+    assert _sites(tmp_path / "malgrat_zone_Z2_combined.ifc") == ["P2", "malgrat zone Z2"]
+    # Only entity instances in the DATA section (typed values are inline)
+    text = (tmp_path / "malgrat_zone_Z1_combined.ifc").read_text()
+    data = text.split("DATA;\n", 1)[1].split("ENDSEC;", 1)[0]
+    assert all(line.startswith("#") for line in data.splitlines())
+    model = ifcopenshell.open(str(tmp_path / "malgrat_zone_Z1_combined.ifc"))
+    assert len(model.by_type("IfcProject")) == 1
+    assert len(model.by_type("IfcBuilding")) == 2
+
+
+def test_failed_parcel_is_rolled_back(tmp_path, monkeypatch):
+    writer = CombinedIfcWriter(tmp_path / "c.ifc", name="malgrat")
+    writer.add_parcel("P1", zone_key="Z1", **_envelope(0))
+    count = len(list(writer.model))
+    part = tmp_path / "c.ifc.part"
+    size = part.stat().st_size
+
+    add_elements = ifc_exporter._add_envelope_elements
+
+    def failing(*args, **kwargs):
+        # Fail only after the parcel's entities have been created
+        add_elements(*args, **kwargs)
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(ifc_exporter, "_add_envelope_elements", failing)
+    with pytest.raises(RuntimeError, match="boom"):
+        writer.add_parcel("P2", zone_key="Z1", **_envelope(1))
+    monkeypatch.undo()
+
+    assert len(list(writer.model)) == count
+    assert part.stat().st_size == size
+    assert writer.parcel_count == 1
+
+    writer.add_parcel("P3", zone_key="Z1", **_envelope(2))
+    writer.close()
+    assert _sites(tmp_path / "c.ifc") == ["P1", "P3", "malgrat"]
+
+
+def test_abort_removes_the_part_file(tmp_path):
+    export = CombinedIfcExport(tmp_path, "malgrat", group_by="block")
+    export.add_parcel("0123456DG7102S0001AB", "Z1", **_envelope(0))
+    export.add_parcel("7654321DG7102S0001AB", "Z1", **_envelope(1))
+    assert len(list(tmp_path.glob("*.part"))) == 2
+
+    export.abort()
+    assert list(tmp_path.iterdir()) == []
+    with pytest.raises(RuntimeError):
+        export.add_parcel("0123456DG7102S0002CD", "Z1", **_envelope(2))
+
+
+def test_deterministic_files_are_byte_stable(tmp_path):
+    outputs = []
+    for run in ("a", "b"):
+        export = CombinedIfcExport(tmp_path / run, "malgrat", deterministic=True)
+        for i, refcat in enumerate(("P1", "P2")):
+            export.add_parcel(refcat, "Z1", guid_seed=f"parcel|{refcat}", **_envelope(i))
+        outputs.append(open(export.close()[0], "rb").read())
+    assert outputs[0] == outputs[1]
@@ -0,0 +1,99 @@
+"""ifcZIP archives, .gz variants and the configured IFC output format."""
+
+from __future__ import annotations
+
+import gzip
+import os
+import zipfile
+
+import pytest
+
+from compression import (
+    ensure_gzip_variant,
+    finalize_ifc_output,
+    fresh_gzip_variant,
+    gzip_variant,
+    remove_variants,
+    write_ifczip,
+)
+from manifest import delete_output
+
+STEP = b"ISO-10303-21;\nHEADER;\nENDSEC;\nDATA;\n" + b"#1=IFCPROJECT('x',$,'P',$,$,$,$,$,$);\n" * 200 + b"ENDSEC;\nEND-ISO-10303-21;\n"
+
+
+def _ifc(tmp_path, name="parcel_envelope.ifc", data=STEP):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return path
+
+
+def test_ifczip_round_trip_and_determinism(tmp_path):
+    src = _ifc(tmp_path)
+    first = write_ifczip(src)
+    assert first == src.with_suffix(".ifczip")
+    with zipfile.ZipFile(first) as zf:
+        assert zf.namelist() == [src.name]
+        assert zf.read(src.name) == STEP
+    data = first.read_bytes()
+    os.utime(src, (1, 1))
+    assert write_ifczip(src, tmp_path / "again.ifczip").read_bytes() == data
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_gzip_variant_freshness(tmp_path):
+    src = _ifc(tmp_path)
+    assert fresh_gzip_variant(src) is None
+    gz = ensure_gzip_variant(src)
+    assert gz == gzip_variant(src) and fresh_gzip_variant(src) == gz
+    assert gzip.decompress(gz.read_bytes()) == STEP
+
+    # A regenerated source makes the variant stale until it is rewritten
+    src.write_bytes(STEP + b"\n")
+    stamp = gz.stat().st_mtime_ns + 1_000_000_000
+    os.utime(src, ns=(stamp, stamp))
+    assert fresh_gzip_variant(src) is None
+    ensure_gzip_variant(src)
+    assert gzip.decompress(gz.read_bytes()) == STEP + b"\n"
+
+    remove_variants(src)
+    assert not gz.exists() and src.exists()
+
+
+def test_finalize_ifc_output_plain(tmp_path):
+    src = _ifc(tmp_path)
+    out = finalize_ifc_output(src, "ifc", precompress=False)
+    assert out == {"ifc_path": str(src), "ifczip_path": None, "viewer_ifc_path": str(src)}
+    assert not gzip_variant(src).exists()
+    finalize_ifc_output(src, "ifc")
+    assert fresh_gzip_variant(src) is not None
+    # Switching precompress_outputs off drops the variant of a regenerated file
+    finalize_ifc_output(src, "ifc", precompress=False)
+    assert not gzip_variant(src).exists()
+
+
+def test_finalize_ifc_output_both(tmp_path):
+    src = _ifc(tmp_path)
+    out = finalize_ifc_output(src, "both")
+    assert out["ifc_path"] == out["viewer_ifc_path"] == str(src)
+    assert out["ifczip_path"] == str(src.with_suffix(".ifczip"))
+    assert src.exists() and fresh_gzip_variant(src) is not None
+
+
+@pytest.mark.parametrize("precompress", [True, False])
+def test_finalize_ifczip_keeps_a_viewer_copy(tmp_path, precompress):
+    src = _ifc(tmp_path)
+    out = finalize_ifc_output(src, "ifczip", precompress)
+    zip_path = str(src.with_suffix(".ifczip"))
+    assert out == {"ifc_path": zip_path, "ifczip_path": zip_path, "viewer_ifc_path": str(src)}
+    assert not src.exists()
+    # The plain IFC survives as its .gz variant for the web-ifc viewer
+    assert gzip.decompress(gzip_variant(src).read_bytes()) == STEP
+
+    # Deleting the manifest entry removes the viewer copy too
+    delete_output(out)
+    assert sorted(p.name for p in tmp_path.iterdir()) == []
+
+
+def test_finalize_ifc_output_rejects_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        finalize_ifc_output(_ifc(tmp_path), "ifcxml")
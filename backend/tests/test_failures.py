@@ -0,0 +1,127 @@
+"""Failure classification (transient vs deterministic) and retry backoff."""
+
+from __future__ import annotations
+
+import socket
+
+import pytest
+
+requests = pytest.importorskip("requests")
+
+import cadastre_client  # noqa: E402
+from cadastre_client import WfsUnavailableError  # noqa: E402
+from failures import DETERMINISTIC, TRANSIENT, classify_failure, retry_delay  # noqa: E402
+
+
+class _Response:
+    def __init__(self, status_code=200, content_type="text/xml", text=""):
+        self.status_code = status_code
+        self.headers = {"Content-Type": content_type}
+        self.text = text
+        self.content = text.encode("utf-8")
+        self.url = "https://wfs.example/cp"
+
+
+def _wfs_error(monkeypatch, response=None, raises=None):
+    """The exception get_parcel_polygon_by_local_id raises for a canned WFS answer."""
+    def fake_get(*args, **kwargs):
+        if raises is not None:
+            raise raises
+        return response
+
+    monkeypatch.setattr(cadastre_client.requests, "get", fake_get)
+    with pytest.raises(Exception) as info:
+        cadastre_client.get_parcel_polygon_by_local_id("000302300DG70H")
+    return info.value
+
+
+@pytest.mark.parametrize(
+    "response",
+    [
+        _Response(503, "text/plain", "Service Unavailable"),
+        _Response(429, "text/plain", "Too Many Requests"),
+        _Response(200, "text/html; charset=utf-8", "<html><body>Mantenimiento</body></html>"),
+        _Response(200, "text/xml", "<wfs:FeatureCollection"),
+    ],
+    ids=["5xx", "429", "html-maintenance", "broken-xml"],
+)
+def test_wfs_outages_are_transient(monkeypatch, response):
+    error = _wfs_error(monkeypatch, response)
+    assert isinstance(error, WfsUnavailableError)
+    assert classify_failure(error) == TRANSIENT
+
+
+@pytest.mark.parametrize("exc", [requests.Timeout("read timed out"), requests.ConnectionError("reset")])
+def test_network_errors_are_transient(monkeypatch, exc):
+    assert classify_failure(_wfs_error(monkeypatch, raises=exc)) == TRANSIENT
+
+
+@pytest.mark.parametrize(
+    "response",
+    [
+        _Response(404, "text/plain", "Not Found"),
+        _Response(
+            200,
+            "text/xml",
+            '<ows:ExceptionReport xmlns:ows="http://www.opengis.net/ows/1.1">'
+            "<ows:Exception><ows:ExceptionText>refcat desconocida</ows:ExceptionText></ows:Exception>"
+            "</ows:ExceptionReport>",
+        ),
+        _Response(200, "text/xml", '<wfs:FeatureCollection xmlns:wfs="http://www.opengis.net/wfs/2.0"/>'),
+    ],
+    ids=["404", "exception-report", "no-parcel"],
+)
+def test_wfs_answers_about_the_parcel_are_deterministic(monkeypatch, response):
+    assert classify_failure(_wfs_error(monkeypatch, response)) == DETERMINISTIC
+
+
+@pytest.mark.parametrize(
+    "exc",
+    [
+        ValueError("Polygon has fewer than 3 vertices"),
+        KeyError("zone"),
+        ZeroDivisionError("float division by zero"),
+        RuntimeError("IfcOpenShell could not write"),
+    ],
+)
+def test_geometry_and_rule_errors_are_deterministic(exc):
+    assert classify_failure(exc) == DETERMINISTIC
+
+
+def test_builtin_timeouts_are_transient():
+    assert classify_failure(TimeoutError()) == TRANSIENT
+    assert classify_failure(socket.timeout()) == TRANSIENT
+    assert classify_failure(ConnectionResetError()) == TRANSIENT
+
+
+def test_wrapped_errors_keep_their_cause_classification():
+    try:
+        try:
+            raise WfsUnavailableError("maintenance")
+        except WfsUnavailableError as e:
+            raise RuntimeError("parcel polygon unavailable") from e
+    except RuntimeError as wrapped:
+        assert classify_failure(wrapped) == TRANSIENT
+
+    try:
+        try:
+            raise ValueError("self-intersecting footprint")
+        except ValueError as e:
+            raise RuntimeError("export failed") from e
+    except RuntimeError as wrapped:
+        assert classify_failure(wrapped) == DETERMINISTIC
+
+
+def test_cyclic_cause_chain_terminates():
+    a, b = RuntimeError("a"), RuntimeError("b")
+    a.__cause__, b.__cause__ = b, a
+    assert classify_failure(a) == DETERMINISTIC
+
+
+def test_retry_delay_doubles_and_is_capped():
+    assert [retry_delay(n, 30.0, 300.0) for n in range(1, 7)] == [30.0, 60.0, 120.0, 240.0, 300.0, 300.0]
+    # Out-of-range attempts never go below the base delay or above the cap
+    assert retry_delay(0, 30.0, 300.0) == 30.0
+    assert retry_delay(-3, 30.0, 300.0) == 30.0
+    assert retry_delay(60, 30.0, 300.0) == 300.0
+    assert retry_delay(1, 0.0, 300.0) == 0.0
@@ -0,0 +1,261 @@
+"""
+FootprintAnalysis against the per-call helpers it replaced.
+
+The _old_* functions are the former ifc_exporter implementations
+(clip_polygon_by_depth, _pick_ridge_dir, _compute_rise_max, the ridge
+frame and rise of _envelope_ridge_mesh, _ring_area, _support_point),
+copied here unchanged so the cached analysis is checked for exact
+equality. The one exception is rise_max: the former plan helper skipped
+the re-normalisation of the ridge direction that the mesh (and now the
+analysis) applies, so at UTM-sized coordinates it agrees to ~1e-9 m only.
+"""
+
+from __future__ import annotations
+
+import math
+import random
+from typing import List, Optional, Tuple
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from footprint import FootprintAnalysis, ridge_dir_from_street_segments  # noqa: E402
+
+Point2 = Tuple[float, float]
+
+
+def _unit(vx, vy):
+    L = math.hypot(vx, vy)
+    if L < 1e-9:
+        return (1.0, 0.0)
+    return (vx / L, vy / L)
+
+
+def _ensure_ring_open(points):
+    if len(points) >= 2 and points[0] == points[-1]:
+        return points[:-1]
+    return points
+
+
+def _old_pick_ridge_dir_longest_edge(pts):
+    pts = _ensure_ring_open(pts)
+    best_len = -1.0
+    best = (1.0, 0.0)
+    n = len(pts)
+    for i in range(n):
+        x1, y1 = pts[i]
+        x2, y2 = pts[(i + 1) % n]
+        vx, vy = (x2 - x1), (y2 - y1)
+        L = math.hypot(vx, vy)
+        if L > best_len:
+            best_len = L
+            best = _unit(vx, vy)
+    return best
+
+
+def _old_pick_ridge_dir(pts, street_segments=None):
+    # The street vote moved to footprint.py verbatim
+    street_dir = ridge_dir_from_street_segments(street_segments)
+    if street_dir is not None:
+        return street_dir
+    return _old_pick_ridge_dir_longest_edge(pts)
+
+
+def _old_clip_polygon_by_depth(points2, depth_m):
+    pts = _ensure_ring_open(points2)
+    if len(pts) < 3:
+        return pts
+    cx = sum(p[0] for p in pts) / len(pts)
+    cy = sum(p[1] for p in pts) / len(pts)
+    best_len = -1.0
+    best_idx = 0
+    npts = len(pts)
+    for i in range(npts):
+        x1, y1 = pts[i]
+        x2, y2 = pts[(i + 1) % npts]
+        L = math.hypot(x2 - x1, y2 - y1)
+        if L > best_len:
+            best_len = L
+            best_idx = i
+    A = pts[best_idx]
+    B = pts[(best_idx + 1) % npts]
+    ex, ey = (B[0] - A[0], B[1] - A[1])
+    n0x, n0y = (-ey, ex)
+    if (n0x * (cx - A[0]) + n0y * (cy - A[1])) < 0:
+        n0x, n0y = -n0x, -n0y
+    nx, ny = _unit(n0x, n0y)
+
+    def v(p):
+        return (nx * (p[0] - A[0]) + ny * (p[1] - A[1]) - float(depth_m))
+
+    eps = 1e-9
+    out = []
+    for i in range(npts):
+        s = pts[i]
+        e = pts[(i + 1) % npts]
+        vs = v(s)
+        ve = v(e)
+        s_in = vs <= eps
+        e_in = ve <= eps
+        if s_in and e_in:
+            out.append(e)
+        elif s_in and not e_in:
+            if abs(vs - ve) > 1e-12:
+                t = vs / (vs - ve)
+                out.append((s[0] + t * (e[0] - s[0]), s[1] + t * (e[1] - s[1])))
+        elif (not s_in) and e_in:
+            if abs(vs - ve) > 1e-12:
+                t = vs / (vs - ve)
+                out.append((s[0] + t * (e[0] - s[0]), s[1] + t * (e[1] - s[1])))
+            out.append(e)
+
+    def _same(a, b, tol=1e-9):
+        return abs(a[0] - b[0]) <= tol and abs(a[1] - b[1]) <= tol
+
+    cleaned = []
+    for p in out:
+        if not cleaned or not _same(p, cleaned[-1]):
+            cleaned.append(p)
+    if cleaned and len(cleaned) >= 3 and _same(cleaned[0], cleaned[-1]):
+        cleaned = cleaned[:-1]
+    if len(cleaned) < 3:
+        return pts
+    return cleaned
+
+
+def _old_spans(pts2, street_segments, renormalize=True):
+    rx, ry = _old_pick_ridge_dir(pts2, street_segments)
+    if renormalize:
+        # _envelope_ridge_mesh passed the picked direction through _unit again
+        rx, ry = _unit(float(rx), float(ry))
+    sx, sy = (-ry, rx)
+    proj_r = [x * rx + y * ry for (x, y) in pts2]
+    proj_s = [x * sx + y * sy for (x, y) in pts2]
+    return min(proj_r), max(proj_r), min(proj_s), max(proj_s)
+
+
+def _old_compute_rise_max(pts2, slope_deg, max_rise_m=None, street_segments=None):
+    pts2 = _ensure_ring_open(pts2)
+    t = math.tan(math.radians(float(slope_deg)))
+    r_min, r_max, s_min, s_max = _old_spans(pts2, street_segments, renormalize=False)
+    rise = max((r_max - r_min) * 0.5, (s_max - s_min) * 0.5) * t
+    if max_rise_m is not None:
+        rise = min(rise, float(max_rise_m))
+    return float(rise)
+
+
+def _old_ridge_rise(pts2, slope_deg, max_rise_m=None, street_segments=None):
+    """Rise computed inside the former _envelope_ridge_mesh."""
+    pts2 = _ensure_ring_open(pts2)
+    r_min, r_max, s_min, s_max = _old_spans(pts2, street_segments)
+    rise = 0.5 * (s_max - s_min) * math.tan(math.radians(float(slope_deg)))
+    if max_rise_m is not None and rise > float(max_rise_m):
+        rise = float(max_rise_m)
+    return rise
+
+
+def _old_ring_area(points):
+    pts = _ensure_ring_open(points)
+    n = len(pts)
+    if n < 3:
+        return 0.0
+    a = 0.0
+    for i in range(n):
+        x1, y1 = pts[i]
+        x2, y2 = pts[(i + 1) % n]
+        a += (x1 * y2 - x2 * y1)
+    return abs(0.5 * a)
+
+
+def _old_support_point(pts, ux, uy, take_max):
+    best_p = pts[0]
+    best_v = best_p[0] * ux + best_p[1] * uy
+    for (x, y) in pts[1:]:
+        v = x * ux + y * uy
+        if (take_max and v > best_v) or ((not take_max) and v < best_v):
+            best_v = v
+            best_p = (x, y)
+    return best_p
+
+
+def _random_ring(rng: random.Random, origin: Point2) -> List[Point2]:
+    """Star-shaped parcel with 3-14 vertices, sometimes an axis-aligned rectangle (edge-length ties)."""
+    ox, oy = origin
+    if rng.random() < 0.2:
+        w, d = rng.choice([10.0, 12.5, 20.0]), rng.choice([10.0, 12.5, 30.0])
+        return [(ox, oy), (ox + w, oy), (ox + w, oy + d), (ox, oy + d)]
+    n = rng.randint(3, 14)
+    angles = sorted(rng.uniform(0.0, 2.0 * math.pi) for _ in range(n))
+    return [(ox + r * math.cos(a), oy + r * math.sin(a)) for a, r in ((a, rng.uniform(4.0, 35.0)) for a in angles)]
+
+
+def _random_streets(rng: random.Random, ring: List[Point2]) -> Optional[list]:
+    if rng.random() < 0.5:
+        return None
+    out = []
+    for i in range(len(ring)):
+        if rng.random() < 0.4:
+            a, b = ring[i], ring[(i + 1) % len(ring)]
+            out.append({"segment": [a, b], "street": rng.choice([0.0, 4.0, 8.0, 12.0])})
+    return out
+
+
+CASES = 300
+
+
+@pytest.mark.parametrize("origin", [(0.0, 0.0), (431250.0, 4581730.0)])
+def test_analysis_matches_former_helpers(origin):
+    rng = random.Random(46)
+    for _ in range(CASES):
+        ring = _random_ring(rng, origin)
+        if rng.random() < 0.3:
+            ring = ring[::-1]
+        if rng.random() < 0.3:
+            ring = ring + [ring[0]]
+        streets = _random_streets(rng, _ensure_ring_open(ring))
+        depth = rng.choice([None, 0.0, rng.uniform(1.0, 40.0)])
+        slope = rng.uniform(15.0, 45.0)
+        cap = rng.choice([None, rng.uniform(1.0, 6.0)])
+
+        fa = FootprintAnalysis(ring, streets)
+        pts = _ensure_ring_open(ring)
+        assert fa.points == pts
+        assert fa.area == _old_ring_area(ring)
+
+        expected_clip = pts if not depth else _old_clip_polygon_by_depth(ring, depth)
+        buildable = fa.clip_by_depth(depth)
+        assert buildable.points == expected_clip
+        assert fa.clip_by_depth(depth) is buildable
+
+        assert buildable.ridge_dir == _old_pick_ridge_dir(expected_clip, streets)
+        assert buildable.spans == _old_spans(expected_clip, streets)
+        assert buildable.ridge_rise(slope, cap) == _old_ridge_rise(expected_clip, slope, cap, streets)
+        assert buildable.rise_max(slope, cap) == pytest.approx(
+            _old_compute_rise_max(expected_clip, slope, cap, streets), abs=1e-8
+        )
+
+        assert fa.centroid == pytest.approx((sum(p[0] for p in pts) / len(pts), sum(p[1] for p in pts) / len(pts)), abs=1e-9)
+
+        rx, ry, sx, sy = buildable.ridge_frame
+        for axis, (ux, uy) in (("r", (rx, ry)), ("s", (sx, sy))):
+            for take_max in (True, False):
+                assert buildable.support_point(axis, take_max) == _old_support_point(expected_clip, ux, uy, take_max)
+
+
+def test_winding_matches_shapely_for_valid_rings():
+    shapely_geometry = pytest.importorskip("shapely.geometry")
+    rng = random.Random(7)
+    checked = 0
+    for _ in range(CASES):
+        ring = _random_ring(rng, (431250.0, 4581730.0))
+        if rng.random() < 0.5:
+            ring = ring[::-1]
+        poly = shapely_geometry.Polygon(ring)
+        if not poly.is_valid:
+            continue
+        checked += 1
+        fa = FootprintAnalysis(ring)
+        assert fa.is_ccw == poly.exterior.is_ccw
+        assert fa.ccw_points == (list(fa.points) if poly.exterior.is_ccw else fa.points[::-1])
+    assert checked > CASES // 2
@@ -0,0 +1,155 @@
+"""GLB triangulation, tile merging and the tile cache."""
+
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+import os
+import struct
+import threading
+
+import pytest
+
+import glb_export
+from glb_export import GlbBuilder, ensure_tile, merge_glbs, read_glb, triangulate_polygon
+
+
+def _signed_area_xy(pts, tri):
+    (x0, y0, _), (x1, y1, _), (x2, y2, _) = (pts[i] for i in tri)
+    return 0.5 * ((x1 - x0) * (y2 - y0) - (y1 - y0) * (x2 - x0))
+
+
+def _ring_area_xy(pts):
+    n = len(pts)
+    return 0.5 * sum(pts[i][0] * pts[(i + 1) % n][1] - pts[(i + 1) % n][0] * pts[i][1] for i in range(n))
+
+
+def test_triangulate_trivial_cases():
+    assert triangulate_polygon([(0, 0, 0), (1, 0, 0)]) == []
+    assert triangulate_polygon([(0, 0, 0), (1, 0, 0), (0, 1, 0)]) == [(0, 1, 2)]
+
+
+@pytest.mark.parametrize("reverse", [False, True])
+def test_triangulate_concave_polygon_keeps_area_and_winding(reverse):
+    # L-shape (concave at (1, 1))
+    pts = [(0, 0, 5), (2, 0, 5), (2, 1, 5), (1, 1, 5), (1, 2, 5), (0, 2, 5)]
+    if reverse:
+        pts = pts[::-1]
+    tris = triangulate_polygon(pts)
+    assert len(tris) == len(pts) - 2
+    area = _ring_area_xy(pts)
+    assert sum(_signed_area_xy(pts, t) for t in tris) == pytest.approx(area)
+    # Every triangle has the polygon's own orientation
+    assert all(_signed_area_xy(pts, t) * area > 0 for t in tris)
+
+
+def test_triangulate_vertical_face():
+    # Wall face in the XZ plane
+    pts = [(0, 0, 0), (4, 0, 0), (4, 0, 3), (2, 0, 4), (0, 0, 3)]
+    tris = triangulate_polygon(pts)
+    assert len(tris) == 3
+    assert sorted({i for t in tris for i in t}) == list(range(5))
+
+
+def _write_glb(path, origin, rgb=(0.2, 0.6, 1.0), name="proxy"):
+    b = GlbBuilder()
+    mat = b.material("Envelope", rgb, 0.5)
+    mesh = b.add_mesh(name, [(0.0, 0.0, 0.0), (1.0, 0.0, 0.0), (0.0, 0.0, -1.0)], [(0, 1, 2)], mat)
+    root = b.add_node({"name": name, "mesh": mesh})
+    path.write_bytes(b.to_bytes([root], origin, {"name": path.stem}))
+    return path
+
+
+def test_merge_translates_sources_and_shares_materials(tmp_path):
+    a = _write_glb(tmp_path / "a.glb", [431000.0, 4581000.0, 0.0])
+    b = _write_glb(tmp_path / "b.glb", [431010.0, 4581020.0, 2.0])
+    c = _write_glb(tmp_path / "c.glb", [431005.0, 4580990.0, 0.0], rgb=(1.0, 0.0, 0.0))
+    out = tmp_path / "tile.glb"
+    out.write_bytes(merge_glbs([("A", a), ("B", b), ("C", c)], name="block 1"))
+
+    doc, bin_chunk = read_glb(out)
+    scene = doc["scenes"][0]
+    assert scene["extras"]["name"] == "block 1"
+    assert scene["extras"]["sources"] == ["A", "B", "C"]
+    assert scene["extras"]["origin"] == [431000.0, 4580990.0, 0.0]
+
+    roots = {doc["nodes"][i]["name"]: doc["nodes"][i] for i in scene["nodes"]}
+    # IFC delta (dx, dy, dz) -> glTF (dx, dz, -dy)
+    assert roots["A"]["translation"] == [0.0, 0.0, -10.0]
+    assert roots["B"]["translation"] == [10.0, 2.0, -30.0]
+    assert roots["C"]["translation"] == [5.0, 0.0, -0.0]
+
+    assert len(doc["meshes"]) == 3
+    assert len(doc["materials"]) == 2
+    assert doc["buffers"][0]["byteLength"] == len(bin_chunk)
+    for acc in doc["accessors"]:
+        view = doc["bufferViews"][acc["bufferView"]]
+        assert view["byteOffset"] + view["byteLength"] <= len(bin_chunk)
+    # Positions of the merged meshes are the sources' own bytes
+    pos = doc["accessors"][doc["meshes"][1]["primitives"][0]["attributes"]["POSITION"]]
+    view = doc["bufferViews"][pos["bufferView"]]
+    floats = struct.unpack_from("<9f", bin_chunk, view["byteOffset"])
+    assert floats == (0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, -1.0)
+
+
+def test_envelope_glb_from_ifc_model(tmp_path):
+    pytest.importorskip("ifcopenshell")
+    from ifc_exporter import create_ifc_envelope
+
+    square = [(431000.0, 4581000.0), (431010.0, 4581000.0), (431010.0, 4581010.0), (431000.0, 4581010.0)]
+    glb = tmp_path / "parcel.glb"
+    create_ifc_envelope(
+        footprint_points=square, height=6.0, zone_key="Z1", out_path=str(tmp_path / "parcel.ifc"),
+        roof_slope_deg_real=30.0, roof_slope_deg_virtual=60.0, glb_path=str(glb),
+    )
+    doc, _ = read_glb(glb)
+    assert doc["scenes"][0]["extras"]["origin"][:2] == [431000.0, 4581000.0]
+    assert doc["meshes"]
+    proxies = [doc["nodes"][i] for i in doc["scenes"][0]["nodes"]]
+    assert proxies and all(p["extras"]["GlobalId"] and p["children"] for p in proxies)
+
+
+def test_ensure_tile_reuses_fresh_tile_and_rebuilds_on_change(tmp_path):
+    a = _write_glb(tmp_path / "a.glb", [0.0, 0.0, 0.0])
+    b = _write_glb(tmp_path / "b.glb", [5.0, 0.0, 0.0])
+    tile = tmp_path / "tiles" / "t.glb"
+
+    ensure_tile(tile, [("B", b), ("A", a)])
+    first = tile.stat().st_mtime_ns
+    assert read_glb(tile, json_only=True)[0]["scenes"][0]["extras"]["sources"] == ["A", "B"]
+
+    ensure_tile(tile, [("A", a), ("B", b)])
+    assert tile.stat().st_mtime_ns == first
+
+    ensure_tile(tile, [("A", a)])
+    assert read_glb(tile, json_only=True)[0]["scenes"][0]["extras"]["sources"] == ["A"]
+
+    # A source newer than the tile forces a rebuild
+    past = a.stat().st_mtime - 10
+    os.utime(tile, (past, past))
+    ensure_tile(tile, [("A", a)])
+    assert tile.stat().st_mtime > past
+
+
+def test_ensure_tile_builds_each_tile_once_and_tiles_in_parallel(tmp_path, monkeypatch):
+    a = _write_glb(tmp_path / "a.glb", [0.0, 0.0, 0.0])
+    real_merge = glb_export.merge_glbs
+    calls = []
+    building = {"t1": threading.Event(), "t2": threading.Event()}
+
+    def slow_merge(sources, name="tile"):
+        calls.append(name)
+        building[name].set()
+        # The other tile must be able to start while this one is being built
+        other = building["t2" if name == "t1" else "t1"]
+        assert other.wait(5.0)
+        return real_merge(sources, name=name)
+
+    monkeypatch.setattr(glb_export, "merge_glbs", slow_merge)
+
+    def build(i):
+        name = "t1" if i % 2 == 0 else "t2"
+        return ensure_tile(tmp_path / f"{name}.glb", [("A", a)], name=name)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(build, range(8)))
+    assert sorted(calls) == ["t1", "t2"]
@@ -0,0 +1,140 @@
+"""Accept-Encoding parsing, pre-compressed /outputs files and on-the-fly text compression."""
+
+from __future__ import annotations
+
+import gzip
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+
+from fastapi import FastAPI  # noqa: E402
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from compression import ensure_gzip_variant, finalize_ifc_output  # noqa: E402
+from http_gzip import GZipTextMiddleware, PrecompressedStaticFiles, accepts_gzip  # noqa: E402
+
+STEP = b"ISO-10303-21;\nDATA;\n" + b"#1=IFCWALL('x',$,$,$,$,$,$,$,$);\n" * 500 + b"END-ISO-10303-21;\n"
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        (None, False),
+        ("", False),
+        ("gzip", True),
+        ("deflate, gzip;q=0.5", True),
+        ("br, GZIP", True),
+        ("x-gzip", True),
+        ("gzip;q=0", False),
+        ("gzip;q=0.0, *", False),
+        ("*", True),
+        ("*;q=0", False),
+        ("identity", False),
+        ("gzip;q=bogus", False),
+    ],
+)
+def test_accepts_gzip(header, expected):
+    assert accepts_gzip(header) is expected
+
+
+def _outputs_client(tmp_path):
+    app = FastAPI()
+    app.mount("/outputs", PrecompressedStaticFiles(directory=str(tmp_path)), name="outputs")
+    return TestClient(app)
+
+
+def test_outputs_serve_fresh_variant_only_to_gzip_clients(tmp_path):
+    src = tmp_path / "a.ifc"
+    src.write_bytes(STEP)
+    ensure_gzip_variant(src)
+    client = _outputs_client(tmp_path)
+
+    gz = client.get("/outputs/a.ifc", headers={"Accept-Encoding": "gzip"})
+    assert gz.status_code == 200
+    assert gz.headers["content-encoding"] == "gzip"
+    assert gz.content == STEP  # httpx decodes the body
+    assert "accept-encoding" in gz.headers["vary"].lower()
+
+    plain = client.get("/outputs/a.ifc", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert plain.content == STEP
+
+
+def test_outputs_serve_ifczip_viewer_copy(tmp_path):
+    src = tmp_path / "b.ifc"
+    src.write_bytes(STEP)
+    out = finalize_ifc_output(src, "ifczip")
+    assert not src.exists() and out["viewer_ifc_path"] == str(src)
+    url = "/outputs/b.ifc"
+    client = _outputs_client(tmp_path)
+
+    gz = client.get(url, headers={"Accept-Encoding": "gzip, deflate"})
+    assert gz.status_code == 200
+    assert gz.headers["content-encoding"] == "gzip"
+    assert gz.content == STEP
+
+    plain = client.get(url, headers={"Accept-Encoding": "identity"})
+    assert plain.status_code == 200
+    assert "content-encoding" not in plain.headers
+    assert plain.content == STEP
+
+    assert client.get("/outputs/missing.ifc").status_code == 404
+    assert client.get("/outputs/b.ifczip").status_code == 200
+
+
+def _middleware_client():
+    app = FastAPI()
+    app.add_middleware(GZipTextMiddleware, minimum_size=100)
+
+    @app.get("/big")
+    def big():
+        return PlainTextResponse("x" * 1000)
+
+    @app.get("/small")
+    def small():
+        return PlainTextResponse("tiny")
+
+    @app.get("/binary")
+    def binary():
+        return Response(b"\0" * 1000, media_type="model/gltf-binary")
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse(iter(["line\n"] * 50), media_type="text/csv")
+
+    @app.get("/events")
+    def events():
+        return StreamingResponse(iter(["data: x\n\n"] * 50), media_type="text/event-stream")
+
+    return TestClient(app)
+
+
+def test_middleware_compresses_large_text_only():
+    client = _middleware_client()
+
+    big = client.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert big.headers["content-encoding"] == "gzip"
+    assert big.text == "x" * 1000
+    assert int(big.headers["content-length"]) < 1000
+    assert "accept-encoding" in big.headers["vary"].lower()
+
+    assert "content-encoding" not in client.get("/big", headers={"Accept-Encoding": "identity"}).headers
+    assert "content-encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+    assert "content-encoding" not in client.get("/binary", headers={"Accept-Encoding": "gzip"}).headers
+
+
+def test_middleware_streams_text_but_not_events():
+    client = _middleware_client()
+
+    with client.stream("GET", "/stream", headers={"Accept-Encoding": "gzip"}) as resp:
+        assert resp.headers["content-encoding"] == "gzip"
+        assert "content-length" not in resp.headers
+        raw = b"".join(resp.iter_raw())
+    assert gzip.decompress(raw) == b"line\n" * 50
+
+    events = client.get("/events", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in events.headers
+    assert events.text == "data: x\n\n" * 50
@@ -0,0 +1,94 @@
+"""Parsed-model cache: sharing, derived artefacts, eviction and lock pruning."""
+
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+import pytest
+
+ifcopenshell = pytest.importorskip("ifcopenshell")
+
+from ifc_cache import PARSED_SIZE_FACTOR, IfcModelCache  # noqa: E402
+
+
+def _write_ifc(path, name="P"):
+    model = ifcopenshell.file(schema="IFC4")
+    model.create_entity("IfcProject", GlobalId=ifcopenshell.guid.new(), Name=name)
+    model.write(str(path))
+    return path
+
+
+def _cost(path):
+    return path.stat().st_size * PARSED_SIZE_FACTOR
+
+
+def test_open_shares_the_parsed_model(tmp_path):
+    path = _write_ifc(tmp_path / "a.ifc")
+    cache = IfcModelCache(10 * _cost(path))
+    assert cache.open(path) is cache.open(str(path))
+    assert len(cache) == 1
+
+
+def test_changed_file_is_parsed_again(tmp_path):
+    path = _write_ifc(tmp_path / "a.ifc", "old")
+    cache = IfcModelCache(10 * _cost(path))
+    first = cache.open(path)
+    time.sleep(0.01)
+    _write_ifc(path, "a much longer project name")
+    second = cache.open(path)
+    assert second is not first
+    assert second.by_type("IfcProject")[0].Name == "a much longer project name"
+
+
+def test_derived_is_computed_once_under_concurrency(tmp_path):
+    path = _write_ifc(tmp_path / "a.ifc")
+    cache = IfcModelCache(10 * _cost(path))
+    calls = []
+    gate = threading.Barrier(8)
+
+    def compute(model):
+        calls.append(threading.get_ident())
+        time.sleep(0.05)
+        return len(model.by_type("IfcProject"))
+
+    def lookup(_):
+        gate.wait()
+        return cache.derived(path, "projects", compute)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lookup, range(8)))
+    assert results == [1] * 8
+    assert len(calls) == 1
+
+
+def test_derived_exceptions_are_not_cached(tmp_path):
+    path = _write_ifc(tmp_path / "a.ifc")
+    cache = IfcModelCache(10 * _cost(path))
+
+    def broken(model):
+        raise RuntimeError("no geometry")
+
+    with pytest.raises(RuntimeError):
+        cache.derived(path, "bbox", broken)
+    assert cache.derived(path, "bbox", lambda model: 42) == 42
+
+
+def test_eviction_prunes_path_locks(tmp_path):
+    a = _write_ifc(tmp_path / "a.ifc")
+    b = _write_ifc(tmp_path / "b.ifc")
+    cache = IfcModelCache(max(_cost(a), _cost(b)) + 1)
+    cache.open(a)
+    cache.open(b)
+    assert len(cache) == 1
+    assert str(a.resolve()) not in cache._path_locks
+    assert cache.used_bytes <= cache.max_bytes
+
+
+def test_models_over_budget_are_not_kept(tmp_path):
+    path = _write_ifc(tmp_path / "a.ifc")
+    cache = IfcModelCache(1)
+    assert cache.open(path) is not cache.open(path)
+    assert len(cache) == 0
+    assert cache._path_locks == {}
@@ -0,0 +1,47 @@
+"""Per-parcel input hashes used by incremental batches."""
+
+from __future__ import annotations
+
+import pytest
+
+import pipeline
+
+REFCATS = ["000302300DG70H", "8808517DG7180N"]
+
+
+@pytest.fixture
+def hashes(monkeypatch):
+    """compute_parcel_input_hashes over a fixed POUM index and the given config."""
+    monkeypatch.setattr(pipeline, "_get_poum_index", lambda path: {})
+    monkeypatch.setattr(pipeline, "_get_poum_digest_index", lambda path: {r: f"digest-{r}" for r in REFCATS})
+
+    def compute(**config):
+        monkeypatch.setattr(pipeline, "_load_config", lambda: dict(config))
+        return pipeline.compute_parcel_input_hashes(REFCATS, "poum.gml")
+
+    return compute
+
+
+def test_hash_is_stable_and_per_parcel(hashes):
+    first = hashes(export_glb=True)
+    assert first == hashes(export_glb=True)
+    assert first[REFCATS[0]] != first[REFCATS[1]]
+
+
+def test_service_settings_do_not_invalidate(hashes):
+    assert hashes(export_glb=True) == hashes(export_glb=True, log_level="DEBUG", worker_count=8)
+
+
+@pytest.mark.parametrize(
+    "key, before, after",
+    [
+        ("envelope_representation", "faceset", "brep"),
+        ("ifc_output_format", "ifc", "ifczip"),
+        ("export_glb", False, True),
+        ("precompress_outputs", False, True),
+        ("deterministic_ifc", False, True),
+    ],
+)
+def test_output_settings_invalidate(hashes, key, before, after):
+    old, new = hashes(**{key: before}), hashes(**{key: after})
+    assert all(old[r] != new[r] for r in REFCATS)
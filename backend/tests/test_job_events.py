@@ -0,0 +1,65 @@
+"""Job event fan-out: delivery across threads, lag marking and SSE framing."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+
+import job_events
+from job_events import format_sse, publish, subscribe, subscriber_count, unsubscribe
+
+
+def test_events_published_from_a_worker_thread_reach_the_loop():
+    async def scenario():
+        sub = subscribe("job-1")
+        other = subscribe("job-2")
+        try:
+            t = threading.Thread(target=publish, args=("job-1", "progress", {"progress": 0.5}))
+            t.start()
+            t.join()
+            event = await asyncio.wait_for(sub.queue.get(), timeout=1.0)
+            return event, other.queue.empty()
+        finally:
+            unsubscribe(sub)
+            unsubscribe(other)
+
+    event, other_empty = asyncio.run(scenario())
+    assert event == {"event": "progress", "id": None, "data": {"progress": 0.5}}
+    assert other_empty
+    assert subscriber_count("job-1") == 0
+
+
+def test_full_queue_marks_the_subscriber_lagged(monkeypatch):
+    monkeypatch.setattr(job_events, "SUBSCRIBER_QUEUE_SIZE", 3)
+
+    async def scenario():
+        sub = subscribe("job-lag")
+        try:
+            for i in range(5):
+                publish("job-lag", "log", {"line": i}, event_id=i)
+            await asyncio.sleep(0)
+            return sub.lagged, sub.queue.qsize()
+        finally:
+            unsubscribe(sub)
+
+    assert asyncio.run(scenario()) == (True, 3)
+
+
+def test_publish_without_subscribers_is_a_no_op():
+    publish("nobody", "status", {"status": "running"})
+    loop = asyncio.new_event_loop()
+    try:
+        unsubscribe(job_events.Subscription(job_id="nobody", loop=loop))
+    finally:
+        loop.close()
+
+
+def test_format_sse():
+    frame = format_sse("log", {"line": "héllo"}, event_id=7)
+    assert frame.endswith("\n\n")
+    lines = frame.strip("\n").split("\n")
+    assert lines[0] == "id: 7"
+    assert lines[1] == "event: log"
+    assert json.loads(lines[2][len("data: "):]) == {"line": "héllo"}
+    assert not format_sse("end", {}).startswith("id:")
@@ -0,0 +1,100 @@
+"""SQLite job store: records, per-parcel timings and the schema 1 migration."""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+import time
+
+from job_store import JobStore
+
+
+def _record(job_id: str, status: str = "running", **extra) -> dict:
+    rec = {
+        "id": job_id,
+        "municipality": "Test",
+        "all_parcels": True,
+        "refcat": None,
+        "status": status,
+        "progress": 0.5,
+        "message": "",
+        "created_at": time.time(),
+        "started_at": None,
+        "finished_at": None,
+        "files": ["/tmp/a.ifc"],
+        "logs": [[1, 0.0, "hello"]],
+        "log_seq": 1,
+        "meta": {"mode": "batch"},
+        "options": {},
+    }
+    rec.update(extra)
+    return rec
+
+
+def test_save_and_load_roundtrip(tmp_path):
+    store = JobStore(tmp_path / "jobs.sqlite3")
+    store.save(_record("j1"))
+    rec = store.load("j1")
+    assert rec["all_parcels"] is True
+    assert rec["files"] == ["/tmp/a.ifc"]
+    assert rec["logs"] == [[1, 0.0, "hello"]]
+    assert rec["meta"] == {"mode": "batch"}
+    assert store.load("missing") is None
+
+
+def test_parcel_timings_are_rows_not_job_fields(tmp_path):
+    store = JobStore(tmp_path / "jobs.sqlite3")
+    store.save(_record("j1"))
+    for i in range(5):
+        store.add_parcel_timing("j1", {"refcat": f"R{i}", "status": "ok", "total": float(i)})
+    store.add_parcel_timing("j2", {"refcat": "other", "status": "ok"})
+
+    records = store.load_parcel_timings("j1")
+    assert [r["refcat"] for r in records] == ["R0", "R1", "R2", "R3", "R4"]
+    assert "parcel_timings" not in store.load("j1")
+
+    store.delete("j1")
+    assert store.load_parcel_timings("j1") == []
+    assert len(store.load_parcel_timings("j2")) == 1
+
+
+def test_retention_drops_timings_of_evicted_jobs(tmp_path):
+    store = JobStore(tmp_path / "jobs.sqlite3")
+    old = time.time() - 10 * 86400
+    store.save(_record("old", status="success", finished_at=old))
+    store.save(_record("new", status="success", finished_at=time.time()))
+    store.add_parcel_timing("old", {"refcat": "A"})
+    store.add_parcel_timing("new", {"refcat": "B"})
+    assert store.apply_retention(86400.0, None) == 1
+    assert store.load_parcel_timings("old") == []
+    assert store.load_parcel_timings("new") == [{"refcat": "B"}]
+
+
+def test_schema_1_timings_are_migrated(tmp_path):
+    path = tmp_path / "jobs.sqlite3"
+    conn = sqlite3.connect(str(path))
+    conn.executescript(
+        """
+        CREATE TABLE jobs (
+            id TEXT PRIMARY KEY, municipality TEXT NOT NULL, all_parcels INTEGER NOT NULL,
+            refcat TEXT, status TEXT NOT NULL, progress REAL NOT NULL, message TEXT NOT NULL,
+            created_at REAL NOT NULL, started_at REAL, finished_at REAL, files TEXT NOT NULL,
+            logs TEXT NOT NULL, log_seq INTEGER NOT NULL, meta TEXT NOT NULL,
+            options TEXT NOT NULL, parcel_timings TEXT NOT NULL
+        );
+        PRAGMA user_version=1;
+        """
+    )
+    timings = [{"refcat": "A", "total": 1.0}, {"refcat": "B", "total": 2.0}]
+    conn.execute(
+        "INSERT INTO jobs VALUES ('j1', 'Test', 1, NULL, 'success', 1.0, '', 0, NULL, 1, '[]', '[]', 0, '{}', '{}', ?)",
+        (json.dumps(timings),),
+    )
+    conn.commit()
+    conn.close()
+
+    store = JobStore(path)
+    assert store.load_parcel_timings("j1") == timings
+    assert "parcel_timings" not in store.load("j1")
+    store.save(_record("j2"))  # the new column set inserts cleanly
+    assert store.load("j2") is not None
@@ -0,0 +1,96 @@
+"""Job registry: log ring buffer, pagination and timing records."""
+
+from __future__ import annotations
+
+import threading
+
+import jobs
+from jobs import append_log, create_job, read_logs_after, tail_log_lines
+
+
+def _job_with_lines(n: int) -> jobs.Job:
+    job = jobs.Job(id="j", municipality="Test", all_parcels=True, refcat=None)
+    for i in range(1, n + 1):
+        append_log(job, f"line {i}")
+    return job
+
+
+def test_read_logs_after_pages_by_sequence(job_store):
+    job = _job_with_lines(10)
+    page = read_logs_after(job, after=3, limit=4)
+    assert [l["seq"] for l in page["lines"]] == [4, 5, 6, 7]
+    assert page["next_after"] == 7
+    assert page["first_seq"] == 1 and page["last_seq"] == 10
+    assert not page["truncated"]
+
+    done = read_logs_after(job, after=10)
+    assert done["lines"] == [] and done["next_after"] == 10
+
+
+def test_read_logs_after_reports_dropped_lines(job_store, monkeypatch):
+    monkeypatch.setattr(jobs, "LOG_BUFFER_SIZE", 5)
+    job = _job_with_lines(12)
+    page = read_logs_after(job, after=2)
+    assert page["truncated"]
+    assert page["first_seq"] == 8
+    assert [l["seq"] for l in page["lines"]] == [8, 9, 10, 11, 12]
+
+
+def test_tail_log_lines(job_store):
+    job = _job_with_lines(5)
+    assert tail_log_lines(job, 2) == ["line 4", "line 5"]
+    assert tail_log_lines(job, 50) == [f"line {i}" for i in range(1, 6)]
+    assert tail_log_lines(job, 0) == []
+
+
+def test_readers_tolerate_concurrent_appends(job_store, monkeypatch):
+    monkeypatch.setattr(jobs, "LOG_BUFFER_SIZE", 200)
+    job = _job_with_lines(200)
+    stop = threading.Event()
+
+    def writer():
+        while not stop.is_set():
+            append_log(job, "more")
+
+    t = threading.Thread(target=writer)
+    t.start()
+    try:
+        for _ in range(2000):
+            page = read_logs_after(job, after=job.log_seq - 150, limit=100)
+            seqs = [l["seq"] for l in page["lines"]]
+            if seqs:
+                assert seqs == list(range(seqs[0], seqs[0] + len(seqs)))
+            tail_log_lines(job, 100)
+    finally:
+        stop.set()
+        t.join()
+
+
+def test_parcel_timings_go_to_the_store(job_store):
+    job = create_job("Test", all_parcels=True, refcat=None)
+    jobs.add_parcel_timing(job, {"refcat": "A", "status": "ok", "total": 1.0})
+    jobs.add_parcel_timing(job, {"refcat": "B", "status": "error", "total": 2.0})
+    assert [r["refcat"] for r in jobs.load_parcel_timings(job.id)] == ["A", "B"]
+    assert not hasattr(job, "parcel_timings")
+
+
+def test_status_events_carry_the_new_message(job_store):
+    import asyncio
+
+    from job_events import subscribe, unsubscribe
+
+    async def scenario():
+        job = create_job("Test", all_parcels=False, refcat="R")
+        sub = subscribe(job.id)
+        try:
+            jobs.set_status(job, "success", message="Done. Produced 1 IFC file.")
+            await asyncio.sleep(0)
+            event = sub.queue.get_nowait()
+        finally:
+            unsubscribe(sub)
+        return job, event
+
+    job, event = asyncio.run(scenario())
+    assert event["event"] == "status"
+    assert event["data"] == {"status": "success", "message": "Done. Produced 1 IFC file."}
+    assert job_store.load(job.id)["message"] == "Done. Produced 1 IFC file."
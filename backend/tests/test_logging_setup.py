@@ -0,0 +1,75 @@
+"""configure_logging: module levels, console format and the JSON-lines sink."""
+
+from __future__ import annotations
+
+import json
+import logging
+
+import pytest
+
+import logging_setup
+from logging_setup import configure_logging
+from regulations import DEFAULT_RULE, get_rule
+
+MODULES = ("pipeline", "ifc_exporter", "cadastre_client", "regulations")
+
+
+@pytest.fixture(autouse=True)
+def restore_logging():
+    """Undo the handlers and levels configure_logging installs."""
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    installed = list(logging_setup._INSTALLED)
+    levels = {name: logging.getLogger(name).level for name in MODULES}
+    yield
+    for handler in logging_setup._INSTALLED:
+        handler.close()
+    logging_setup._INSTALLED[:] = installed
+    root.handlers[:] = handlers
+    root.setLevel(level)
+    for name, lvl in levels.items():
+        logging.getLogger(name).setLevel(lvl)
+
+
+def test_global_and_per_module_levels():
+    configure_logging({
+        "log_level": "warning",
+        "log_levels": {"pipeline": "DEBUG", "cadastre_client": "error", "regulations": "bogus"},
+        "debug_depth_log": True,
+    })
+
+    assert logging.getLogger().level == logging.WARNING
+    assert logging.getLogger("pipeline").getEffectiveLevel() == logging.DEBUG
+    assert logging.getLogger("cadastre_client").getEffectiveLevel() == logging.ERROR
+    # Unknown level names fall back to INFO
+    assert logging.getLogger("regulations").getEffectiveLevel() == logging.INFO
+    # debug_depth_log only fills in modules log_levels does not set
+    assert logging.getLogger("ifc_exporter").getEffectiveLevel() == logging.DEBUG
+
+
+def test_json_sink_and_console(tmp_path, capsys):
+    sink = tmp_path / "logs" / "service.jsonl"
+    configure_logging({"log_format": "json", "log_json_path": str(sink), "log_levels": {"cadastre_client": "ERROR"}})
+
+    assert get_rule("no-such-zone") is DEFAULT_RULE
+    logging.getLogger("cadastre_client").warning("filtered out")
+    logging.getLogger("pipeline").info("parcel done", extra={"refcat": "0123456DG7102S"})
+
+    records = [json.loads(line) for line in sink.read_text(encoding="utf-8").splitlines()]
+    assert [(r["logger"], r["level"]) for r in records] == [("regulations", "WARNING"), ("pipeline", "INFO")]
+    assert "no-such-zone" in records[0]["msg"] and records[0]["zone"] == "no-such-zone"
+    assert records[1]["refcat"] == "0123456DG7102S"
+
+    out, err = capsys.readouterr()
+    assert out == ""  # get_rule no longer prints
+    assert [json.loads(line)["msg"] for line in err.splitlines()] == [r["msg"] for r in records]
+
+
+def test_reconfiguring_replaces_installed_handlers(tmp_path, capsys):
+    sink = tmp_path / "service.jsonl"
+    configure_logging({"log_json_path": str(sink)})
+    configure_logging({"log_json_path": str(sink)})
+    logging.getLogger("pipeline").warning("once")
+
+    assert len(sink.read_text(encoding="utf-8").splitlines()) == 1
+    assert capsys.readouterr().err.count("WARNING pipeline: once") == 1
@@ -0,0 +1,89 @@
+"""Build manifest: persistence, diffing and output cleanup."""
+
+from __future__ import annotations
+
+import json
+
+from compression import gzip_variant
+from manifest import (
+    MANIFEST_VERSION,
+    delete_dropped_companions,
+    delete_output,
+    diff_manifest,
+    load_manifest,
+    make_entry,
+    manifest_path,
+    save_manifest,
+)
+
+
+def test_missing_corrupt_or_outdated_manifest_is_empty(tmp_path):
+    path = manifest_path(tmp_path, "town")
+    assert load_manifest(path, "town")["parcels"] == {}
+    path.parent.mkdir(parents=True)
+    path.write_text("{not json", encoding="utf-8")
+    assert load_manifest(path, "town")["parcels"] == {}
+    path.write_text(json.dumps({"version": MANIFEST_VERSION + 1, "parcels": {"A": {}}}), encoding="utf-8")
+    assert load_manifest(path, "town")["parcels"] == {}
+
+
+def test_save_then_load_roundtrip(tmp_path):
+    path = manifest_path(tmp_path, "town")
+    manifest = load_manifest(path, "town")
+    manifest["parcels"]["A"] = make_entry("h1", {"ifc_path": "/x/A.ifc", "zone": "12a"}, 1.23456)
+    save_manifest(path, manifest)
+    loaded = load_manifest(path, "town")
+    assert loaded["parcels"]["A"]["input_hash"] == "h1"
+    assert loaded["parcels"]["A"]["elapsed_s"] == 1.2346
+    assert loaded["updated_at"] is not None
+    assert not path.with_name(path.name + ".tmp").exists()
+
+
+def test_diff_classifies_parcels(tmp_path):
+    out = tmp_path / "B.ifc"
+    out.write_text("ifc")
+    manifest = {
+        "parcels": {
+            "B": {"input_hash": "hb", "ifc_path": str(out)},
+            "C": {"input_hash": "old", "ifc_path": str(out)},
+            "D": {"input_hash": "hd", "ifc_path": str(tmp_path / "gone.ifc")},
+            "E": {"input_hash": "he", "skipped": True},
+            "Z": {"input_hash": "hz", "ifc_path": str(out)},
+        }
+    }
+    diff = diff_manifest(manifest, {"A": "ha", "B": "hb", "C": "new", "D": "hd", "E": "he"})
+    assert diff.added == ["A"]
+    assert diff.changed == ["C", "D"]
+    assert diff.unchanged == ["B", "E"]
+    assert diff.removed == ["Z"]
+    assert diff.to_generate == ["A", "C", "D"]
+
+
+def test_delete_output_removes_companions_but_respects_keep(tmp_path):
+    ifc, glb, zipped = tmp_path / "A.ifc", tmp_path / "A.glb", tmp_path / "A.ifczip"
+    for p in (ifc, glb, zipped, gzip_variant(ifc)):
+        p.write_text("x")
+    entry = {"ifc_path": str(ifc), "glb_path": str(glb), "ifczip_path": str(zipped)}
+
+    assert delete_output(entry, keep=str(ifc)) is False
+    assert ifc.exists() and glb.exists()
+
+    assert delete_output(entry) is True
+    assert not any(p.exists() for p in (ifc, glb, zipped, gzip_variant(ifc)))
+    assert delete_output(None) is False
+
+
+def test_regeneration_drops_companions_it_no_longer_writes(tmp_path):
+    ifc, glb = tmp_path / "A.ifc", tmp_path / "A.glb"
+    for p in (ifc, glb, gzip_variant(glb)):
+        p.write_text("x")
+    entry = {"ifc_path": str(ifc), "glb_path": str(glb), "ifczip_path": None}
+
+    # Same IFC and GLB again: nothing goes
+    delete_dropped_companions(entry, {"ifc_path": str(ifc), "glb_path": str(glb)})
+    assert glb.exists() and gzip_variant(glb).exists()
+
+    # export_glb switched off: the old GLB and its variant go, the IFC stays
+    delete_dropped_companions(entry, {"ifc_path": str(ifc), "glb_path": None})
+    assert ifc.exists()
+    assert not glb.exists() and not gzip_variant(glb).exists()
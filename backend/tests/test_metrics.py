@@ -0,0 +1,96 @@
+"""/metrics scrape: request latency histogram, job gauges and cache ratios."""
+
+from __future__ import annotations
+
+import re
+
+import pytest
+
+pytest.importorskip("httpx")
+
+from metrics import record_cache  # noqa: E402
+
+_SAMPLE_RE = re.compile(r"^(?P<name>[a-z_]+)(?:\{(?P<labels>.*)\})? (?P<value>\S+)$")
+
+
+def _scrape(client):
+    """{(name, frozenset(labels)): value} from the text exposition."""
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain; version=0.0.4")
+    samples = {}
+    for line in resp.text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        m = _SAMPLE_RE.match(line)
+        assert m, line
+        labels = frozenset(re.findall(r'(\w+)="((?:[^"\\]|\\.)*)"', m["labels"] or ""))
+        samples[(m["name"], labels)] = float(m["value"])
+    return samples
+
+
+def _get(samples, name, **labels):
+    return samples.get((name, frozenset(labels.items())), 0.0)
+
+
+@pytest.fixture
+def client(main_module, job_store):
+    from fastapi.testclient import TestClient
+
+    return TestClient(main_module.app)
+
+
+def test_request_latency_histogram(client):
+    before = _scrape(client)
+    assert client.get("/health").status_code == 200
+    assert client.get("/jobs/nope").status_code == 404
+    after = _scrape(client)
+
+    health = {"method": "GET", "route": "/health"}
+    assert _get(after, "envelope_http_request_duration_seconds_count", **health) == \
+        _get(before, "envelope_http_request_duration_seconds_count", **health) + 1
+    assert _get(after, "envelope_http_request_duration_seconds_bucket", le="+Inf", **health) == \
+        _get(after, "envelope_http_request_duration_seconds_count", **health)
+    assert _get(after, "envelope_http_request_duration_seconds_sum", **health) > 0
+    # Buckets are cumulative
+    buckets = sorted(
+        (float(dict(k[1])["le"]), v)
+        for k, v in after.items()
+        if k[0] == "envelope_http_request_duration_seconds_bucket" and dict(k[1]).get("route") == "/health"
+        and dict(k[1])["le"] != "+Inf"
+    )
+    assert [v for _, v in buckets] == sorted(v for _, v in buckets)
+
+    # Requests are labelled with the route template, not the raw path
+    job = {"method": "GET", "route": "/jobs/{job_id}", "status": "404"}
+    assert _get(after, "envelope_http_requests_total", **job) == _get(before, "envelope_http_requests_total", **job) + 1
+    assert not any(dict(k[1]).get("route") == "/jobs/nope" for k in after)
+
+
+def test_job_status_gauges(client, main_module):
+    samples = _scrape(client)
+    for status in ("queued", "running", "success", "error"):
+        assert _get(samples, "envelope_jobs", status=status) == 0
+
+    main = main_module
+    done = main.create_job("Malgrat de Mar", False, "A")
+    main.set_status(done, "success")
+    main.finish_job(done)
+    failed = main.create_job("Malgrat de Mar", False, "B")
+    main.set_status(failed, "error")
+    main.finish_job(failed)
+
+    samples = _scrape(client)
+    assert _get(samples, "envelope_jobs", status="success") == 1
+    assert _get(samples, "envelope_jobs", status="error") == 1
+    assert _get(samples, "envelope_queue_depth") == _get(samples, "envelope_jobs", status="queued")
+
+
+def test_cache_hit_ratio(client):
+    for hit in (True, True, True, False):
+        record_cache("test_metrics_cache", hit)
+
+    samples = _scrape(client)
+    assert _get(samples, "envelope_cache_requests_total", cache="test_metrics_cache", result="hit") == 3
+    assert _get(samples, "envelope_cache_requests_total", cache="test_metrics_cache", result="miss") == 1
+    assert _get(samples, "envelope_cache_hit_ratio", cache="test_metrics_cache") == 0.75
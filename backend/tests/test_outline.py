@@ -0,0 +1,33 @@
+"""Vectorized footprint outline vs the former per-triangle implementation."""
+
+from __future__ import annotations
+
+import pytest
+
+pytest.importorskip("shapely")
+pytest.importorskip("ifcopenshell.geom")
+
+from benchmarks.bench_footprint_outline import reference_outline, synthetic_model  # noqa: E402
+from mesh_store import build_mesh_store  # noqa: E402
+from volume_compliance import _projected_outline_from_triangles  # noqa: E402
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+@pytest.mark.parametrize("origin", [(0.0, 0.0), (431000.0, 4581000.0)])
+def test_outline_matches_reference(seed, origin):
+    model = synthetic_model(grid=3, storeys=2, seed=seed, origin=origin)
+    store = build_mesh_store(model)
+    assert store is not None and len(store)
+    products = [model.by_id(int(pid)) for pid in store.product_ids]
+
+    bbox = store.bbox()
+    z_min, z_max = float(bbox[0, 2]), float(bbox[1, 2])
+    for lo, hi in ((None, None), (z_min - 0.05, z_min + 1.5), (z_max + 1.0, z_max + 2.0)):
+        expected = reference_outline(store, products, lo, hi)
+        assert _projected_outline_from_triangles(store, products, lo, hi) == expected
+
+
+def test_outline_of_no_products_is_none():
+    model = synthetic_model(grid=1, storeys=1, seed=0, origin=(0.0, 0.0))
+    store = build_mesh_store(model)
+    assert _projected_outline_from_triangles(store, [], None, None) is None
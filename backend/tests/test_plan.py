@@ -0,0 +1,83 @@
+"""Plan mode: same ridge numbers as the written envelope, and its output formats."""
+
+from __future__ import annotations
+
+import json
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("ifcopenshell")
+
+import footprint  # noqa: E402
+import plan_export  # noqa: E402
+from ifc_exporter import compute_envelope_plan, create_ifc_envelope, describe_envelope, parcel_footprint  # noqa: E402
+
+# L-shaped parcel at UTM-sized coordinates, longest edge along X
+PARCEL = [(431000.0, 4581000.0), (431024.0, 4581000.0), (431024.0, 4581012.0),
+          (431010.0, 4581012.0), (431010.0, 4581020.0), (431000.0, 4581020.0)]
+
+
+@pytest.mark.parametrize("depth_m", [None, 9.0])
+@pytest.mark.parametrize("max_rise_m", [None, 1.5])
+def test_plan_rises_match_envelope(depth_m, max_rise_m):
+    kwargs = dict(
+        footprint_points=PARCEL,
+        height=10.0,
+        depth_m=depth_m,
+        roof_slope_deg_real=30.0,
+        roof_slope_deg_virtual=60.0,
+        max_roof_rise_m=max_rise_m,
+    )
+    plan = compute_envelope_plan(**kwargs)
+    envelope = describe_envelope(**kwargs)
+    assert plan["ridge_rise_m"] == pytest.approx(envelope.ridge_rise, abs=1e-12)
+    assert plan["ridge_rise_virtual_m"] == pytest.approx(envelope.ridge_rise_virtual, abs=1e-12)
+    assert plan["footprint_xy"] == pytest.approx(envelope.footprint_xy)
+    if max_rise_m is not None:
+        assert plan["ridge_rise_m"] <= max_rise_m
+
+
+def test_plan_without_slopes_has_flat_roof():
+    plan = compute_envelope_plan(PARCEL, height=7.0)
+    assert plan["ridge_rise_m"] == 0.0
+    assert plan["ridge_rise_virtual_m"] == 0.0
+
+
+def test_shared_footprint_is_analysed_once(tmp_path, monkeypatch):
+    kwargs = dict(footprint_points=PARCEL, height=10.0, depth_m=9.0, roof_slope_deg_real=30.0, roof_slope_deg_virtual=60.0)
+    alone = describe_envelope(**kwargs)
+    create_ifc_envelope(zone_key="Z", out_path=str(tmp_path / "alone.ifc"), guid_seed="s", **kwargs)
+
+    created = []
+    init = footprint.FootprintAnalysis.__init__
+
+    def counting(self, points, street_segments=None):
+        created.append(len(points))
+        init(self, points, street_segments)
+
+    monkeypatch.setattr(footprint.FootprintAnalysis, "__init__", counting)
+    shared = parcel_footprint(PARCEL)
+    envelope = describe_envelope(footprint=shared, **kwargs)
+    create_ifc_envelope(zone_key="Z", out_path=str(tmp_path / "shared.ifc"), guid_seed="s", footprint=shared, **kwargs)
+    # The parcel and its depth clip, once each for both consumers
+    assert len(created) == 2
+    assert envelope == alone
+    assert (tmp_path / "shared.ifc").read_bytes() == (tmp_path / "alone.ifc").read_bytes()
+
+
+def test_plan_format_available(monkeypatch):
+    assert plan_export.plan_format_available("json")
+    monkeypatch.setattr(plan_export, "_HAS_PYARROW", False)
+    assert plan_export.plan_format_available("json")
+    assert not plan_export.plan_format_available("parquet")
+    with pytest.raises(RuntimeError):
+        plan_export.write_plan_rows([], "unused.parquet", "parquet")
+
+
+def test_write_plan_rows_json(tmp_path):
+    rows = [{"refcat": "A", "footprint_xy": [(0.0, 0.0), (1.0, 0.0), (1.0, 1.0)]}]
+    out = plan_export.write_plan_rows(rows, tmp_path / "plan.json", "json")
+    assert json.loads(open(out, encoding="utf-8").read())[0]["refcat"] == "A"
+    with pytest.raises(ValueError):
+        plan_export.write_plan_rows(rows, tmp_path / "plan.csv", "csv")
@@ -0,0 +1,153 @@
+"""Batch jobs end to end with a stubbed generator: retries and resume."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from cancellation import JobCancelled
+from cadastre_client import WfsUnavailableError
+from manifest import load_manifest, manifest_path
+
+
+@pytest.fixture
+def batch(main_module, job_store, tmp_path, monkeypatch):
+    """
+    run_job over a fixed refcat list with generate_one replaced by `plan`:
+    refcat -> list of outcomes per attempt (None writes the IFC, an
+    exception is raised). Returns (run, calls).
+    """
+    main = main_module
+    refcats = ["A", "B", "C", "D"]
+    hashes = {rc: f"hash-{rc}" for rc in refcats}
+    plan = {}
+    calls = []
+
+    def fake_generate_one(refcat, poum_gml_path, output_dir, municipality_slug, timer=None, token=None):
+        calls.append(refcat)
+        outcomes = plan.get(refcat) or [None]
+        outcome = outcomes.pop(0) if len(outcomes) > 1 else outcomes[0]
+        if outcome is not None:
+            raise outcome
+        out = Path(output_dir) / f"{municipality_slug}_{refcat}_Z_envelope.ifc"
+        out.write_text(f"ISO-10303-21; {refcat}")
+        return {"refcat": refcat, "zone": "Z", "ifc_path": str(out), "ifczip_path": None, "glb_path": None,
+                "skipped": False, "rule_sources": {}}
+
+    monkeypatch.setattr(main, "OUTPUT_DIR", tmp_path)
+    monkeypatch.setattr(main, "list_refcats_from_poum", lambda path: list(refcats))
+    monkeypatch.setattr(main, "compute_parcel_input_hashes", lambda rcs, path: {rc: hashes[rc] for rc in rcs})
+    monkeypatch.setattr(main, "generate_one", fake_generate_one)
+    for knob in ("REQUEST_DELAY", "CHUNK_DELAY", "RETRY_BACKOFF_S"):
+        monkeypatch.setattr(main, knob, 0.0)
+
+    def run(outcomes=None, **options):
+        plan.clear()
+        plan.update({rc: list(v) for rc, v in (outcomes or {}).items()})
+        calls.clear()
+        job = main.create_job("Malgrat de Mar", True, None, options=options)
+        main.run_job(job)
+        return job
+
+    run.tmp_path = tmp_path
+    run.hashes = hashes
+    return run, calls
+
+
+def test_transient_failure_recovers_in_retry_round(batch):
+    run, calls = batch
+    job = run({
+        "B": [WfsUnavailableError("HTML maintenance page"), None],
+        "C": [ValueError("Polygon has fewer than 3 vertices")],
+    })
+
+    assert job.status == "success"
+    # C fails once and is not retried; B is retried once and recovers
+    assert sorted(calls) == ["A", "B", "B", "C", "D"]
+    assert job.meta["retry_rounds"] == 1
+    assert job.meta["recovered"] == ["B"]
+    assert [(f["refcat"], f["kind"], f["attempts"]) for f in job.meta["hard_failures"]] == [("C", "deterministic", 1)]
+    assert "Recovered after retry: 1. Failed: 1" in job.message
+
+    manifest = load_manifest(manifest_path(run.tmp_path, "malgrat"), "malgrat")
+    assert sorted(manifest["parcels"]) == ["A", "B", "D"]
+
+
+def test_transient_failure_that_never_recovers_is_reported_as_transient(batch, main_module, monkeypatch):
+    monkeypatch.setattr(main_module, "RETRY_ROUNDS", 2)
+    run, calls = batch
+    job = run({"D": [TimeoutError("read timed out")]})
+
+    assert calls.count("D") == 3
+    assert job.meta["recovered"] == []
+    assert [(f["refcat"], f["kind"], f["attempts"]) for f in job.meta["hard_failures"]] == [("D", "transient", 3)]
+
+
+def _names(job):
+    return sorted(Path(f).name for f in job.files)
+
+
+def test_resume_carries_over_unchanged_parcels(batch):
+    run, calls = batch
+    first = run({"C": [JobCancelled("Job cancelled")]})
+
+    assert first.status == "cancelled"
+    assert calls == ["A", "B", "C"]
+
+    # B's inputs change after the interruption, so only A is carried over
+    run.hashes["B"] = "hash-B2"
+    resumed = run(resume_of=first.id)
+
+    assert resumed.status == "success"
+    assert calls == ["B", "C", "D"]
+    assert resumed.meta["resumed_from"] == first.id
+    assert resumed.meta["resumed_count"] == 1
+    assert _names(resumed) == [f"malgrat_{rc}_Z_envelope.ifc" for rc in "ABCD"]
+
+    manifest = load_manifest(manifest_path(run.tmp_path, "malgrat"), "malgrat")
+    assert {rc: e["input_hash"] for rc, e in manifest["parcels"].items()} == {
+        "A": "hash-A", "B": "hash-B2", "C": "hash-C", "D": "hash-D",
+    }
+
+
+def test_resume_regenerates_checkpointed_parcels_whose_output_is_gone(batch):
+    run, calls = batch
+    first = run({"C": [JobCancelled("Job cancelled")]})
+    (run.tmp_path / "malgrat_A_Z_envelope.ifc").unlink()
+
+    resumed = run(resume_of=first.id)
+
+    assert calls == ["A", "C", "D"]
+    assert resumed.meta["resumed_count"] == 1
+
+
+def test_resume_endpoint(batch, main_module, monkeypatch):
+    pytest.importorskip("httpx")
+    from fastapi.testclient import TestClient
+
+    main = main_module
+    run, calls = batch
+    client = TestClient(main.app)
+
+    def run_inline(job_id, fn, interactive=False):
+        fn()
+        return 0
+
+    monkeypatch.setattr(main.POOL, "submit", run_inline)
+
+    assert client.post("/jobs/missing/resume").status_code == 404
+    single = main.create_job("Malgrat de Mar", False, "A")
+    assert client.post(f"/jobs/{single.id}/resume").status_code == 400
+    done = run()
+    assert client.post(f"/jobs/{done.id}/resume").status_code == 409
+
+    first = run({"B": [JobCancelled("Job cancelled"), None]})
+    calls.clear()
+    resp = client.post(f"/jobs/{first.id}/resume")
+    assert resp.status_code == 200
+    resumed = main.get_job(resp.json()["job_id"])
+    assert resumed.options == {"incremental": False, "resume_of": first.id}
+    assert resumed.status == "success"
+    assert resumed.meta["resumed_count"] == 1
+    assert calls == ["B", "C", "D"]
@@ -0,0 +1,52 @@
+"""Per-process skeleton template vs building the skeleton per file."""
+
+from __future__ import annotations
+
+import pytest
+
+ifcopenshell = pytest.importorskip("ifcopenshell")
+
+import ifc_exporter  # noqa: E402
+from ifc_exporter import create_ifc_envelope  # noqa: E402
+
+SQUARE = [(431000.0, 4581000.0), (431012.0, 4581000.0), (431012.0, 4581015.0), (431000.0, 4581015.0)]
+
+
+def _export(path, zone_key, use_template, guid_seed=None):
+    create_ifc_envelope(
+        footprint_points=SQUARE, height=9.0, zone_key=zone_key, out_path=str(path),
+        roof_slope_deg_real=30.0, roof_slope_deg_virtual=60.0,
+        guid_seed=guid_seed, use_template=use_template,
+    )
+    return path
+
+
+def test_template_and_scratch_write_identical_files(tmp_path):
+    (tmp_path / "a").mkdir()
+    (tmp_path / "b").mkdir()
+    scratch = _export(tmp_path / "a" / "p.ifc", "13b/Z1", False, guid_seed="parcel|1")
+    cloned = _export(tmp_path / "b" / "p.ifc", "13b/Z1", True, guid_seed="parcel|1")
+    assert cloned.read_bytes() == scratch.read_bytes()
+
+
+def _guids(model):
+    return {e.GlobalId for e in model.by_type("IfcRoot")}
+
+
+def test_template_clones_are_independent(tmp_path, monkeypatch):
+    calls = []
+    instantiate = ifc_exporter._SKELETON.instantiate
+
+    def counting(zone_key):
+        calls.append(zone_key)
+        return instantiate(zone_key)
+
+    monkeypatch.setattr(ifc_exporter._SKELETON, "instantiate", counting)
+    first = ifcopenshell.open(str(_export(tmp_path / "one.ifc", "Z1", True)))
+    second = ifcopenshell.open(str(_export(tmp_path / "two.ifc", "Z2", True)))
+    assert calls == ["Z1", "Z2"]
+    assert first.by_type("IfcBuilding")[0].Name == "Building Zone Z1"
+    assert second.by_type("IfcBuilding")[0].Name == "Building Zone Z2"
+    # Without a seed every clone gets fresh GlobalIds
+    assert not _guids(first) & _guids(second)
+    assert len(first.by_type("IfcProject")) == len(first.by_type("IfcBuildingStorey")) == 1
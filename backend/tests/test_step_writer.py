@@ -0,0 +1,62 @@
+"""Direct STEP writer vs ifcopenshell: same entities, attributes and GlobalIds."""
+
+from __future__ import annotations
+
+import pytest
+
+ifcopenshell = pytest.importorskip("ifcopenshell")
+
+from benchmarks.bench_ifc_export import compare_files  # noqa: E402
+from ifc_exporter import create_ifc_envelope  # noqa: E402
+
+UTM = (431250.0, 4581730.0)
+PARCEL = [(UTM[0] + x, UTM[1] + y) for x, y in ((0.0, 0.0), (18.0, 1.5), (20.0, 14.0), (6.0, 22.0), (-2.0, 11.0))]
+STREETS = [{"segment": [PARCEL[0], PARCEL[1]], "street": 8.0, "length": 18.06}]
+METRICS = {"street_width_m": 8.0, "frontage_m": 18.06, "source": "test, àccent"}
+
+CASES = {
+    "flat": {"roof_slope_deg_real": None},
+    "ridge_brep": {"roof_slope_deg_real": 30.0, "roof_slope_deg_virtual": 60.0, "representation": "brep"},
+    "ridge_faceset": {"roof_slope_deg_real": 30.0, "roof_slope_deg_virtual": 60.0, "representation": "faceset"},
+    "depth_capped": {
+        "roof_slope_deg_real": 35.0, "roof_slope_deg_virtual": 45.0, "depth_m": 12.0, "max_roof_rise_m": 3.0,
+        "street_metrics": METRICS, "include_cadaster_ground": False,
+    },
+}
+
+
+def _export(tmp_path, name, writer, **overrides):
+    out = tmp_path / f"{name}_{writer}.ifc"
+    kwargs = dict(
+        footprint_points=PARCEL,
+        ground_footprint_points=PARCEL,
+        height=10.0,
+        zone_key="13b/Z1",
+        street_segments=STREETS,
+        guid_seed=f"parcel|{name}",
+    )
+    kwargs.update(overrides)
+    create_ifc_envelope(out_path=str(out), writer=writer, **kwargs)
+    return out
+
+
+@pytest.mark.parametrize("name", sorted(CASES))
+def test_step_writer_matches_ifcopenshell(tmp_path, name):
+    reference = _export(tmp_path, name, "ifcopenshell", **CASES[name])
+    candidate = _export(tmp_path, name, "step", **CASES[name])
+    assert compare_files(reference, candidate) == []
+
+    ref, cand = ifcopenshell.open(str(reference)), ifcopenshell.open(str(candidate))
+    assert cand.schema == "IFC4X3"
+    ref_guids = sorted((e.is_a(), e.GlobalId) for e in ref.by_type("IfcRoot"))
+    cand_guids = sorted((e.is_a(), e.GlobalId) for e in cand.by_type("IfcRoot"))
+    assert ref_guids == cand_guids
+    assert len(ref_guids) > 5
+
+
+def test_step_writer_is_deterministic(tmp_path):
+    (tmp_path / "a").mkdir()
+    (tmp_path / "b").mkdir()
+    first = _export(tmp_path / "a", "ridge", "step", **CASES["ridge_faceset"])
+    second = _export(tmp_path / "b", "ridge", "step", **CASES["ridge_faceset"])
+    assert first.read_bytes() == second.read_bytes()
@@ -0,0 +1,62 @@
+"""Stage timers, per-job summaries and the process-wide window."""
+
+from __future__ import annotations
+
+import timing
+from timing import StageTimer, summarize_stage_timings, timed_stage
+
+
+def test_stage_timer_accumulates_and_reports_total():
+    seen = []
+    timer = StageTimer(on_stage=seen.append)
+    with timer.stage("wfs_fetch"):
+        pass
+    with timer.stage("wfs_fetch"):
+        pass
+    with timed_stage(timer, "ifc_write"):
+        pass
+    out = timer.as_dict()
+    assert seen == ["wfs_fetch", "wfs_fetch", "ifc_write"]
+    assert set(out) == {"wfs_fetch", "ifc_write", "total"}
+    assert out["total"] >= out["wfs_fetch"] >= 0.0
+
+
+def test_stage_records_time_even_when_the_stage_raises():
+    timer = StageTimer()
+    try:
+        with timer.stage("ifc_build"):
+            raise ValueError("boom")
+    except ValueError:
+        pass
+    assert "ifc_build" in timer.as_dict()
+
+
+def test_timed_stage_without_timer_is_a_no_op():
+    with timed_stage(None, "ifc_build"):
+        pass
+
+
+def test_summarize_ignores_non_numeric_fields():
+    records = [{"refcat": f"R{i}", "status": "ok", "total": float(i), "flag": True} for i in range(1, 101)]
+    summary = summarize_stage_timings(records)
+    assert set(summary) == {"total"}
+    total = summary["total"]
+    assert total["count"] == 100
+    assert total["total"] == 5050.0
+    assert total["p50"] == 50.0
+    assert total["p95"] == 95.0
+    assert total["max"] == 100.0
+    assert summarize_stage_timings([]) == {}
+
+
+def test_process_window_is_bounded(monkeypatch):
+    monkeypatch.setattr(timing, "_WINDOW", {})
+    monkeypatch.setattr(timing, "_TOTALS", {})
+    monkeypatch.setattr(timing, "_WINDOW_SIZE", 10)
+    for i in range(25):
+        timing.record_stage_timings({"ifc_write": float(i)})
+    summary = timing.process_stage_summary()["ifc_write"]
+    assert summary["count"] == 25
+    assert summary["sum"] == float(sum(range(25)))
+    assert summary["max"] == 24.0
+    assert len(timing._WINDOW["ifc_write"]) == 10
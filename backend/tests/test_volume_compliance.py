@@ -0,0 +1,82 @@
+"""Bounding boxes and ground-storey vertices of uploaded IFCs for the compliance check."""
+
+from __future__ import annotations
+
+import pytest
+
+ifcopenshell = pytest.importorskip("ifcopenshell")
+pytest.importorskip("ifcopenshell.geom")
+
+import volume_compliance  # noqa: E402
+from ifc_exporter import create_ifc_envelope  # noqa: E402
+
+SQUARE = [(0.0, 0.0), (10.0, 0.0), (10.0, 10.0), (0.0, 10.0)]
+
+
+def _add_curve_only_product(model, x: float):
+    """A proxy whose only representation is a 3D polyline: no mesh, raw points only."""
+    context = model.by_type("IfcGeometricRepresentationContext")[0]
+    line = model.create_entity(
+        "IfcPolyline",
+        Points=[model.create_entity("IfcCartesianPoint", Coordinates=c) for c in ((x, 0.0, 0.0), (x, 1.0, 25.0))],
+    )
+    shape = model.create_entity(
+        "IfcShapeRepresentation",
+        ContextOfItems=context,
+        RepresentationIdentifier="Axis",
+        RepresentationType="Curve3D",
+        Items=[line],
+    )
+    return model.create_entity(
+        "IfcBuildingElementProxy",
+        GlobalId=ifcopenshell.guid.new(),
+        Name="survey line",
+        Representation=model.create_entity("IfcProductDefinitionShape", Representations=[shape]),
+    )
+
+
+def test_bbox_includes_products_without_a_mesh(tmp_path):
+    path = tmp_path / "upload.ifc"
+    create_ifc_envelope(footprint_points=SQUARE, height=6.0, zone_key="Z1", out_path=str(path))
+    model = ifcopenshell.open(str(path))
+    _add_curve_only_product(model, 40.0)
+    model.write(str(path))
+
+    store = volume_compliance._mesh_store(path)
+    assert store is not None and len(store)
+    assert float(store.bbox()[1, 0]) < 40.0   # the polyline is not tessellated
+
+    bbox = volume_compliance._bbox_from_ifc(path)
+    assert bbox.max_x == pytest.approx(40.0)
+    assert bbox.max_z == pytest.approx(25.0)
+    assert bbox.min_x == pytest.approx(0.0, abs=1e-6)
+    assert bbox.sampled_vertices > len(store.verts)
+
+
+def _sorted_rows(points):
+    return sorted(map(tuple, points.round(6).tolist()))
+
+
+def test_storey_points_use_the_store_storey_column(tmp_path):
+    path = tmp_path / "upload.ifc"
+    create_ifc_envelope(footprint_points=SQUARE, height=6.0, zone_key="Z1", out_path=str(path))
+    model = ifcopenshell.open(str(path))
+    storey = model.by_type("IfcBuildingStorey")[0]
+    survey = _add_curve_only_product(model, 40.0)
+    storey.ContainsElements[0].RelatedElements = list(storey.ContainsElements[0].RelatedElements) + [survey]
+    model.write(str(path))
+    model = ifcopenshell.open(str(path))
+    storey = model.by_type("IfcBuildingStorey")[0]
+
+    store = volume_compliance._mesh_store(path)
+    assert len(store.storey_rows(storey.id())) == len(store)
+    products = list(volume_compliance._iter_storey_products(storey))
+    expected = volume_compliance._product_points(model, store, products)
+    points = volume_compliance._storey_points(model, store, storey)
+    assert _sorted_rows(points) == _sorted_rows(expected)
+    assert points[:, 0].max() == pytest.approx(40.0)   # the unmeshed survey line
+
+    kept = [p for p in products if p.ObjectType != "CADASTER_GROUND"]
+    assert len(kept) == len(products) - 1
+    points = volume_compliance._storey_points(model, store, storey, {"CADASTER_GROUND"})
+    assert _sorted_rows(points) == _sorted_rows(volume_compliance._product_points(model, store, kept))
@@ -0,0 +1,90 @@
+"""Bounded worker pool: queue bound, priorities and reserved interactive workers."""
+
+from __future__ import annotations
+
+import threading
+
+import pytest
+
+from worker_pool import QueueFullError, WorkerPool
+
+TIMEOUT = 5.0
+
+
+def _blocker():
+    """A job function that runs until released, plus its started/release events."""
+    started, release = threading.Event(), threading.Event()
+
+    def fn():
+        started.set()
+        release.wait(TIMEOUT)
+
+    return fn, started, release
+
+
+def test_queue_bound_and_positions():
+    pool = WorkerPool(workers=1, max_queued=2, reserved_interactive=0)
+    fn, started, release = _blocker()
+    try:
+        pool.submit("running", fn)
+        assert started.wait(TIMEOUT)
+        assert pool.submit("b1", lambda: None) == 1
+        assert pool.submit("i1", lambda: None, interactive=True) == 1
+        assert pool.position("b1") == 2
+        with pytest.raises(QueueFullError):
+            pool.submit("b2", lambda: None)
+        assert pool.remove("b1") is True
+        assert pool.remove("b1") is False
+        assert pool.position("b1") is None
+    finally:
+        release.set()
+
+
+def test_interactive_jobs_run_before_queued_batches():
+    pool = WorkerPool(workers=1, max_queued=10, reserved_interactive=0)
+    fn, started, release = _blocker()
+    order = []
+    done = threading.Event()
+    pool.submit("running", fn)
+    assert started.wait(TIMEOUT)
+    pool.submit("b1", lambda: order.append("b1"))
+    pool.submit("b2", lambda: (order.append("b2"), done.set()))
+    pool.submit("i1", lambda: order.append("i1"), interactive=True)
+    release.set()
+    assert done.wait(TIMEOUT)
+    assert order == ["i1", "b1", "b2"]
+
+
+def test_reserved_worker_keeps_batches_from_filling_the_pool():
+    pool = WorkerPool(workers=2, max_queued=10, reserved_interactive=1)
+    batch_fn, batch_started, batch_release = _blocker()
+    second_batch_ran = threading.Event()
+    single_ran = threading.Event()
+    try:
+        pool.submit("batch-1", batch_fn)
+        assert batch_started.wait(TIMEOUT)
+        pool.submit("batch-2", second_batch_ran.set)
+        assert not second_batch_ran.wait(0.2)  # second worker is reserved
+        pool.submit("single", single_ran.set, interactive=True)
+        assert single_ran.wait(TIMEOUT)
+        assert pool.stats()["running_batches"] == 1
+    finally:
+        batch_release.set()
+    assert second_batch_ran.wait(TIMEOUT)
+
+
+def test_crashing_job_does_not_kill_the_worker():
+    pool = WorkerPool(workers=1, max_queued=5, reserved_interactive=0)
+    ran = threading.Event()
+
+    def boom():
+        raise RuntimeError("crash")
+
+    pool.submit("crash", boom)
+    pool.submit("next", ran.set)
+    assert ran.wait(TIMEOUT)
+
+
+def test_at_least_one_worker_runs_batches():
+    assert WorkerPool(workers=1, reserved_interactive=3).reserved_interactive == 0
+    assert WorkerPool(workers=3, reserved_interactive=5).reserved_interactive == 2
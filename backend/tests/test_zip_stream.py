@@ -0,0 +1,75 @@
+"""Streaming ZIP archives: contents, names, compression and chunking."""
+
+from __future__ import annotations
+
+import io
+import zipfile
+
+import zip_stream
+from zip_stream import iter_zip
+
+
+def _archive(chunks):
+    return zipfile.ZipFile(io.BytesIO(b"".join(chunks)))
+
+
+def test_round_trip_stored_and_deflated(tmp_path):
+    a = tmp_path / "a.ifc"
+    b = tmp_path / "b.glb"
+    a.write_bytes(b"ISO-10303-21;\n" * 1000)
+    b.write_bytes(bytes(range(256)) * 10)
+
+    for deflate, method in ((False, zipfile.ZIP_STORED), (True, zipfile.ZIP_DEFLATED)):
+        with _archive(iter_zip([str(a), str(b)], deflate=deflate)) as zf:
+            assert zf.testzip() is None
+            assert zf.namelist() == ["a.ifc", "b.glb"]
+            assert zf.read("a.ifc") == a.read_bytes()
+            assert zf.read("b.glb") == b.read_bytes()
+            assert {i.compress_type for i in zf.infolist()} == {method}
+
+
+def test_duplicate_names_are_suffixed_and_missing_files_skipped(tmp_path):
+    (tmp_path / "x").mkdir()
+    first = tmp_path / "env.ifc"
+    second = tmp_path / "x" / "env.ifc"
+    first.write_bytes(b"first")
+    second.write_bytes(b"second")
+
+    with _archive(iter_zip([first, tmp_path / "gone.ifc", second, tmp_path / "x"])) as zf:
+        assert zf.namelist() == ["env.ifc", "env_2.ifc"]
+        assert zf.read("env.ifc") == b"first"
+        assert zf.read("env_2.ifc") == b"second"
+
+
+def test_empty_archive_is_valid():
+    with _archive(iter_zip([])) as zf:
+        assert zf.namelist() == []
+
+
+def test_large_entries_are_yielded_in_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(zip_stream, "CHUNK_SIZE", 4096)
+    big = tmp_path / "big.ifc"
+    big.write_bytes(bytes(range(256)) * 256)  # 64 KiB, 16 reads
+
+    chunks = list(iter_zip([big]))
+    assert len(chunks) > 16
+    assert max(len(c) for c in chunks) < 3 * 4096
+    with _archive(chunks) as zf:
+        info = zf.getinfo("big.ifc")
+        assert info.file_size == big.stat().st_size
+        assert zf.read("big.ifc") == big.read_bytes()
+
+
+def test_first_chunk_arrives_before_later_files_are_read(tmp_path):
+    a = tmp_path / "a.ifc"
+    a.write_bytes(b"a" * 100)
+    later = tmp_path / "later.ifc"
+
+    stream = iter_zip([a, later])
+    chunks = [next(stream)]
+    # The second file is only looked at once the stream gets that far
+    later.write_bytes(b"written while streaming")
+    chunks.extend(stream)
+    with _archive(chunks) as zf:
+        assert zf.read("a.ifc") == b"a" * 100
+        assert zf.read("later.ifc") == b"written while streaming"
@@ -0,0 +1,150 @@
+"""
+Per-stage timing instrumentation for envelope generation.
+
+Responsibilities
+----------------
+- Measure wall-clock time of named pipeline stages (POUM lookup, WFS fetch,
+  CRS transform, rule resolution, IFC build, IFC write, ...).
+- Summarize many per-parcel records into p50/p95/max per stage.
+- Keep a process-wide rolling window of stage durations for metrics.
+
+Notes
+-----
+- A StageTimer belongs to one parcel and one thread; it is not thread-safe.
+- The process-wide window is bounded, so memory stays constant.
+"""
+
+from __future__ import annotations
+
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional
+import math
+import threading
+import time
+
+STAGES = (
+    "poum_lookup",
+    "preprocess_load",
+    "wfs_fetch",
+    "crs_transform",
+    "rule_resolution",
+    "ifc_build",
+    "ifc_write",
+    "glb_write",
+    "normalize_output",
+    "compress_output",
+)
+
+
+class StageTimer:
+    """
+    Accumulates durations (seconds) per stage name for a single parcel.
+    Re-entering a stage adds to its total (e.g. two WFS calls).
+    `on_stage` is called with the stage name whenever a stage starts.
+    """
+
+    def __init__(self, on_stage: Optional[Callable[[str], None]] = None) -> None:
+        self.started_at = time.perf_counter()
+        self.durations: Dict[str, float] = {}
+        self.on_stage = on_stage
+
+    @contextmanager
+    def stage(self, name: str):
+        if self.on_stage is not None:
+            self.on_stage(name)
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.durations[name] = self.durations.get(name, 0.0) + (time.perf_counter() - t0)
+
+    def as_dict(self) -> Dict[str, float]:
+        """Return stage durations plus `total` (time since the timer was created)."""
+        # list() snapshots the dict atomically; an abandoned (timed-out) parcel
+        # thread may still be adding stages
+        out = {k: round(v, 6) for k, v in list(self.durations.items())}
+        out["total"] = round(time.perf_counter() - self.started_at, 6)
+        return out
+
+
+def timed_stage(timer: Optional[StageTimer], name: str):
+    """Context manager that times `name` on `timer`, or does nothing if timer is None."""
+    if timer is None:
+        return nullcontext()
+    return timer.stage(name)
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, int(math.ceil(q * len(sorted_values))) - 1))
+    return float(sorted_values[k])
+
+
+def summarize_stage_timings(records: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    """
+    Aggregate per-parcel timing records into {stage: {count, total, p50, p95, max}}.
+    Non-numeric fields (refcat, status) are ignored.
+    """
+    per_stage: Dict[str, List[float]] = {}
+    for rec in records:
+        for key, value in rec.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            per_stage.setdefault(key, []).append(float(value))
+
+    summary: Dict[str, Dict[str, float]] = {}
+    for stage, values in per_stage.items():
+        values.sort()
+        summary[stage] = {
+            "count": len(values),
+            "total": round(sum(values), 6),
+            "p50": round(_percentile(values, 0.50), 6),
+            "p95": round(_percentile(values, 0.95), 6),
+            "max": round(values[-1], 6),
+        }
+    return summary
+
+
+# -----------------------------------------------------------------------------
+# Process-wide rolling window (feeds the metrics endpoint)
+# -----------------------------------------------------------------------------
+
+_WINDOW_SIZE = 2000
+_LOCK = threading.Lock()
+_WINDOW: Dict[str, Deque[float]] = {}
+_TOTALS: Dict[str, List[float]] = {}   # stage -> [count, sum]
+
+
+def record_stage_timings(durations: Dict[str, float]) -> None:
+    """Add one parcel's stage durations to the process-wide statistics."""
+    with _LOCK:
+        for stage, seconds in durations.items():
+            _WINDOW.setdefault(stage, deque(maxlen=_WINDOW_SIZE)).append(float(seconds))
+            tot = _TOTALS.setdefault(stage, [0.0, 0.0])
+            tot[0] += 1
+            tot[1] += float(seconds)
+
+
+def process_stage_summary() -> Dict[str, Dict[str, float]]:
+    """
+    Return {stage: {count, sum, p50, p95, max}} where count/sum are lifetime
+    totals and the percentiles cover the most recent window.
+    """
+    with _LOCK:
+        snapshot = {stage: sorted(values) for stage, values in _WINDOW.items()}
+        totals = {stage: list(v) for stage, v in _TOTALS.items()}
+
+    out: Dict[str, Dict[str, float]] = {}
+    for stage, values in snapshot.items():
+        count, total = totals.get(stage, [0.0, 0.0])
+        out[stage] = {
+            "count": int(count),
+            "sum": round(total, 6),
+            "p50": round(_percentile(values, 0.50), 6),
+            "p95": round(_percentile(values, 0.95), 6),
+            "max": round(values[-1], 6) if values else 0.0,
+        }
+    return out
@@ -3,6 +3,7 @@ from __future__ import annotations
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Any, Dict, Optional
+import logging
 import math
 
 import numpy as np
@@ -21,9 +22,24 @@ try:
 except Exception:  # pragma: no cover
     _HAS_SHAPELY = False
 
+try:
+    # shapely >= 2: array-at-once polygon construction and union
+    from shapely import polygons as _sh_polygons, union_all as _sh_union_all  # type: ignore
+except Exception:  # pragma: no cover - shapely 1.x
+    _sh_polygons = None  # type: ignore
+    _sh_union_all = None  # type: ignore
+
+# Projected triangles below this area (m2) are dropped from footprint outlines
+_MIN_TRIANGLE_AREA_M2 = 1e-9
+
 from config import POUM_GML_PATH, OUTPUT_DIR
 from pipeline import generate_one
-from ifc_exporter import convex_hull, polygon_intersection
+from footprint import FootprintAnalysis
+from ifc_cache import derived as ifc_derived, open_ifc
+from mesh_store import MeshStore, build_mesh_store
+from ifc_exporter import EnvelopeGeometry, convex_hull, polygon_intersection
+
+logger = logging.getLogger(__name__)
 
 
 @dataclass
@@ -113,6 +129,10 @@ def _collect_points(obj: Any, out: list[tuple[float, float, float]], visited: se
             z = float(coords[2]) if len(coords) >= 3 else 0.0
             out.append((x, y, z))
             return
+        if obj.is_a("IfcCartesianPointList3D"):
+            for c in getattr(obj, "CoordList", None) or []:
+                out.append((float(c[0]), float(c[1]), float(c[2]) if len(c) >= 3 else 0.0))
+            return
     except Exception:
         return
 
@@ -120,6 +140,20 @@ def _collect_points(obj: Any, out: list[tuple[float, float, float]], visited: se
         _collect_points(child, out, visited)
 
 
+def _iter_face_coords(item: Any):
+    """Yield the local coordinates of each face loop of a FacetedBrep or PolygonalFaceSet."""
+    if item.is_a("IfcFacetedBrep"):
+        for face in item.Outer.CfsFaces:
+            for bound in face.Bounds:
+                loop = bound.Bound
+                if hasattr(loop, "Polygon"):
+                    yield [pt.Coordinates for pt in loop.Polygon]
+    elif item.is_a("IfcPolygonalFaceSet"):
+        coords = item.Coordinates.CoordList
+        for face in item.Faces:
+            yield [coords[i - 1] for i in face.CoordIndex]
+
+
 def _extract_world_vertices(
     model: ifcopenshell.file,
     products: Optional[list[Any]] = None,
@@ -160,6 +194,29 @@ def _extract_world_vertices(
     return world_points
 
 
+def _mesh_store(path: Path) -> Optional[MeshStore]:
+    """Tessellated products of `path` (one geom.iterator pass per parsed model), or None."""
+    if _ifc_geom is None:
+        return None
+    try:
+        return ifc_derived(path, "mesh_store", build_mesh_store)
+    except Exception:
+        return None
+
+
+def _product_points(model: ifcopenshell.file, store: Optional[MeshStore], products: list[Any]) -> np.ndarray:
+    """
+    (N, 3) world vertices of `products`: tessellated vertices from `store`
+    where available, raw IfcCartesianPoints for the rest (all of them
+    without a store).
+    """
+    rest = products if store is None else [p for p in products if p.id() not in store.row_of]
+    parts = [np.asarray(_extract_world_vertices(model, rest), dtype=float).reshape(-1, 3)] if rest else []
+    if store is not None:
+        parts.append(store.vertices(store.rows(p.id() for p in products)))
+    return np.concatenate(parts) if parts else np.zeros((0, 3))
+
+
 def _bbox_from_points(points: list[tuple[float, float, float]]) -> BBox3D:
     if not points:
         raise RuntimeError("No points available to compute bounding box.")
@@ -183,15 +240,7 @@ def _bbox_from_points(points: list[tuple[float, float, float]]) -> BBox3D:
 
 
 def _polygon_area(points_xy: list[tuple[float, float]]) -> float:
-    if len(points_xy) < 3:
-        return 0.0
-    area2 = 0.0
-    n = len(points_xy)
-    for i in range(n):
-        x1, y1 = points_xy[i]
-        x2, y2 = points_xy[(i + 1) % n]
-        area2 += (x1 * y2 - x2 * y1)
-    return abs(0.5 * area2)
+    return FootprintAnalysis(points_xy).area
 
 
 def _iter_storey_products(storey: Any):
@@ -201,6 +250,32 @@ def _iter_storey_products(storey: Any):
             yield el
 
 
+def _storey_points(
+    model: ifcopenshell.file,
+    store: Optional[MeshStore],
+    storey: Any,
+    exclude_object_types: set[str] | None = None,
+) -> np.ndarray:
+    """
+    (N, 3) world vertices of the products contained in `storey`: meshed
+    products come straight from the store's storey column, the rest from
+    the raw IfcCartesianPoint walk.
+    """
+    products = list(_iter_storey_products(storey))
+    excluded = {p.id() for p in products
+                if exclude_object_types and str(getattr(p, "ObjectType", "") or "").upper() in exclude_object_types}
+    if store is None:
+        return _product_points(model, None, [p for p in products if p.id() not in excluded])
+
+    rows = store.storey_rows(storey.id())
+    if excluded:
+        rows = rows[~np.isin(store.product_ids[rows], list(excluded))]
+    rest = [p for p in products if p.id() not in store.row_of and p.id() not in excluded]
+    parts = [_product_points(model, None, rest)] if rest else []
+    parts.append(store.vertices(rows))
+    return np.concatenate(parts)
+
+
 def _pick_ground_storey(model: ifcopenshell.file) -> Optional[Any]:
     storeys = list(model.by_type("IfcBuildingStorey"))
     if not storeys:
@@ -266,6 +341,11 @@ def _find_first_extrusion(node: Any) -> Any:
 
 
 def _extract_envelope_profile_footprint(path: Path) -> Optional[Dict[str, Any]]:
+    """Base footprint of the BUILDING_ENVELOPE element of `path` (cached per parsed model)."""
+    return ifc_derived(path, "envelope_profile_footprint", _envelope_profile_footprint)
+
+
+def _envelope_profile_footprint(model: ifcopenshell.file) -> Optional[Dict[str, Any]]:
     """Extract the base footprint polygon from a BUILDING_ENVELOPE element.
 
     Handles two geometry cases:
@@ -276,8 +356,6 @@ def _extract_envelope_profile_footprint(path: Path) -> Optional[Dict[str, Any]]:
     suitable geometry is found. This avoids the convex-hull contamination from
     hip-roof CSG clipping planes or concave bottom-face expansion.
     """
-    model = ifcopenshell.open(str(path))
-
     envelope_product = None
     for p in model.by_type("IfcBuildingElementProxy"):
         if str(getattr(p, "ObjectType", "") or "").upper() == "BUILDING_ENVELOPE":
@@ -346,39 +424,38 @@ def _extract_envelope_profile_footprint(path: Path) -> Optional[Dict[str, Any]]:
                     world_xy.append((float(wp[0]), float(wp[1])))
                 method_label = "BUILDING_ENVELOPE extrusion profile"
 
-    # --- Strategy 2: FacetedBrep → extract the lowest horizontal face ---
+    # --- Strategy 2: FacetedBrep / PolygonalFaceSet → lowest horizontal face ---
     if not world_xy:
         for sub_rep in rep.Representations:
             for item in sub_rep.Items:
-                if not item.is_a("IfcFacetedBrep"):
+                if item.is_a("IfcFacetedBrep"):
+                    kind = "FacetedBrep"
+                elif item.is_a("IfcPolygonalFaceSet"):
+                    kind = "PolygonalFaceSet"
+                else:
                     continue
                 best_face_pts: list[tuple[float, float]] = []
                 best_face_z = float("inf")
-                for face in item.Outer.CfsFaces:
-                    for bound in face.Bounds:
-                        loop = bound.Bound
-                        if not hasattr(loop, "Polygon"):
-                            continue
-                        pts_3d = []
-                        for pt in loop.Polygon:
-                            c = pt.Coordinates
-                            lx = float(c[0]) if len(c) >= 1 else 0.0
-                            ly = float(c[1]) if len(c) >= 2 else 0.0
-                            lz = float(c[2]) if len(c) >= 3 else 0.0
-                            wp = matrix @ np.array([lx, ly, lz, 1.0])
-                            pts_3d.append((float(wp[0]), float(wp[1]), float(wp[2])))
-                        if len(pts_3d) < 3:
-                            continue
-                        zs = [p[2] for p in pts_3d]
-                        z_range = max(zs) - min(zs)
-                        avg_z = sum(zs) / len(zs)
-                        # Horizontal face at or near the lowest Z
-                        if z_range < 0.01 and avg_z < best_face_z:
-                            best_face_z = avg_z
-                            best_face_pts = [(p[0], p[1]) for p in pts_3d]
+                for face_coords in _iter_face_coords(item):
+                    pts_3d = []
+                    for c in face_coords:
+                        lx = float(c[0]) if len(c) >= 1 else 0.0
+                        ly = float(c[1]) if len(c) >= 2 else 0.0
+                        lz = float(c[2]) if len(c) >= 3 else 0.0
+                        wp = matrix @ np.array([lx, ly, lz, 1.0])
+                        pts_3d.append((float(wp[0]), float(wp[1]), float(wp[2])))
+                    if len(pts_3d) < 3:
+                        continue
+                    zs = [p[2] for p in pts_3d]
+                    z_range = max(zs) - min(zs)
+                    avg_z = sum(zs) / len(zs)
+                    # Horizontal face at or near the lowest Z
+                    if z_range < 0.01 and avg_z < best_face_z:
+                        best_face_z = avg_z
+                        best_face_pts = [(p[0], p[1]) for p in pts_3d]
                 if best_face_pts and len(best_face_pts) >= 3:
                     world_xy = best_face_pts
-                    method_label = "BUILDING_ENVELOPE FacetedBrep bottom face"
+                    method_label = f"BUILDING_ENVELOPE {kind} bottom face"
                     break
             if world_xy:
                 break
@@ -418,71 +495,44 @@ def _extract_envelope_profile_footprint(path: Path) -> Optional[Dict[str, Any]]:
 
 
 def _projected_outline_from_triangles(
-    model: ifcopenshell.file,
+    store: Optional[MeshStore],
     products: list[Any],
     z_min: Optional[float] = None,
     z_max: Optional[float] = None,
 ) -> Optional[list[tuple[float, float]]]:
     """
     Build the true (possibly non-convex) XY outline of the given products by
-    tessellating their geometry and unioning the projected triangles.
+    unioning the projections of their triangles in the model's mesh store.
 
-    Returns the exterior ring of the unioned polygon, or None when the geometry
-    kernel / shapely is unavailable or no usable triangles were produced.
+    Returns the exterior ring of the unioned polygon, or None when there is no
+    mesh store / shapely or no usable triangles were produced.
+
+    Filtering runs on the whole triangle array at once: the centroid z-band,
+    then the projected area, which drops the degenerate (vertical-face and
+    collapsed) triangles that are invalid as polygons. The remaining
+    triangles are all valid and are built and unioned in one shapely call.
     """
-    if _ifc_geom is None or not _HAS_SHAPELY or not products:
+    if store is None or not _HAS_SHAPELY or not products:
         return None
 
-    settings = _ifc_geom.settings()
-    try:
-        settings.set(settings.USE_WORLD_COORDS, True)
-    except Exception:
-        try:
-            settings.set("use-world-coords", True)
-        except Exception:
-            pass
-
-    triangles_2d: list[_ShPolygon] = []
-    for product in products:
-        if getattr(product, "Representation", None) is None:
-            continue
-        try:
-            shape = _ifc_geom.create_shape(settings, product)
-        except Exception:
-            continue
-        try:
-            geom = shape.geometry
-            verts = np.asarray(geom.verts, dtype=float).reshape(-1, 3)
-            faces = np.asarray(geom.faces, dtype=int).reshape(-1, 3)
-        except Exception:
-            continue
-        if verts.size == 0 or faces.size == 0:
-            continue
-        for tri in faces:
-            p0, p1, p2 = verts[tri[0]], verts[tri[1]], verts[tri[2]]
-            if z_min is not None and z_max is not None:
-                # Keep triangles whose centroid is within the requested z-band.
-                cz = (p0[2] + p1[2] + p2[2]) / 3.0
-                if cz < z_min or cz > z_max:
-                    continue
-            ring = [(float(p0[0]), float(p0[1])),
-                    (float(p1[0]), float(p1[1])),
-                    (float(p2[0]), float(p2[1]))]
-            try:
-                poly = _ShPolygon(ring)
-                if not poly.is_valid:
-                    poly = poly.buffer(0)
-                if poly.is_empty or poly.area < 1e-9:
-                    continue
-                triangles_2d.append(poly)
-            except Exception:
-                continue
-
-    if not triangles_2d:
+    tris = store.triangles(store.rows(p.id() for p in products))
+    if z_min is not None and z_max is not None:
+        # Keep triangles whose centroid is within the requested z-band.
+        cz = (tris[:, 0, 2] + tris[:, 1, 2] + tris[:, 2, 2]) / 3.0
+        tris = tris[(cz >= z_min) & (cz <= z_max)]
+    xy = tris[:, :, :2]
+    e1 = xy[:, 1] - xy[:, 0]
+    e2 = xy[:, 2] - xy[:, 0]
+    area = 0.5 * np.abs(e1[:, 0] * e2[:, 1] - e1[:, 1] * e2[:, 0])
+    xy = np.ascontiguousarray(xy[area >= _MIN_TRIANGLE_AREA_M2])
+    if not len(xy):
         return None
 
     try:
-        merged = _sh_unary_union(triangles_2d)
+        if _sh_polygons is not None:
+            merged = _sh_union_all(_sh_polygons(xy))
+        else:
+            merged = _sh_unary_union([_ShPolygon(t) for t in xy.tolist()])
     except Exception:
         return None
 
@@ -516,7 +566,16 @@ def _projected_outline_from_triangles(
 
 
 def _build_ground_perimeter_temp_volume(path: Path, exclude_object_types: set[str] | None = None) -> Dict[str, Any]:
-    model = ifcopenshell.open(str(path))
+    """Ground-floor perimeter volume of `path` (cached per parsed model and exclusion set)."""
+    key = ("ground_perimeter_temp_volume", frozenset(exclude_object_types or ()))
+    return ifc_derived(path, key, lambda model: _ground_perimeter_temp_volume(model, path, exclude_object_types))
+
+
+def _ground_perimeter_temp_volume(
+    model: ifcopenshell.file,
+    path: Path,
+    exclude_object_types: set[str] | None = None,
+) -> Dict[str, Any]:
     warnings: list[str] = []
 
     # Filter out excluded ObjectTypes (e.g. CADASTER_GROUND)
@@ -527,42 +586,38 @@ def _build_ground_perimeter_temp_volume(path: Path, exclude_object_types: set[st
         if filtered:
             all_products = filtered
 
-    all_points = _extract_world_vertices(model, all_products)
-    if not all_points:
+    store = _mesh_store(path)
+    all_points = _product_points(model, store, all_products)
+    if not len(all_points):
         raise RuntimeError(f"No geometric vertices could be extracted from IFC: {path}")
 
     ground_storey = _pick_ground_storey(model)
     ground_storey_name = str(getattr(ground_storey, "Name", "")) if ground_storey is not None else None
 
-    storey_points: list[tuple[float, float, float]] = []
+    storey_points = np.zeros((0, 3))
     if ground_storey is not None:
-        storey_products = list(_iter_storey_products(ground_storey))
-        if exclude_object_types and storey_products:
-            storey_products = [p for p in storey_products
-                               if str(getattr(p, "ObjectType", "") or "").upper() not in exclude_object_types]
-        if storey_products:
-            storey_points = _extract_world_vertices(model, storey_products)
-
-    if not storey_points:
-        all_min_z = min(p[2] for p in all_points)
+        storey_points = _storey_points(model, store, ground_storey, exclude_object_types)
+
+    if not len(storey_points):
+        all_min_z = all_points[:, 2].min()
         z_band_m = 0.60
-        storey_points = [p for p in all_points if p[2] <= all_min_z + z_band_m]
+        storey_points = all_points[all_points[:, 2] <= all_min_z + z_band_m]
         warnings.append("Ground-storey relations were not found; used lowest-z band fallback for footprint extraction.")
 
     if len(storey_points) < 3:
         raise RuntimeError("Ground-floor perimeter extraction failed: insufficient vertices.")
 
     main_products = [p for p in model.by_type("IfcProduct") if _is_main_building_product(p)]
-    main_points = _extract_world_vertices(model, main_products) if main_products else []
-    if not main_points:
+    main_points = _product_points(model, store, main_products) if main_products else np.zeros((0, 3))
+    if not len(main_points):
         main_points = all_points
         warnings.append("Main-building product filtering yielded no vertices; using all IFC product vertices for height.")
 
-    z_min = min(p[2] for p in storey_points)
-    z_max = max(p[2] for p in main_points)
+    z_min = float(storey_points[:, 2].min())
+    z_max = float(main_points[:, 2].max())
     if z_max <= z_min:
-        z_min = min(p[2] for p in all_points)
-        z_max = max(p[2] for p in all_points)
+        z_min = float(all_points[:, 2].min())
+        z_max = float(all_points[:, 2].max())
 
     height = max(0.0, z_max - z_min)
     if height <= 0.0:
@@ -576,7 +631,7 @@ def _build_ground_perimeter_temp_volume(path: Path, exclude_object_types: set[st
     outline_products = main_products or all_products
     try:
         outline = _projected_outline_from_triangles(
-            model, outline_products, z_min=z_min - 0.05, z_max=band_top
+            store, outline_products, z_min=z_min - 0.05, z_max=band_top
         )
         if outline and len(outline) >= 3:
             footprint_hull = outline
@@ -589,7 +644,7 @@ def _build_ground_perimeter_temp_volume(path: Path, exclude_object_types: set[st
         )
 
     if footprint_hull is None:
-        footprint_xy = [(p[0], p[1]) for p in storey_points]
+        footprint_xy = [(float(x), float(y)) for x, y in storey_points[:, :2]]
         footprint_hull = convex_hull(footprint_xy)
         warnings.append("Footprint outline approximated by convex hull (no triangulated geometry).")
     if len(footprint_hull) < 3:
@@ -618,12 +673,36 @@ def _bbox_from_ifc(path: Path) -> BBox3D:
     if not path.exists():
         raise FileNotFoundError(f"IFC file not found: {path}")
 
-    model = ifcopenshell.open(str(path))
+    def _compute(model: ifcopenshell.file) -> BBox3D:
+        # Tessellated vertices where available, raw points for products without a mesh
+        points = _product_points(model, _mesh_store(path), list(model.by_type("IfcProduct")))
+        if not len(points):
+            raise RuntimeError(f"No geometric vertices could be extracted from IFC: {path}")
+        (min_x, min_y, min_z), (max_x, max_y, max_z) = points.min(axis=0).tolist(), points.max(axis=0).tolist()
+        return BBox3D(
+            min_x=min_x,
+            min_y=min_y,
+            min_z=min_z,
+            max_x=max_x,
+            max_y=max_y,
+            max_z=max_z,
+            sampled_vertices=len(points),
+        )
 
-    points = _extract_world_vertices(model)
-    if not points:
-        raise RuntimeError(f"No geometric vertices could be extracted from IFC: {path}")
-    return _bbox_from_points(points)
+    return ifc_derived(path, "bbox", _compute)
+
+
+def _bbox_from_envelope(envelope: EnvelopeGeometry) -> BBox3D:
+    min_x, min_y, min_z, max_x, max_y, max_z = envelope.bbox
+    return BBox3D(
+        min_x=min_x,
+        min_y=min_y,
+        min_z=min_z,
+        max_x=max_x,
+        max_y=max_y,
+        max_z=max_z,
+        sampled_vertices=len(envelope.footprint_xy) + len(envelope.ground_xy or []),
+    )
 
 
 def _compute_building_base_z(path: Path) -> Optional[float]:
@@ -636,42 +715,15 @@ def _compute_building_base_z(path: Path) -> Optional[float]:
     helper isolates the real building base so the 3D viewer can place the
     architect model on top of the cadaster slab cleanly.
     """
-    if _ifc_geom is None or not path.exists():
+    if not path.exists():
         return None
-    try:
-        import multiprocessing as _mp
-        model = ifcopenshell.open(str(path))
-        settings = _ifc_geom.settings()
-        settings.set(settings.USE_WORLD_COORDS, True)
-        skip_types = {"IfcGeographicElement", "IfcSite"}
-        try:
-            workers = max(1, _mp.cpu_count() - 1)
-        except Exception:
-            workers = 1
-        it = _ifc_geom.iterator(settings, model, workers)
-        if not it.initialize():
-            return None
-        z_min: Optional[float] = None
-        while True:
-            shape = it.get()
-            try:
-                product = model.by_id(shape.id)
-                if product is not None and product.is_a() in skip_types:
-                    if not it.next():
-                        break
-                    continue
-            except Exception:
-                pass
-            verts = shape.geometry.verts
-            if verts:
-                local_min = min(verts[2::3])
-                if z_min is None or local_min < z_min:
-                    z_min = local_min
-            if not it.next():
-                break
-        return float(z_min) if z_min is not None else None
-    except Exception:
+    store = _mesh_store(path)
+    if store is None:
         return None
+    skip_types = {"IfcGeographicElement", "IfcSite"}
+    rows = np.array([i for i, t in enumerate(store.types) if t not in skip_types], dtype=np.int64)
+    bbox = store.bbox(rows)
+    return float(bbox[0, 2]) if bbox is not None else None
 
 
 def _intersection_volume(a: BBox3D, b: BBox3D) -> float:
@@ -713,76 +765,49 @@ def run_volume_compliance_check(
 ) -> Dict[str, Any]:
     municipality_slug = "malgrat" if municipality == "Malgrat de Mar" else municipality.lower().replace(" ", "_")
 
+    # The allowed envelope comes straight from the generator (in memory); its
+    # IFC is only written when the caller wants to keep it.
     result = generate_one(
         refcat=refcat,
         poum_gml_path=str(POUM_GML_PATH),
         output_dir=OUTPUT_DIR,
         municipality_slug=municipality_slug,
         include_cadaster_ground=True,
+        write_ifc=keep_allowed_ifc,
     )
 
     if result.get("skipped"):
         raise ValueError(f"Allowed envelope could not be generated for refcat={refcat} (skipped/non-buildable).")
-    if not result.get("ifc_path"):
-        raise ValueError(f"Allowed envelope IFC path is missing for refcat={refcat}.")
+    envelope = result.get("envelope")
+    if envelope is None:
+        raise ValueError(f"Allowed envelope geometry is missing for refcat={refcat}.")
 
-    allowed_ifc_path = Path(result["ifc_path"]).resolve()
+    allowed_ifc_path = Path(result["ifc_path"]).resolve() if result.get("ifc_path") else None
+    # Plain IFC for the web-ifc viewer (allowed_ifc_path is the .ifczip in "ifczip" mode)
+    allowed_viewer_path = Path(result["viewer_ifc_path"]).resolve() if result.get("viewer_ifc_path") else None
     architect_path = Path(architect_ifc_path).expanduser().resolve()
 
-    allowed_bbox = _bbox_from_ifc(allowed_ifc_path)
-    allowed_polygon_xy: list[tuple[float, float]] = [
-        (allowed_bbox.min_x, allowed_bbox.min_y),
-        (allowed_bbox.max_x, allowed_bbox.min_y),
-        (allowed_bbox.max_x, allowed_bbox.max_y),
-        (allowed_bbox.min_x, allowed_bbox.max_y),
-    ]
-    allowed_height_m = 1.0
-    allowed_base_z_m = float(allowed_bbox.min_z)
+    allowed_bbox = _bbox_from_envelope(envelope)
+    allowed_polygon_xy: list[tuple[float, float]] = list(envelope.footprint_xy)
+    allowed_height_m = float(envelope.height)
+    allowed_base_z_m = float(envelope.base_z)
     project_base_z_m = 0.0
 
     project_polygon_xy: Optional[list[tuple[float, float]]] = None
     intersection_polygon_xy: Optional[list[tuple[float, float]]] = None
-    warnings: list[str] = []
-
-    # Try to extract the base extrusion *profile* from the BUILDING_ENVELOPE element.
-    # This avoids convex-hull contamination from hip-roof CSG clipping planes.
-    try:
-        profile_result = _extract_envelope_profile_footprint(allowed_ifc_path)
-        if profile_result is not None:
-            allowed_polygon_xy = list(profile_result["footprint_hull"])
-            allowed_height_m = float(profile_result["height_m"])
-            allowed_base_z_m = float(profile_result["z_min"])
-            warnings.extend(profile_result.get("warnings", []))
-        else:
-            # Fallback: ground perimeter convex hull (no BUILDING_ENVELOPE profile found)
-            allowed_temp_volume = _build_ground_perimeter_temp_volume(
-                allowed_ifc_path, exclude_object_types={"CADASTER_GROUND"}
-            )
-            allowed_polygon_xy = list(allowed_temp_volume["footprint_hull"])
-            allowed_height_m = float(allowed_temp_volume["height_m"])
-            allowed_base_z_m = float(allowed_temp_volume["z_min"])
-            warnings.append("Allowed envelope extracted from ground-floor perimeter (convex hull fallback).")
-    except Exception as e:
-        warnings.append(f"Allowed IFC footprint extraction failed; using BBox. reason={type(e).__name__}: {e}")
+    warnings: list[str] = ["Allowed envelope footprint taken from the generated buildable footprint."]
 
     # ── Helper: align polygons when they are in different coordinate systems ──
-    def _centroid(poly):
-        n = len(poly)
-        if n == 0:
-            return (0.0, 0.0)
-        return (sum(p[0] for p in poly) / n, sum(p[1] for p in poly) / n)
+    # The allowed polygon is analysed once; its centroid and bbox are reused.
+    allowed_footprint = FootprintAnalysis(allowed_polygon_xy)
 
     def _translate_poly(poly, dx, dy):
         return [(p[0] + dx, p[1] + dy) for p in poly]
 
-    def _bbox_of(poly):
-        xs = [p[0] for p in poly]; ys = [p[1] for p in poly]
-        return min(xs), min(ys), max(xs), max(ys)
-
-    def _polygons_overlap(poly_a, poly_b, threshold=0.1):
-        """Check if bounding boxes of two polygons overlap by at least threshold fraction."""
-        ax0, ay0, ax1, ay1 = _bbox_of(poly_a)
-        bx0, by0, bx1, by1 = _bbox_of(poly_b)
+    def _polygons_overlap(poly_b, threshold=0.1):
+        """Check if the bounding boxes of the allowed polygon and poly_b overlap by at least threshold fraction."""
+        ax0, ay0, ax1, ay1 = allowed_footprint.bbox
+        bx0, by0, bx1, by1 = FootprintAnalysis(poly_b).bbox
         ox = max(0, min(ax1, bx1) - max(ax0, bx0))
         oy = max(0, min(ay1, by1) - max(ay0, by0))
         aw = max(1e-9, ax1 - ax0); ah = max(1e-9, ay1 - ay0)
@@ -807,13 +832,13 @@ def run_volume_compliance_check(
         height_m = float(temp_volume["height_m"])
 
         # Check if polygons already overlap (same coord system) or need alignment
-        if _polygons_overlap(allowed_polygon_xy, footprint_hull):
+        if _polygons_overlap(footprint_hull):
             project_polygon_xy = list(footprint_hull)
             warnings.append("Polygons overlap naturally — same coordinate system detected.")
         else:
             # Different coordinate systems: align project centroid → allowed centroid
-            ac = _centroid(allowed_polygon_xy)
-            pc = _centroid(footprint_hull)
+            ac = allowed_footprint.centroid
+            pc = FootprintAnalysis(footprint_hull).centroid
             align_dx = ac[0] - pc[0]
             align_dy = ac[1] - pc[1]
             project_polygon_xy = _translate_poly(footprint_hull, align_dx, align_dy)
@@ -824,14 +849,19 @@ def run_volume_compliance_check(
         intersection_polygon_xy = list(inter_poly) if inter_poly else None
         
         # DEBUG: Log coordinate ranges
-        allowed_xs = [p[0] for p in allowed_polygon_xy]
-        allowed_ys = [p[1] for p in allowed_polygon_xy]
-        project_xs = [p[0] for p in project_polygon_xy]
-        project_ys = [p[1] for p in project_polygon_xy]
-        print(f"[COORD_DEBUG] allowed_x_range=({min(allowed_xs):.2f}, {max(allowed_xs):.2f}) "
-              f"project_x_range=({min(project_xs):.2f}, {max(project_xs):.2f})")
-        print(f"[COORD_DEBUG] allowed_y_range=({min(allowed_ys):.2f}, {max(allowed_ys):.2f}) "
-              f"project_y_range=({min(project_ys):.2f}, {max(project_ys):.2f})")
+        if logger.isEnabledFor(logging.DEBUG):
+            allowed_xs = [p[0] for p in allowed_polygon_xy]
+            allowed_ys = [p[1] for p in allowed_polygon_xy]
+            project_xs = [p[0] for p in project_polygon_xy]
+            project_ys = [p[1] for p in project_polygon_xy]
+            logger.debug(
+                "[COORD_DEBUG] allowed_x_range=(%.2f, %.2f) project_x_range=(%.2f, %.2f)",
+                min(allowed_xs), max(allowed_xs), min(project_xs), max(project_xs),
+            )
+            logger.debug(
+                "[COORD_DEBUG] allowed_y_range=(%.2f, %.2f) project_y_range=(%.2f, %.2f)",
+                min(allowed_ys), max(allowed_ys), min(project_ys), max(project_ys),
+            )
         intersection_area = _polygon_area(inter_poly) if inter_poly else 0.0
         outside_area = max(0.0, project_area - intersection_area)
 
@@ -859,11 +889,11 @@ def run_volume_compliance_check(
             (project_bbox.min_x, project_bbox.max_y),
         ]
         # Check overlap; align if needed
-        if _polygons_overlap(allowed_polygon_xy, raw_project_poly):
+        if _polygons_overlap(raw_project_poly):
             project_polygon_xy = raw_project_poly
         else:
-            ac = _centroid(allowed_polygon_xy)
-            pc = _centroid(raw_project_poly)
+            ac = allowed_footprint.centroid
+            pc = FootprintAnalysis(raw_project_poly).centroid
             project_polygon_xy = _translate_poly(raw_project_poly, ac[0] - pc[0], ac[1] - pc[1])
         inter_poly = polygon_intersection(project_polygon_xy, allowed_polygon_xy)
         intersection_polygon_xy = list(inter_poly) if inter_poly else None
@@ -911,7 +941,8 @@ def run_volume_compliance_check(
         "allowed_bbox": _bbox_dict(allowed_bbox),
         "project_bbox": _bbox_dict(project_bbox),
         "sources": {
-            "allowed_ifc": str(allowed_ifc_path),
+            "allowed_ifc": str(allowed_ifc_path) if allowed_ifc_path else None,
+            "allowed_ifc_viewer": str(allowed_viewer_path) if allowed_viewer_path else None,
             "architect_ifc": str(architect_path),
             "keep_allowed_ifc": bool(keep_allowed_ifc),
         },
@@ -945,12 +976,6 @@ def run_volume_compliance_check(
         },
     }
 
-    if not keep_allowed_ifc:
-        try:
-            allowed_ifc_path.unlink(missing_ok=True)
-        except Exception:
-            pass
-
     return response
 
 
@@ -1024,17 +1049,11 @@ def run_element_clash_check(
     align_dx, align_dy = 0.0, 0.0
     arch_z_min = 0.0
 
-    def _centroid_local(poly: list[tuple[float, float]]) -> tuple[float, float]:
-        n = len(poly)
-        return (sum(p[0] for p in poly) / n, sum(p[1] for p in poly) / n)
+    allowed_footprint = FootprintAnalysis(allowed_polygon_xy)
 
-    def _bbox_of_local(poly: list[tuple[float, float]]) -> tuple[float, float, float, float]:
-        xs = [p[0] for p in poly]; ys = [p[1] for p in poly]
-        return min(xs), min(ys), max(xs), max(ys)
-
-    def _bboxes_overlap_local(a: list[tuple[float, float]], b: list[tuple[float, float]], threshold: float = 0.1) -> bool:
-        ax0, ay0, ax1, ay1 = _bbox_of_local(a)
-        bx0, by0, bx1, by1 = _bbox_of_local(b)
+    def _bboxes_overlap_local(a: FootprintAnalysis, b: FootprintAnalysis, threshold: float = 0.1) -> bool:
+        ax0, ay0, ax1, ay1 = a.bbox
+        bx0, by0, bx1, by1 = b.bbox
         ox = max(0.0, min(ax1, bx1) - max(ax0, bx0))
         oy = max(0.0, min(ay1, by1) - max(ay0, by0))
         aw = max(1e-9, ax1 - ax0) * max(1e-9, ay1 - ay0)
@@ -1042,13 +1061,13 @@ def run_element_clash_check(
 
     try:
         temp_vol = _build_ground_perimeter_temp_volume(architect_path)
-        arch_footprint: list[tuple[float, float]] = temp_vol["footprint_hull"]
+        arch_footprint = FootprintAnalysis(temp_vol["footprint_hull"])
         arch_z_min = float(temp_vol["z_min"])
         warnings_out.extend(temp_vol.get("warnings", []))
 
-        if not _bboxes_overlap_local(allowed_polygon_xy, arch_footprint):
-            ac = _centroid_local(allowed_polygon_xy)
-            pc = _centroid_local(arch_footprint)
+        if not _bboxes_overlap_local(allowed_footprint, arch_footprint):
+            ac = allowed_footprint.centroid
+            pc = arch_footprint.centroid
             align_dx = ac[0] - pc[0]
             align_dy = ac[1] - pc[1]
             warnings_out.append(
@@ -1058,7 +1077,7 @@ def run_element_clash_check(
     except Exception as e:
         warnings_out.append(f"Could not compute arch footprint for alignment: {type(e).__name__}: {e}")
 
-    arch_model = ifcopenshell.open(str(architect_path))
+    arch_model = open_ifc(architect_path)
 
     # When coordinate alignment was applied, the centroid shift introduces a
     # residual offset that appears identically on all elements (same side, same value).
@@ -1071,9 +1090,8 @@ def run_element_clash_check(
             if expanded.is_valid and not expanded.is_empty:
                 allowed_shapely = expanded
                 # Also expand the bbox bounds used for per-side overflow
-                ax0_e, ay0_e, ax1_e, ay1_e = _bbox_of_local(allowed_polygon_xy)
-                # Store as module-level-like vars to use in loop (recomputed from polygon anyway)
                 allowed_polygon_xy = list(expanded.exterior.coords[:-1])
+                allowed_footprint = FootprintAnalysis(allowed_polygon_xy)
                 warnings_out.append(
                     f"Envelope expanded by {align_dist:.4f} m to absorb alignment uncertainty. "
                     f"Only overflows larger than this are reported."
@@ -1091,10 +1109,14 @@ def run_element_clash_check(
     _SKIP_PREFIXES = ("IfcFlow", "IfcDistribution", "IfcFurnishing")
 
     tol = float(tolerance_m)
+    a_min_x, a_min_y, a_max_x, a_max_y = allowed_footprint.bbox
 
     clashing: list[Dict[str, Any]] = []
     total_checked = 0
 
+    store = _mesh_store(architect_path)
+    product_bboxes = store.product_bboxes if store is not None else None
+
     for product in arch_model.by_type("IfcProduct"):
         cls = product.is_a()
         if cls in _SKIP_TYPES:
@@ -1104,24 +1126,25 @@ def run_element_clash_check(
         if getattr(product, "Representation", None) is None:
             continue
 
-        pts = _extract_world_vertices(arch_model, [product])
-        if not pts:
-            continue
+        row = store.row_of.get(product.id()) if store is not None else None
+        if row is not None:
+            lo, hi = product_bboxes[row]
+        else:
+            pts = _extract_world_vertices(arch_model, [product])
+            if not pts:
+                continue
+            arr = np.asarray(pts, dtype=float)
+            lo, hi = arr.min(axis=0), arr.max(axis=0)
 
         total_checked += 1
 
         # Apply XY alignment
-        xs = [x + align_dx for x, y, z in pts]
-        ys = [y + align_dy for x, y, z in pts]
-        zs = [z for x, y, z in pts]
-
-        e_min_x, e_max_x = min(xs), max(xs)
-        e_min_y, e_max_y = min(ys), max(ys)
-        e_min_z, e_max_z = min(zs), max(zs)
+        e_min_x, e_max_x = float(lo[0]) + align_dx, float(hi[0]) + align_dx
+        e_min_y, e_max_y = float(lo[1]) + align_dy, float(hi[1]) + align_dy
+        e_min_z, e_max_z = float(lo[2]), float(hi[2])
 
         # XY overflow: per-side overflow is the primary check (robust against bbox inflation).
         # Area is computed secondarily for informational display.
-        a_min_x, a_min_y, a_max_x, a_max_y = _bbox_of_local(allowed_polygon_xy)
         overflow_west  = max(0.0, a_min_x - e_min_x)
         overflow_east  = max(0.0, e_max_x - a_max_x)
         overflow_south = max(0.0, a_min_y - e_min_y)
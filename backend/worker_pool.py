@@ -0,0 +1,146 @@
+"""
+Bounded worker pool with a two-level priority queue for jobs.
+
+Responsibilities
+----------------
+- Run job callables on a fixed number of worker threads.
+- Bound the number of waiting jobs; submit() raises QueueFullError when full.
+- Dispatch interactive jobs (single parcel) before queued batches, and keep
+  `reserved_interactive` workers free of batches so a single parcel never
+  waits behind a long batch.
+- Report the queue position of a waiting job.
+
+Notes
+-----
+- Within a priority level jobs run in submission order (FIFO).
+- Worker threads are daemons started on first submit.
+"""
+
+from __future__ import annotations
+
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, List, Optional
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+_PRIORITIES = (PRIORITY_INTERACTIVE, PRIORITY_BATCH)
+
+
+class QueueFullError(RuntimeError):
+    """Raised by WorkerPool.submit when the wait queue is at capacity."""
+
+
+@dataclass
+class _Task:
+    job_id: str
+    fn: Callable[[], None]
+    priority: int
+
+
+class WorkerPool:
+    """Fixed-size thread pool; see module docstring for scheduling rules."""
+
+    def __init__(self, workers: int = 2, max_queued: int = 50, reserved_interactive: int = 1) -> None:
+        self.workers = max(1, int(workers))
+        self.max_queued = max(0, int(max_queued))
+        # At least one worker must be able to run batches
+        self.reserved_interactive = min(max(0, int(reserved_interactive)), self.workers - 1)
+        self._cond = threading.Condition()
+        self._queues: Dict[int, Deque[_Task]] = {p: deque() for p in _PRIORITIES}
+        self._running: Dict[str, int] = {}   # job_id -> priority
+        self._threads: List[threading.Thread] = []
+
+    # ------------------------------------------------------------- public
+
+    def submit(self, job_id: str, fn: Callable[[], None], interactive: bool = False) -> int:
+        """
+        Queue `fn` for execution and return its 1-based queue position.
+        Raises QueueFullError when `max_queued` jobs are already waiting.
+        """
+        priority = PRIORITY_INTERACTIVE if interactive else PRIORITY_BATCH
+        with self._cond:
+            if self._queued_count() >= self.max_queued:
+                raise QueueFullError(f"Job queue is full ({self.max_queued} waiting).")
+            self._queues[priority].append(_Task(job_id=job_id, fn=fn, priority=priority))
+            self._ensure_started()
+            self._cond.notify_all()
+            return self._position(job_id) or 0
+
+    def remove(self, job_id: str) -> bool:
+        """Drop a job that has not started yet. Returns True if it was queued."""
+        with self._cond:
+            for q in self._queues.values():
+                for task in q:
+                    if task.job_id == job_id:
+                        q.remove(task)
+                        return True
+        return False
+
+    def position(self, job_id: str) -> Optional[int]:
+        """1-based dispatch position of a waiting job, or None if not queued."""
+        with self._cond:
+            return self._position(job_id)
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            return {
+                "workers": self.workers,
+                "running": len(self._running),
+                "running_batches": self._running_batches(),
+                "queued_interactive": len(self._queues[PRIORITY_INTERACTIVE]),
+                "queued_batch": len(self._queues[PRIORITY_BATCH]),
+                "max_queued": self.max_queued,
+            }
+
+    # ----------------------------------------------------------- internals
+
+    def _queued_count(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    def _running_batches(self) -> int:
+        return sum(1 for p in self._running.values() if p == PRIORITY_BATCH)
+
+    def _position(self, job_id: str) -> Optional[int]:
+        pos = 0
+        for p in _PRIORITIES:
+            for task in self._queues[p]:
+                pos += 1
+                if task.job_id == job_id:
+                    return pos
+        return None
+
+    def _next_task(self) -> Optional[_Task]:
+        if self._queues[PRIORITY_INTERACTIVE]:
+            return self._queues[PRIORITY_INTERACTIVE].popleft()
+        batch_slots = self.workers - self.reserved_interactive
+        if self._queues[PRIORITY_BATCH] and self._running_batches() < batch_slots:
+            return self._queues[PRIORITY_BATCH].popleft()
+        return None
+
+    def _ensure_started(self) -> None:
+        while len(self._threads) < self.workers:
+            t = threading.Thread(target=self._loop, name=f"job-worker-{len(self._threads) + 1}", daemon=True)
+            self._threads.append(t)
+            t.start()
+
+    def _loop(self) -> None:
+        while True:
+            with self._cond:
+                task = self._next_task()
+                while task is None:
+                    self._cond.wait()
+                    task = self._next_task()
+                self._running[task.job_id] = task.priority
+            try:
+                task.fn()
+            except Exception:
+                logger.exception("Job %s crashed in worker", task.job_id)
+            finally:
+                with self._cond:
+                    self._running.pop(task.job_id, None)
+                    self._cond.notify_all()
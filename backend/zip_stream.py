@@ -0,0 +1,95 @@
+"""
+Streaming ZIP archives of job outputs.
+
+Responsibilities
+----------------
+- Build a ZIP archive of a list of files on the fly and yield it in chunks,
+  so a whole batch can be downloaded in one response without a temp file.
+
+Notes
+-----
+- zipfile writes to a non-seekable sink using data descriptors, so each
+  entry's size/CRC follows its data and nothing has to be rewound.
+- Entries are stored by default (IFC text compresses well, but deflate costs
+  CPU per request); pass deflate=True to compress each entry.
+- ZIP64 is forced per entry so archives and entries above 4 GiB stay valid.
+- Missing files are skipped; duplicate names get a numeric suffix.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Iterable, Iterator, List, Tuple
+import zipfile
+
+# Bytes read from disk per step; also roughly the size of yielded chunks
+CHUNK_SIZE = 1024 * 1024
+
+
+class _Sink:
+    """Write-only, non-seekable buffer that hands out what was written so far."""
+
+    def __init__(self) -> None:
+        self._parts: List[bytes] = []
+        self._offset = 0
+
+    def write(self, data: bytes) -> int:
+        if data:
+            self._parts.append(bytes(data))
+            self._offset += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        # zipfile records entry offsets via tell(); seek() stays unsupported
+        return self._offset
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def _unique_names(paths: Iterable[str]) -> List[Tuple[Path, str]]:
+    seen = set()
+    out: List[Tuple[Path, str]] = []
+    for p in paths:
+        path = Path(p)
+        name = path.name
+        stem, suffix, n = path.stem, path.suffix, 1
+        while name in seen:
+            n += 1
+            name = f"{stem}_{n}{suffix}"
+        seen.add(name)
+        out.append((path, name))
+    return out
+
+
+def iter_zip(paths: Iterable[str], deflate: bool = False) -> Iterator[bytes]:
+    """Yield the bytes of a ZIP archive containing `paths` (flat, by file name)."""
+    sink = _Sink()
+    compression = zipfile.ZIP_DEFLATED if deflate else zipfile.ZIP_STORED
+    with zipfile.ZipFile(sink, mode="w", compression=compression, allowZip64=True) as zf:
+        for path, name in _unique_names(paths):
+            if not path.is_file():
+                continue
+            info = zipfile.ZipInfo.from_file(path, arcname=name)
+            info.compress_type = compression
+            with open(path, "rb") as src, zf.open(info, mode="w", force_zip64=True) as dst:
+                while True:
+                    block = src.read(CHUNK_SIZE)
+                    if not block:
+                        break
+                    dst.write(block)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            data = sink.drain()
+            if data:
+                yield data
+    # Central directory
+    data = sink.drain()
+    if data:
+        yield data